@@ -39,16 +39,22 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # My Apps
     'Documentos',
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista: a duração medida inclui os demais middlewares
+    'Documentos.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'Documentos.roteamento.RoteamentoMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Grava o histórico dos documentos da requisição em um único INSERT, com o usuário logado
+    'Documentos.auditoria.AuditoriaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -66,6 +72,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'Documentos.context_processors.caixa_entrada',
+                'Documentos.context_processors.cache_layout',
             ],
         },
     },
@@ -77,17 +85,114 @@ WSGI_APPLICATION = 'ControleDocumentos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Conexão definida por variáveis de ambiente (ou arquivo .env), com os valores do compose.yaml como padrão
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': "controle_app", # nome do banco de dados
-        'USER': "controle_user", # nome do usuário
-        'PASSWORD': "controle_pass",# senha
-        'HOST': "db_postgres", # nome do serviço que está no docker compose
-        'PORT': 5432,
+        'NAME': config('DB_NAME', default='controle_app'), # nome do banco de dados
+        'USER': config('DB_USER', default='controle_user'), # nome do usuário
+        'PASSWORD': config('DB_PASSWORD', default='controle_pass'), # senha
+        'HOST': config('DB_HOST', default='db_postgres'), # nome do serviço no docker compose (ou o pgbouncer)
+        'PORT': config('DB_PORT', default=5432, cast=int),
+        # Reaproveita a conexão entre requisições em vez de abrir uma nova a cada uma,
+        # testando-a antes do uso para descartar conexões derrubadas (reinício do banco, pooler)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        # O pgbouncer em modo transaction não mantém cursores nomeados entre transações
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        },
     }
 }
 
+if DB_PGBOUNCER:
+    # Conexão direta ao PostgreSQL, sem o pooler, para as leituras longas por cursor no servidor
+    # (exportação CSV): pelo pgbouncer o resultado inteiro seria carregado na memória.
+    DATABASES['direto'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_HOST_DIRETO', default='db_postgres'),
+        'PORT': config('DB_PORT_DIRETO', default=5432, cast=int),
+        'CONN_MAX_AGE': 0,
+        'DISABLE_SERVER_SIDE_CURSORS': False,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Réplica de leitura opcional (replicação do PostgreSQL): recebe as consultas do dashboard, das listas
+# e exportações do admin e do autocomplete (ver Documentos/roteamento.py)
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+BANCO_REPLICA = 'replica' if DB_REPLICA_HOST else None
+# Depois de gravar, o usuário lê do primário por este tempo, para ver a própria alteração
+REPLICA_FIXAR_PRIMARIO_SEGUNDOS = config('REPLICA_FIXAR_PRIMARIO_SEGUNDOS', default=10, cast=int)
+
+if BANCO_REPLICA:
+    DATABASES[BANCO_REPLICA] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=5432, cast=int),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        # Conexão direta à réplica, com cursores no servidor para a exportação CSV
+        'DISABLE_SERVER_SIDE_CURSORS': False,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['Documentos.roteamento.RoteadorReplica']
+
+# Cache: 'local' (memória de cada processo, padrão) ou um backend compartilhado entre os contêineres,
+# 'redis' ou 'memcached', em CACHE_LOCATION (ex.: redis://redis:6379/0 ou memcached:11211).
+# Guarda setores, servidores e fragmentos do base.html (ver Documentos/referencias.py). A invalidação
+# troca versões no próprio cache: com 'local' ela só alcança o processo que gravou, e os demais
+# enxergam a alteração quando a entrada expira, por isso o tempo padrão é curto nesse modo.
+CACHE_BACKEND = config('CACHE_BACKEND', default='local')
+BACKENDS_CACHE = {
+    'local': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': BACKENDS_CACHE[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default='controle-documentos'),
+        'KEY_PREFIX': config('CACHE_PREFIXO', default='controle'),
+    },
+}
+CACHE_REFERENCIAS_SEGUNDOS = config('CACHE_REFERENCIAS_SEGUNDOS', default=60 if CACHE_BACKEND == 'local' else 3600, cast=int)
+CACHE_FRAGMENTOS_SEGUNDOS = config('CACHE_FRAGMENTOS_SEGUNDOS', default=60 if CACHE_BACKEND == 'local' else 600, cast=int)
+
+# Métricas das requisições em /metrics (ver Documentos/metricas.py). Somadas entre os workers e os
+# contêineres em um hash do Redis (por padrão, o mesmo do cache); sem Redis, ficam na memória de cada processo.
+METRICAS_REDIS = config('METRICAS_REDIS', default=CACHES['default']['LOCATION'] if CACHE_BACKEND == 'redis' else '')
+# Token exigido do coletor (Authorization: Bearer <token>); vazio fecha o endpoint
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+# Requisições a partir desta duração são contadas como lentas e registradas no log, com as
+# METRICAS_CONSULTAS_LENTAS consultas mais demoradas, para a fração METRICAS_AMOSTRA_LENTAS delas
+METRICAS_LENTA_SEGUNDOS = config('METRICAS_LENTA_SEGUNDOS', default=1.0, cast=float)
+METRICAS_CONSULTAS_LENTAS = config('METRICAS_CONSULTAS_LENTAS', default=3, cast=int)
+METRICAS_AMOSTRA_LENTAS = config('METRICAS_AMOSTRA_LENTAS', default=1.0, cast=float)
+
+# Documentos concluídos ou arquivados há mais de ARQUIVO_DIAS dias vão para o arquivo ao rodar
+# arquivar_documentos, saindo das listas do admin e das consultas do conjunto em uso (as contagens
+# do dashboard continuam a incluí-los)
+ARQUIVO_DIAS = config('ARQUIVO_DIAS', default=730, cast=int)
+
+# Mensagens da aplicação (requisições lentas, worker de anexos) na saída dos contêineres
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simples': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simples'},
+    },
+    'loggers': {
+        'Documentos': {'handlers': ['console'], 'level': config('LOG_NIVEL', default='INFO')},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,7 +231,40 @@ USE_TZ = True
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+
+# Anexos dos documentos: 'local' grava em MEDIA_ROOT (volume compartilhado entre os contêineres
+# da aplicação e o nginx, ver compose.yaml); 's3' grava num bucket compatível com S3 (AWS, MinIO).
+ARMAZENAMENTO_ANEXOS = config('ARMAZENAMENTO_ANEXOS', default='local')
+# Com o nginx na frente, o download é entregue por ele via X-Accel-Redirect depois da checagem de
+# permissão; sem ele (runserver), o próprio Django envia o arquivo.
+ANEXOS_X_ACCEL = config('ANEXOS_X_ACCEL', default=False, cast=bool)
+
+if ARMAZENAMENTO_ANEXOS == 's3':
+    ARMAZENAMENTO_ANEXOS_BACKEND = {
+        'BACKEND': 'Documentos.armazenamento_s3.AnexosS3',
+        'OPTIONS': {
+            'bucket_name': config('AWS_STORAGE_BUCKET_NAME'),
+            'endpoint_url': config('AWS_S3_ENDPOINT_URL', default=None),
+            'access_key': config('AWS_ACCESS_KEY_ID'),
+            'secret_key': config('AWS_SECRET_ACCESS_KEY'),
+            'region_name': config('AWS_S3_REGION_NAME', default=None),
+            # Endereço /bucket/arquivo, que o nginx repassa ao MinIO pela location /anexos-s3/
+            'addressing_style': 'path',
+            'signature_version': 's3v4',
+            'default_acl': 'private',
+            'file_overwrite': False,
+            'querystring_expire': 60,
+        },
+    }
+else:
+    ARMAZENAMENTO_ANEXOS_BACKEND = {'BACKEND': 'Documentos.armazenamento.AnexosLocais'}
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'anexos': ARMAZENAMENTO_ANEXOS_BACKEND,
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -1,5 +1,386 @@
-from django.contrib import admin
-from .models import Processo, Oficio, Setor, Servidor, CadastroEmail, OrdemServico, Tramitacao, Documento
+import csv
+from datetime import date
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import label_for_field, lookup_field, unquote
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from . import auditoria, busca, operacoes, referencias, roteamento
+from .paginacao import ChangeListPorChave, PaginadorEstimado
+from .importacao import Importador, ler_arquivo
+from .models import Assunto, Processo, Oficio, Setor, Servidor, CadastroEmail, OrdemServico, Tramitacao, Documento, TarefaAnexo
+
+class BuscaDocumentoMixin:
+    # Substitui o icontains campo a campo pela busca indexada de busca.py
+    # (texto completo em português sem acentos + trigramas), usada também pelo autocomplete.
+    prefixo_busca = ''
+
+    def changelist_view(self, request, extra_context=None):
+        # A lista (e a busca) é só leitura: vai para a réplica, exceto quando executa uma ação
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with roteamento.ler_da_replica():
+            resposta = super().changelist_view(request, extra_context)
+            if hasattr(resposta, 'render') and not resposta.is_rendered:
+                resposta.render()
+        return resposta
+
+    def get_search_results(self, request, queryset, search_term):
+        return busca.buscar(queryset, search_term, self.prefixo_busca), False
+
+class DocumentoAutocompleteView(AutocompleteJsonView):
+    # Autocomplete de documentos por prefixo do rótulo (número do processo, ofício ou OS,
+    # assunto do e-mail), paginado por chave (rotulo_busca, id) em vez de OFFSET/COUNT.
+
+    def get(self, request, *args, **kwargs):
+        with roteamento.ler_da_replica():
+            return self.responder(request)
+
+    def responder(self, request):
+        self.term, self.model_admin, self.source_field, to_field_name = self.process_request(request)
+        if not self.has_perm(request):
+            raise PermissionDenied
+
+        documentos = self.get_queryset()
+        cursor = request.GET.get('cursor')
+        if cursor:
+            pk, _, rotulo_busca = cursor.partition(':')
+            if not pk.isdigit():
+                raise PermissionDenied
+            documentos = documentos.apos((rotulo_busca, int(pk)))
+        # Uma única consulta: o rótulo já está na tabela Documento
+        linhas = list(documentos.values_list('pk', 'rotulo', 'rotulo_busca')[:self.paginate_by + 1])
+        mais = len(linhas) > self.paginate_by
+        linhas = linhas[:self.paginate_by]
+        return JsonResponse({
+            'results': [{'id': str(pk), 'text': rotulo} for pk, rotulo, _ in linhas],
+            'pagination': {
+                'more': mais,
+                'cursor': f'{linhas[-1][0]}:{linhas[-1][2]}' if mais else None,
+            },
+        })
+
+    def get_queryset(self):
+        documentos = self.model_admin.get_queryset(self.request)
+        documentos = documentos.complex_filter(self.source_field.get_limit_choices_to())
+        return documentos.prefixo(self.term).order_by('rotulo_busca', 'pk')
+
+class DocumentoAutocompleteSelect(AutocompleteSelect):
+    # Widget do autocomplete de documentos; o JS envia o cursor da página anterior
+    def get_url(self):
+        return reverse('%s:Documentos_documento_autocomplete' % self.admin_site.name)
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        # Evita que o autocomplete.js do admin inicialize o campo sem o cursor
+        attrs['class'] = attrs['class'].replace('admin-autocomplete', 'documento-autocomplete')
+        return attrs
+
+    @property
+    def media(self):
+        return super().media + forms.Media(js=['js/autocomplete_documento.js'])
+
+class PaginacaoPorChaveMixin:
+    # Listas grandes: paginação por chave na ordenação da lista (data de abertura ou de despacho + id)
+    # em vez de OFFSET, e contagem estimada pelo PostgreSQL quando a exata for cara (ver paginacao.py).
+    # Os links de página vêm de admin/Documentos/change_list_por_chave.html, estendido também pelo
+    # change_list_documento.html das listas de documentos.
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListPorChave
+
+class ArquivoListFilter(admin.SimpleListFilter):
+    # As listas mostram o conjunto em uso; o arquivo (documentos antigos já encerrados, movidos por
+    # arquivar_documentos) é pesquisado pelo filtro, cada um com o seu índice parcial de ordenação.
+    # A página de cada documento e o autocomplete continuam encontrando os arquivados.
+    title = 'conjunto'
+    parameter_name = 'arquivo'
+
+    def lookups(self, request, model_admin):
+        return (('1', 'Arquivo'), ('todos', 'Todos'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'todos':
+            return queryset
+        return queryset.filter(arquivo=self.value() == '1')
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'Em uso',
+        }
+        for valor, rotulo in self.lookup_choices:
+            yield {
+                'selected': self.value() == valor,
+                'query_string': changelist.get_query_string({self.parameter_name: valor}),
+                'display': rotulo,
+            }
+
+class ReferenciaAutocompleteView(AutocompleteJsonView):
+    # Autocomplete do admin (admin.site.autocomplete_view). As respostas de setores e servidores
+    # ficam no cache, sob a versão da tabela (referencias.py); a permissão é verificada a cada requisição.
+
+    def get(self, request, *args, **kwargs):
+        self.term, self.model_admin, self.source_field, to_field_name = self.process_request(request)
+        if not self.has_perm(request):
+            raise PermissionDenied
+        modelo = self.model_admin.model
+        if modelo not in referencias.MODELOS:
+            return super().get(request, *args, **kwargs)
+        responder = super().get
+        partes = ('autocomplete', self.source_field.model._meta.label_lower, self.source_field.name,
+                  to_field_name, self.term, request.GET.get('page', '1'))
+        conteudo = referencias.em_cache(modelo._meta.model_name, partes,
+                                        lambda: responder(request, *args, **kwargs).content)
+        return HttpResponse(conteudo, content_type='application/json')
+
+def autocomplete_view(request):
+    return ReferenciaAutocompleteView.as_view(admin_site=admin.site)(request)
+
+class ReferenciaAutocompleteSelect(AutocompleteSelect):
+    # Exibe o setor/servidor selecionado com o rótulo guardado no cache, em vez de uma consulta por campo
+    def optgroups(self, name, value, attr=None):
+        rotulos = referencias.rotulos(self.field.remote_field.model)
+        grupo = (None, [], 0)
+        opcoes = grupo[1]
+        if not self.is_required:
+            opcoes.append(self.create_option(name, '', '', False, 0))
+        for valor in value:
+            if str(valor) in rotulos:
+                opcoes.append(self.create_option(name, str(valor), rotulos[str(valor)], True, len(opcoes)))
+        return [grupo]
+
+class ReferenciasCacheMixin:
+    # Campos de autocomplete de setor e servidor com o rótulo do valor atual lido do cache
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model in referencias.MODELOS and db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', ReferenciaAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+class PreviaAnexoMixin:
+    # Miniatura do anexo na página do documento, gerada em segundo plano por processar_anexos
+    readonly_fields = ('previa_anexo',)
+
+    @admin.display(description='Prévia')
+    def previa_anexo(self, obj):
+        if obj.miniatura:
+            return format_html('<a href="{}"><img src="{}" alt="Prévia do anexo"></a>', obj.anexo.url, obj.miniatura.url)
+        if obj.anexo:
+            return 'Em processamento' if obj.tarefas_anexo.filter(status='pendente').exists() else 'Sem prévia'
+        return '-'
+
+class Eco:
+    # Pseudo-arquivo do csv.writer: devolve a linha formatada em vez de gravá-la
+    def write(self, valor):
+        return valor
+
+class ExportacaoCsvMixin:
+    # Exporta para CSV a lista do admin com os filtros e a busca aplicados (botão "Exportar CSV")
+    # ou os itens selecionados (ação). As linhas são lidas por cursor no servidor, em blocos,
+    # com as chaves estrangeiras em JOIN, e enviadas ao navegador à medida que são geradas.
+    change_list_template = 'admin/Documentos/change_list_documento.html'
+    actions = ['exportar_csv']
+    tamanho_bloco_exportacao = 2000
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            path('exportar/', self.admin_site.admin_view(self.exportar_view), name='%s_%s_exportar' % info),
+        ]
+        return urls + super().get_urls()
+
+    def exportar_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            return HttpResponseRedirect(reverse('admin:%s_%s_changelist' % (self.model._meta.app_label, self.model._meta.model_name)))
+        return self.resposta_csv(request, changelist.queryset)
+
+    @admin.action(description='Exportar selecionados para CSV')
+    def exportar_csv(self, request, queryset):
+        return self.resposta_csv(request, queryset)
+
+    def colunas_exportacao(self, request):
+        return [coluna for coluna in self.get_list_display(request) if coluna != 'action_checkbox']
+
+    def valor_exportacao(self, coluna, obj):
+        campo, _, valor = lookup_field(coluna, obj, self)
+        if valor is None:
+            return ''
+        if campo is not None and campo.choices:
+            return getattr(obj, 'get_%s_display' % campo.name)()
+        if isinstance(valor, date):
+            # Mesmo formato aceito pela importação
+            return valor.strftime('%d/%m/%Y %H:%M' if hasattr(valor, 'hour') else '%d/%m/%Y')
+        return str(valor)
+
+    def linhas_csv(self, request, queryset, banco):
+        colunas = self.colunas_exportacao(request)
+        # Separador ';' e BOM para o Excel em português abrir o arquivo com acentos e colunas corretas
+        escritor = csv.writer(Eco(), delimiter=';')
+        yield '\ufeff' + escritor.writerow([label_for_field(coluna, self.model, self) for coluna in colunas])
+        relacionados = self.list_select_related
+        if relacionados is True:
+            queryset = queryset.select_related()
+        elif relacionados:
+            queryset = queryset.select_related(*relacionados)
+        for obj in queryset.using(banco).iterator(chunk_size=self.tamanho_bloco_exportacao):
+            yield escritor.writerow([self.valor_exportacao(coluna, obj) for coluna in colunas])
+
+    def resposta_csv(self, request, queryset):
+        nome = '%s_%s.csv' % (self.model._meta.model_name, timezone.localdate().strftime('%Y%m%d'))
+        # O banco é escolhido agora: as linhas são lidas depois que a view retorna, fora de ler_da_replica().
+        # Com o pgbouncer, o cursor no servidor só funciona por uma conexão direta (ver settings.py).
+        with roteamento.ler_da_replica():
+            banco = roteamento.banco_leitura()
+        if banco is None:
+            banco = 'direto' if 'direto' in settings.DATABASES else queryset.db
+        resposta = StreamingHttpResponse(self.linhas_csv(request, queryset, banco), content_type='text/csv; charset=utf-8')
+        resposta['Content-Disposition'] = 'attachment; filename="%s"' % nome
+        return resposta
+
+class ImportacaoForm(forms.Form):
+    arquivo = forms.FileField(label='Arquivo (.csv ou .xlsx)',
+                              help_text='A primeira linha traz os nomes dos campos; "setor" recebe a sigla, '
+                                        '"responsavel" o nome do servidor e "assunto" o nome do assunto.')
+
+class ImportacaoAdminMixin:
+    # Acrescenta à lista do admin o botão "Importar", que grava em lotes os documentos de um
+    # arquivo CSV/XLSX (ver importacao.py) e lista as linhas rejeitadas com o motivo.
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'importacao': True, **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='%s_%s_importar' % info),
+        ]
+        return urls + super().get_urls()
+
+    def importar_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportacaoForm(request.POST or None, request.FILES or None)
+        importador = None
+        if request.method == 'POST' and form.is_valid():
+            arquivo = form.cleaned_data['arquivo']
+            importador = Importador(self.model, request.user)
+            try:
+                importador.importar(ler_arquivo(arquivo.file, arquivo.name))
+            except ValidationError as erro:
+                # Formato ilegível; os lotes gravados antes do erro ficam gravados
+                form.add_error('arquivo', erro)
+                if importador.importadas:
+                    self.message_user(request, f'{importador.importadas} documento(s) importado(s) antes do erro.',
+                                      messages.WARNING)
+                importador = None
+            else:
+                self.message_user(request, f'{importador.importadas} documento(s) importado(s), '
+                                           f'{len(importador.rejeitadas)} linha(s) rejeitada(s).')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Importar {self.model._meta.verbose_name_plural}',
+            'form': form,
+            'importador': importador,
+        }
+        return TemplateResponse(request, 'admin/Documentos/importar.html', context)
+
+class DespachoForm(forms.Form):
+    para = forms.ModelChoiceField(label='Para', queryset=get_user_model().objects.filter(is_active=True)
+                                  .order_by('first_name', 'last_name', 'username'))
+    status = forms.ChoiceField(label='Recebido', choices=Tramitacao.TIPO_CHOICES_STATUS, initial='Nao')
+
+class OperacoesLoteAdminMixin:
+    # Ações sobre os documentos selecionados (ou todos os da lista filtrada): despachar para um
+    # usuário e mudar o status, com INSERT/UPDATE em lote em uma transação (ver operacoes.py).
+    # Cada admin lista as ações em `actions` junto com as dos demais mixins.
+
+    @admin.action(description='Despachar selecionados', permissions=['despachar'])
+    def despachar(self, request, queryset):
+        form = DespachoForm(request.POST if 'aplicar' in request.POST else None)
+        if form.is_valid():
+            para = form.cleaned_data['para']
+            try:
+                tramitacoes = operacoes.despachar(queryset, request.user, para, form.cleaned_data['status'])
+            except ValidationError as erro:
+                self.message_user(request, ' '.join(erro.messages), messages.ERROR)
+            else:
+                self.message_user(request, f'{len(tramitacoes)} documento(s) despachado(s) para {para}.')
+            return None
+        select_across = request.POST.get('select_across') == '1'
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Despachar {self.model._meta.verbose_name_plural}',
+            'form': form,
+            'quantidade': queryset.count(),
+            'select_across': select_across,
+            'selecionados': [] if select_across else request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/Documentos/despachar.html', context)
+
+    def has_despachar_permission(self, request):
+        return request.user.has_perm('Documentos.add_tramitacao')
+
+    @admin.action(description='Marcar selecionados como concluídos', permissions=['change'])
+    def concluir(self, request, queryset):
+        self.aplicar_status(request, queryset, 'Concluido')
+
+    @admin.action(description='Marcar selecionados como arquivados', permissions=['change'])
+    def arquivar(self, request, queryset):
+        self.aplicar_status(request, queryset, 'Arquivado')
+
+    @admin.action(description='Reabrir selecionados', permissions=['change'])
+    def reabrir(self, request, queryset):
+        self.aplicar_status(request, queryset, 'Aberto')
+
+    def aplicar_status(self, request, queryset, status):
+        try:
+            alterados = operacoes.alterar_status(queryset, status)
+        except ValidationError as erro:
+            self.message_user(request, ' '.join(erro.messages), messages.ERROR)
+            return
+        rotulo = dict(Documento.TIPO_CHOICES_STATUS)[status]
+        self.message_user(request, f'{alterados} documento(s) alterado(s) para {rotulo}.')
+
+class HistoricoDocumentoMixin:
+    # O botão "Histórico" do formulário mostra a linha do tempo do documento e das suas tramitações,
+    # lida do histórico particionado (ver auditoria.py), no lugar do registro de ações do admin
+    def history_view(self, request, object_id, extra_context=None):
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Histórico: {obj}',
+            'opts': self.opts,
+            'object': obj,
+            'eventos': auditoria.linha_tempo(obj),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/Documentos/historico.html', context)
 
 @admin.register(Setor)
 class SetorAdmin(admin.ModelAdmin):
@@ -11,28 +392,49 @@ class SetorAdmin(admin.ModelAdmin):
     # Define a ordem padrão dos objetos
     ordering = ('sigla_setor',)
 
+@admin.register(Assunto)
+class AssuntoAdmin(admin.ModelAdmin):
+    list_display = ('nome',)
+
+    # Assuntos novos entram aqui, sem alterar o código; o catálogo é relido por referencias.assuntos()
+    search_fields = ['nome']
+
+    ordering = ('nome',)
+
 @admin.register(Servidor)
-class ServidorAdmin(admin.ModelAdmin):
+class ServidorAdmin(ReferenciasCacheMixin, admin.ModelAdmin):
     list_display= ('nome','setor_servidor','data_entrada','data_saida','ativo')
 
+    # Carrega as chaves estrangeiras exibidas na lista com JOIN, evitando uma consulta por linha
+    list_select_related = ('setor_servidor',)
+
     # Configura o campo ForeignKey para usar autocomplete
     autocomplete_fields = ['setor_servidor']
     
     # Define a ordem padrão
     ordering = ('nome','ativo')
 
+    list_filter = ('ativo',)
+
     search_fields = ('nome',)
 
 @admin.register(Documento)
-class DocumentoAdmin(admin.ModelAdmin):
-    search_fields = ['numero_documento','']  # Campo a ser usado para a busca no autocomplete
+class DocumentoAdmin(BuscaDocumentoMixin, admin.ModelAdmin):
+    search_fields = ['texto_busca']  # Campo a ser usado para a busca no autocomplete
 
     def has_module_permission(self, request):
         # Isso oculta o modelo do menu principal do admin
         return False
 
+    def get_urls(self):
+        urls = [
+            path('autocomplete/', self.admin_site.admin_view(DocumentoAutocompleteView.as_view(admin_site=self.admin_site)),
+                 name='Documentos_documento_autocomplete'),
+        ]
+        return urls + super().get_urls()
+
 @admin.register(Processo)
-class ProcessoAdmin(admin.ModelAdmin):
+class ProcessoAdmin(PaginacaoPorChaveMixin, ReferenciasCacheMixin, PreviaAnexoMixin, ImportacaoAdminMixin, HistoricoDocumentoMixin, OperacoesLoteAdminMixin, ExportacaoCsvMixin, BuscaDocumentoMixin, admin.ModelAdmin):
     # Define a ordem e a seleção dos campos exibidos na página de edição/detalhe de um modelo no Django Admin.
     fields = (
         'numero_processo', 
@@ -45,18 +447,25 @@ class ProcessoAdmin(admin.ModelAdmin):
         'data_conclusao',
         'observacao', 
         'anexo',
+        'previa_anexo',
     )
     # Define quais colunas são exibidas na lista de objetos de um modelo (a visão em tabela no Django Admin). 
     list_display = ('numero_processo', 'requerente','assunto', 'data_abertura', 'setor','status','responsavel','data_conclusao','observacao','anexo','get_usuario')
+
+    # Carrega as chaves estrangeiras exibidas na lista com JOIN, evitando uma consulta por linha
+    list_select_related = ('setor', 'responsavel', 'usuario', 'assunto')
     
     # Configura o campo ForeignKey para usar autocomplete
     autocomplete_fields = ['setor', 'responsavel']
     
-    # Campos a serem filtrados na barra lateral
-    #list_filter = ('data_entrada', 'data_saida')
+    # Campos a serem filtrados na barra lateral (e o arquivo)
+    list_filter = ('status', ArquivoListFilter)
+
+    # Exportação CSV e operações em lote sobre os selecionados
+    actions = ['exportar_csv', 'despachar', 'concluir', 'arquivar', 'reabrir']
     
-    # Campos para busca na interface administrativa
-    search_fields = ('numero_processo', 'requerente','assunto')
+    # Campos para busca na interface administrativa (número, requerente e assunto, via busca.py)
+    search_fields = ('texto_busca',)
     
     # Campos que podem ser editados diretamente na lista de objetos
     #list_editable = ('data_saida',)
@@ -64,6 +473,49 @@ class ProcessoAdmin(admin.ModelAdmin):
     # Define a ordem padrão dos objetos
     ordering = ('-data_abertura',)
     
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'relatorio_assuntos': True, **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        urls = [
+            path('relatorio-assuntos/', self.admin_site.admin_view(self.relatorio_assuntos_view),
+                 name='Documentos_processo_relatorio_assuntos'),
+        ]
+        return urls + super().get_urls()
+
+    def relatorio_assuntos_view(self, request):
+        # Processos da lista (com os filtros e a busca aplicados) por assunto e status: o GROUP BY usa
+        # a chave smallint do assunto, e os nomes vêm do catálogo em memória, sem JOIN
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        with roteamento.ler_da_replica():
+            try:
+                changelist = self.get_changelist_instance(request)
+            except IncorrectLookupParameters:
+                return HttpResponseRedirect(reverse('admin:Documentos_processo_changelist'))
+            agrupados = changelist.queryset.order_by().values_list('assunto', 'status').annotate(total=Count('pk'))
+            totais = {(assunto, status): total for assunto, status, total in agrupados}
+        nomes = referencias.assuntos()
+        status = Documento.TIPO_CHOICES_STATUS
+        # [(assunto, [total por status], total, lista filtrada pelo assunto)], dos mais frequentes aos menos
+        linhas = []
+        for assunto in {assunto for assunto, _ in totais}:
+            por_status = [totais.get((assunto, valor), 0) for valor, _ in status]
+            linhas.append((nomes.get(assunto, assunto), por_status, sum(por_status),
+                           changelist.get_query_string({'assunto__exact': assunto})))
+        linhas.sort(key=lambda linha: (-linha[2], str(linha[0])))
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Processos por assunto',
+            'status': status,
+            'linhas': linhas,
+            'totais': [sum(linha[1][posicao] for linha in linhas) for posicao in range(len(status))],
+            'total': sum(linha[2] for linha in linhas),
+        }
+        return TemplateResponse(request, 'admin/Documentos/relatorio_assuntos.html', context)
+
     # Serve para mostrar o nome do usuário que cadastrou o processo
     def save_model(self, request, obj, form, change):
         # Atribuir o request ao objeto para que ele possa ser usado no método save do modelo
@@ -78,7 +530,7 @@ class ProcessoAdmin(admin.ModelAdmin):
     get_usuario.short_description = 'Cadastrado por:'
 
 @admin.register(Oficio)
-class OficioAdmin(admin.ModelAdmin):
+class OficioAdmin(PaginacaoPorChaveMixin, ReferenciasCacheMixin, PreviaAnexoMixin, ImportacaoAdminMixin, HistoricoDocumentoMixin, OperacoesLoteAdminMixin, ExportacaoCsvMixin, BuscaDocumentoMixin, admin.ModelAdmin):
     # Define a ordem e a seleção dos campos exibidos na página de edição/detalhe de um modelo no Django Admin.
     fields = (
         'numero_oficio', 
@@ -91,19 +543,29 @@ class OficioAdmin(admin.ModelAdmin):
         'data_conclusao',
         'observacao', 
         'anexo',
+        'previa_anexo',
     )
     # Define quais colunas são exibidas na lista de objetos de um modelo (a visão em tabela no Django Admin).     
     list_display=('numero_oficio','assunto','data_abertura','prazo','data_vencimento','setor','status',
                   'responsavel','data_conclusao','observacao', 'anexo')
 
-    # Campos para busca na interface administrativa
-    search_fields = ('numero_oficio', 'assunto','data_vencimento')
+    # Carrega as chaves estrangeiras exibidas na lista com JOIN, evitando uma consulta por linha
+    list_select_related = ('setor', 'responsavel')
+
+    # Campos para busca na interface administrativa (número, assunto e vencimento, via busca.py)
+    search_fields = ('texto_busca',)
     
     # Configura o campo ForeignKey para usar autocomplete
     autocomplete_fields = ['setor','responsavel']
     
     # Campos que podem ser editados diretamente na lista de objetos
     #list_editable = ('data_saida',)
+
+    # Filtro por status e pelo arquivo na barra lateral
+    list_filter = ('status', ArquivoListFilter)
+
+    # Exportação CSV e operações em lote sobre os selecionados
+    actions = ['exportar_csv', 'despachar', 'concluir', 'arquivar', 'reabrir']
     
     # Define a ordem padrão dos objetos
     ordering = ('data_vencimento',)
@@ -113,7 +575,7 @@ class OficioAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(CadastroEmail)
-class EmailAdmin(admin.ModelAdmin):
+class EmailAdmin(PaginacaoPorChaveMixin, ReferenciasCacheMixin, PreviaAnexoMixin, HistoricoDocumentoMixin, OperacoesLoteAdminMixin, ExportacaoCsvMixin, BuscaDocumentoMixin, admin.ModelAdmin):
     # Define a ordem e a seleção dos campos exibidos na página de edição/detalhe de um modelo no Django Admin.
     fields = (
         'remetente',
@@ -126,24 +588,34 @@ class EmailAdmin(admin.ModelAdmin):
         'data_conclusao',
         'observacao', 
         'anexo',
+        'previa_anexo',
     )
     list_display = ('remetente','email','assunto','setor','data_abertura',
                     'status','data_conclusao','observacao', 'anexo')
 
-    # Campos para busca na interface administrativa
-    search_fields = ('remetente','email','assunto')
+    # Carrega as chaves estrangeiras exibidas na lista com JOIN, evitando uma consulta por linha
+    list_select_related = ('setor',)
+
+    # Campos para busca na interface administrativa (remetente, e-mail e assunto, via busca.py)
+    search_fields = ('texto_busca',)
     
     # Configura o campo ForeignKey para usar autocomplete
     autocomplete_fields = ['setor','responsavel']
 
     # Campos que podem ser editados diretamente na lista de objetos
     #list_editable = ('data_saida',)
+
+    # Filtro por status e pelo arquivo na barra lateral
+    list_filter = ('status', ArquivoListFilter)
+
+    # Exportação CSV e operações em lote sobre os selecionados
+    actions = ['exportar_csv', 'despachar', 'concluir', 'arquivar', 'reabrir']
     
     # Define a ordem padrão dos objetos
     ordering = ('-data_abertura',)
 
 @admin.register(OrdemServico)
-class OrdemServicoAdmin(admin.ModelAdmin):
+class OrdemServicoAdmin(ReferenciasCacheMixin, PreviaAnexoMixin, ImportacaoAdminMixin, HistoricoDocumentoMixin, OperacoesLoteAdminMixin, ExportacaoCsvMixin, BuscaDocumentoMixin, admin.ModelAdmin):
     # Define a ordem e a seleção dos campos exibidos na página de edição/detalhe de um modelo no Django Admin.
     fields = (
         'numero_os',
@@ -155,39 +627,62 @@ class OrdemServicoAdmin(admin.ModelAdmin):
         'data_conclusao',
         'observacao', 
         'anexo',
+        'previa_anexo',
     )
     
     list_display = ('numero_os','responsavel','assunto','setor','data_abertura','status','data_conclusao','observacao')
 
+    # Carrega as chaves estrangeiras exibidas na lista com JOIN, evitando uma consulta por linha
+    list_select_related = ('responsavel', 'setor')
+
     # Configura o campo ForeignKey para usar autocomplete
     autocomplete_fields = ['responsavel', 'setor']
 
-    # Campos para busca na interface administrativa
-    search_fields = ('numero_os','assunto','responsavel__nome')
+    # Campos para busca na interface administrativa (número, assunto e responsável, via busca.py)
+    search_fields = ('texto_busca',)
     
     # Campos que podem ser editados diretamente na lista de objetos
     #list_editable = ('data_saida',)
+
+    # Filtro por status e pelo arquivo na barra lateral
+    list_filter = ('status', ArquivoListFilter)
+
+    # Exportação CSV e operações em lote sobre os selecionados
+    actions = ['exportar_csv', 'despachar', 'concluir', 'arquivar', 'reabrir']
     
     # Define a ordem padrão dos objetos
     ordering = ('-data_abertura',)
 
 @admin.register(Tramitacao)
-class TramitacaoAdmin(admin.ModelAdmin):
+class TramitacaoAdmin(PaginacaoPorChaveMixin, BuscaDocumentoMixin, admin.ModelAdmin):
     fields = ('num_documento', 'para','status')
     list_display = ('num_documento','get_de_nome_completo', 'get_para_nome_completo','criado','modificado','status')#,'criado','modificado')
 
-    # Configura o campo ForeignKey para usar autocomplete
-    autocomplete_fields = ['num_documento']
+    # Carrega documento (com o rótulo já armazenado), remetente e destinatário com JOIN
+    list_select_related = ('num_documento', 'de', 'para')
+
+    change_list_template = 'admin/Documentos/change_list_por_chave.html'
+
+    # Despachos mais recentes primeiro (chave da paginação: criado, id)
+    ordering = ('-criado',)
+
+    # Tramitações em uso ou do arquivo
+    list_filter = (ArquivoListFilter,)
+
+    # O campo num_documento usa o autocomplete de documentos (ver formfield_for_foreignkey)
 
      
-   # Campos para busca na interface administrativa
-    search_fields = (
-        'num_documento__processo__numero_processo', 
-        'num_documento__oficio__numero_oficio', 
-        'num_documento__ordemservico__numero_os', 
-        'num_documento__cadastroemail__assunto'
-    )
+   # Campos para busca na interface administrativa: o índice de busca do documento
+    # cobre processos, ofícios, ordens de serviço e e-mails sem JOIN nas tabelas filhas
+    search_fields = ('num_documento__texto_busca',)
+    prefixo_busca = 'num_documento__'
+
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Autocomplete por prefixo do número/assunto, com paginação por chave
+        if db_field.name == 'num_documento':
+            kwargs['widget'] = DocumentoAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     def save_model(self, request, obj, form, change):
         if not change:
@@ -203,7 +698,27 @@ class TramitacaoAdmin(admin.ModelAdmin):
         return f"{obj.para.first_name} {obj.para.last_name}"
     get_para_nome_completo.short_description = 'Para (Nome Completo)'
    
+@admin.register(TarefaAnexo)
+class TarefaAnexoAdmin(admin.ModelAdmin):
+    list_display = ('anexo', 'documento', 'status', 'tentativas', 'executar_em', 'criado')
+    list_select_related = ('documento',)
+    list_filter = ('status',)
+    readonly_fields = ('documento', 'anexo', 'tentativas', 'erro', 'criado')
+    fields = ('documento', 'anexo', 'status', 'tentativas', 'executar_em', 'erro', 'criado')
+    actions = ['reprocessar']
+
+    def has_add_permission(self, request):
+        # As tarefas são criadas pelo save() do documento ao receber um anexo
+        return False
+
+    @admin.action(description='Reprocessar as tarefas selecionadas')
+    def reprocessar(self, request, queryset):
+        total = queryset.update(status='pendente', tentativas=0, executar_em=timezone.now(), erro='')
+        self.message_user(request, f'{total} tarefa(s) reenfileirada(s).')
+
 # Personalizando a interface administrativa
 admin.site.site_header = 'SEMADUR - SUFGI'
 admin.site.site_title = 'SUFGI'
 admin.site.index_title = 'ADMINISTRAÇÃO'
+# Autocomplete com as respostas de setores e servidores em cache
+admin.site.autocomplete_view = autocomplete_view
@@ -0,0 +1,65 @@
+import posixpath
+from itertools import chain
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Documento
+
+PASTA_ANEXOS = 'anexos'
+PASTA_MINIATURAS = 'miniaturas'
+# Nomes já endereçados pelo conteúdo: anexos/ab/<sha256>.<extensão>
+ENDERECADO_POR_CONTEUDO = r'^anexos/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]+)?$'
+
+
+def armazenamento():
+    return Documento._meta.get_field('anexo').storage
+
+
+def converter_anexos_antigos(simular=False):
+    # Regrava pelo conteúdo os anexos enviados antes do endereçamento por hash e aponta para
+    # o novo nome todos os documentos que usavam o antigo; as cópias antigas ficam sem
+    # referência e são removidas por coletar_anexos.
+    antigos = (Documento.todos.exclude(Q(anexo='') | Q(anexo__isnull=True) | Q(anexo__regex=ENDERECADO_POR_CONTEUDO))
+               .values_list('anexo', flat=True).distinct().order_by('anexo'))
+    convertidos = {}
+    for nome in antigos.iterator():
+        if simular:
+            convertidos[nome] = None
+            continue
+        with armazenamento().open(nome) as arquivo:
+            novo = armazenamento().save(nome, arquivo)
+        Documento.todos.filter(anexo=nome).update(anexo=novo)
+        convertidos[nome] = novo
+    return convertidos
+
+
+def arquivos_armazenados(pasta):
+    # Percorre a pasta de anexos, devolvendo os nomes agrupados por diretório
+    try:
+        diretorios, arquivos = armazenamento().listdir(pasta)
+    except FileNotFoundError:
+        return
+    if arquivos:
+        yield [posixpath.join(pasta, arquivo) for arquivo in arquivos]
+    for diretorio in diretorios:
+        yield from arquivos_armazenados(posixpath.join(pasta, diretorio))
+
+
+def coletar_anexos(carencia=timedelta(hours=24), simular=False):
+    # Remove os anexos e miniaturas que nenhum documento referencia. As referências de cada diretório
+    # são contadas pelos índices documento_anexo e documento_miniatura. Arquivos mais novos que a
+    # carência são mantidos: o upload grava o arquivo antes de o documento ser salvo.
+    limite = timezone.now() - carencia
+    removidos = []
+    for nomes in chain(arquivos_armazenados(PASTA_ANEXOS), arquivos_armazenados(PASTA_MINIATURAS)):
+        referenciados = set(Documento.todos.filter(anexo__in=nomes).values_list('anexo', flat=True))
+        referenciados.update(Documento.todos.filter(miniatura__in=nomes).values_list('miniatura', flat=True))
+        for nome in nomes:
+            if nome in referenciados or armazenamento().get_modified_time(nome) > limite:
+                continue
+            if not simular:
+                armazenamento().delete(nome)
+            removidos.append(nome)
+    return removidos
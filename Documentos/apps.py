@@ -5,4 +5,8 @@ class DashboardDocumentosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Documentos'
     # Configura o painel admin do django para aparecer esse nome no lugar do nome da aplicação
-    verbose_name = 'Administração'
\ No newline at end of file
+    verbose_name = 'Administração'
+
+    def ready(self):
+        # Conecta os sinais que invalidam o cache das tabelas de referência e que registram o histórico
+        from . import auditoria, referencias  # noqa: F401
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import posixpath
+from abc import ABC, abstractmethod
+from urllib.parse import quote
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.urls import reverse
+
+
+def anexos():
+    # Storage do campo Documento.anexo; o backend é escolhido em settings.STORAGES['anexos']
+    return storages['anexos']
+
+
+class AnexosMixin(ABC):
+    # Os links dos anexos apontam para views.AnexoView, que confere a permissão do usuário
+    # e devolve ao nginx, via X-Accel-Redirect, o endereço interno de onde servir o arquivo.
+    #
+    # Os arquivos são endereçados pelo conteúdo (<pasta>/<ab>/<sha256><extensão>): o mesmo PDF
+    # anexado ao processo, ao ofício e ao e-mail é gravado uma única vez e os documentos apontam
+    # para o mesmo nome. Arquivos sem referência são removidos pelo comando coletar_anexos.
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.nome_por_conteudo(name, content)
+        if self.exists(name):
+            # Conteúdo já gravado: renova a data de modificação, para que coletar_anexos não remova,
+            # antes de o documento ser salvo, um arquivo que estava sem referência
+            self.tocar(name)
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    @staticmethod
+    def nome_por_conteudo(name, content):
+        # SHA-256 calculado em blocos, sem carregar o arquivo inteiro na memória
+        resumo = hashlib.sha256()
+        for bloco in content.chunks():
+            resumo.update(bloco)
+        digest = resumo.hexdigest()
+        pasta = posixpath.dirname(name)
+        extensao = posixpath.splitext(name)[1].lower()[:10]
+        return posixpath.join(pasta, digest[:2], digest + extensao)
+
+    def url(self, name):
+        return reverse('Documentos:anexo', args=[name])
+
+    @abstractmethod
+    def tocar(self, name):
+        # Renova a data de modificação do arquivo
+        ...
+
+    @abstractmethod
+    def caminho_interno(self, name):
+        # Endereço entregue ao nginx no X-Accel-Redirect
+        ...
+
+
+class AnexosLocais(AnexosMixin, FileSystemStorage):
+    # Anexos em MEDIA_ROOT, um volume compartilhado pelos contêineres da aplicação e pelo nginx
+    # (location interna /anexos-internos/ em docker/config/nginx.conf).
+    prefixo_interno = '/anexos-internos/'
+
+    def tocar(self, name):
+        os.utime(self.path(name))
+
+    def caminho_interno(self, name):
+        return self.prefixo_interno + quote(name)
@@ -0,0 +1,26 @@
+from urllib.parse import urlsplit
+
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+from .armazenamento import AnexosMixin
+
+
+class AnexosS3(AnexosMixin, S3Storage):
+    # Anexos num bucket privado compatível com S3 (AWS, MinIO). Depende do django-storages[s3].
+    # O nginx repassa ao bucket a requisição já assinada por aqui (location /anexos-s3/),
+    # então o arquivo não passa pelo gunicorn e o bucket não precisa ser público.
+    prefixo_interno = '/anexos-s3'
+
+    def tocar(self, name):
+        # O S3 não altera a data de um objeto existente: a cópia sobre ele mesmo renova o LastModified
+        objeto = self.bucket.Object(self._normalize_name(clean_name(name)))
+        objeto.copy_from(CopySource={'Bucket': self.bucket_name, 'Key': objeto.key}, MetadataDirective='REPLACE',
+                         ContentType=objeto.content_type, Metadata=objeto.metadata)
+
+    def url_assinada(self, name):
+        return S3Storage.url(self, name)
+
+    def caminho_interno(self, name):
+        endereco = urlsplit(self.url_assinada(name))
+        return f'{self.prefixo_interno}{endereco.path}?{endereco.query}'
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Documento, Tramitacao
+
+# Status dos documentos que podem ir para o arquivo
+STATUS_ARQUIVAVEIS = ('Concluido', 'Arquivado')
+
+
+def candidatos(limite, status=STATUS_ARQUIVAVEIS):
+    # Documentos em uso encerrados antes de `limite` (ou abertos antes, se a conclusão não foi
+    # registrada), sem tramitação à espera de recebimento
+    pendentes = Tramitacao.todos.filter(num_documento=models.OuterRef('pk'), status='Nao')
+    return (Documento.objects.filter(status__in=status)
+            .filter(models.Q(data_conclusao__lt=limite) |
+                    models.Q(data_conclusao__isnull=True, data_abertura__lt=limite))
+            .exclude(models.Exists(pendentes)))
+
+
+def em_lotes(consulta, mover, lote):
+    # Move as linhas de `consulta` em transações de até `lote` linhas, para não bloquear as listas
+    # por muito tempo; as bloqueadas por outra transação ficam para a próxima execução
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(consulta.select_for_update(skip_locked=True, of=('self',)).order_by('pk').values_list('pk', flat=True)[:lote])
+            if not ids:
+                return total
+            total += mover(ids)
+
+
+def arquivar(dias, status=STATUS_ARQUIVAVEIS, lote=1000, simular=False):
+    # Leva para o arquivo os documentos encerrados há mais de `dias` dias e as suas tramitações, e
+    # também as tramitações recebidas depois que o documento foi arquivado. Devolve (documentos, tramitações).
+    limite = timezone.localdate() - timedelta(days=dias)
+    documentos = candidatos(limite, status)
+    recebidas = Tramitacao.objects.filter(status='Sim', num_documento__arquivo=True)
+    if simular:
+        return documentos.count(), recebidas.count()
+    total_documentos = em_lotes(documentos, lambda ids: Documento.todos.filter(pk__in=ids).arquivar(), lote)
+    total_tramitacoes = em_lotes(recebidas, lambda ids: Tramitacao.todos.filter(pk__in=ids).update(arquivo=True), lote)
+    if total_documentos or total_tramitacoes:
+        # Estatísticas novas para o planejador escolher os índices parciais e estimar as contagens das listas
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{Documento._meta.db_table}", "{Tramitacao._meta.db_table}"')
+    return total_documentos, total_tramitacoes
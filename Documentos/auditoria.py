@@ -0,0 +1,178 @@
+import logging
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import referencias
+from .models import Assunto, CadastroEmail, Documento, EventoDocumento, Oficio, OrdemServico, Processo, Servidor, Setor, Tramitacao
+
+logger = logging.getLogger(__name__)
+
+MODELOS = (Processo, Oficio, CadastroEmail, OrdemServico, Tramitacao)
+# Campos calculados ou mantidos pela aplicação, que não entram no histórico
+CAMPOS_IGNORADOS = {
+    'id', 'documento_ptr_id', 'criado', 'modificado', 'usuario_id', 'tipo', 'rotulo', 'texto_busca',
+    'rotulo_busca', 'vetor_busca', 'texto_anexo', 'miniatura', 'ultima_tramitacao_id', 'detentor_id',
+    'data_vencimento', 'vencimento_em_aberto', 'num_documento_id', 'arquivo',
+}
+
+# Eventos da requisição atual, gravados juntos ao final dela (ver AuditoriaMiddleware)
+_pendentes = ContextVar('eventos_pendentes', default=None)
+# Requisição atual, de onde vem o usuário dos eventos
+_requisicao = ContextVar('requisicao_auditoria', default=None)
+
+
+def campos(modelo):
+    return [campo for campo in modelo._meta.concrete_fields if campo.attname not in CAMPOS_IGNORADOS]
+
+
+def valor(campo, bruto):
+    # Anexos pelo nome do arquivo; os demais valores como o banco devolve (o JSON converte datas)
+    if isinstance(campo, models.FileField):
+        return getattr(bruto, 'name', bruto) or ''
+    return bruto
+
+
+def usuario_atual(instancia=None):
+    requisicao = _requisicao.get() or getattr(instancia, '_request', None)
+    usuario = getattr(requisicao, 'user', None)
+    return usuario if usuario is not None and usuario.is_authenticated else None
+
+
+def evento(instancia, acao, alteracoes, usuario=None):
+    tramitacao = isinstance(instancia, Tramitacao)
+    return EventoDocumento(
+        documento_id=instancia.num_documento_id if tramitacao else instancia.pk,
+        modelo=instancia._meta.model_name, objeto_id=instancia.pk, acao=acao,
+        usuario=usuario or usuario_atual(instancia), alteracoes=alteracoes, criado=timezone.now())
+
+
+def registrar(eventos):
+    # Os eventos só valem se a transação que fez as alterações for confirmada. Dentro de uma
+    # requisição, esperam o fim dela para um único INSERT; fora (comandos), são gravados no commit.
+    eventos = list(eventos)
+    if not eventos:
+        return
+
+    def guardar():
+        pendentes = _pendentes.get()
+        if pendentes is None:
+            EventoDocumento.objects.bulk_create(eventos)
+        else:
+            pendentes.extend(eventos)
+
+    transaction.on_commit(guardar)
+
+
+def alteracoes_criacao(instancia):
+    # Na criação, só os campos preenchidos
+    alteracoes = {}
+    for campo in campos(type(instancia)):
+        depois = valor(campo, getattr(instancia, campo.attname, None))
+        if depois not in (None, ''):
+            alteracoes[campo.attname] = [None, depois]
+    return alteracoes
+
+
+def registrar_importacao(documentos, usuario):
+    # Documentos gravados em lote pela importação (bulk_create não envia post_save)
+    registrar(evento(documento, EventoDocumento.CRIACAO, alteracoes_criacao(documento), usuario=usuario)
+              for documento in documentos)
+
+
+@receiver(post_save)
+def registrar_gravacao(sender, instance, created, raw=False, **kwargs):
+    if sender not in MODELOS or raw:
+        return
+    if created:
+        alteracoes = alteracoes_criacao(instance)
+    else:
+        alteracoes = {}
+        originais = getattr(instance, '_valores_originais', {})
+        for campo in campos(sender):
+            if originais.get(campo.attname, models.DEFERRED) is models.DEFERRED:
+                continue
+            antes, depois = valor(campo, originais[campo.attname]), valor(campo, getattr(instance, campo.attname))
+            if antes != depois:
+                alteracoes[campo.attname] = [antes, depois]
+    # A próxima gravação da mesma instância compara com o que acabou de ser salvo
+    instance._valores_originais = {campo.attname: getattr(instance, campo.attname, None)
+                                   for campo in sender._meta.concrete_fields if campo.attname in instance.__dict__}
+    if created or alteracoes:
+        registrar([evento(instance, EventoDocumento.CRIACAO if created else EventoDocumento.ALTERACAO, alteracoes)])
+
+
+@receiver(post_delete)
+def registrar_exclusao(sender, instance, **kwargs):
+    if sender not in MODELOS:
+        return
+    registrar([evento(instance, EventoDocumento.EXCLUSAO, {'rotulo': [str(instance), None]})])
+
+
+class AuditoriaMiddleware:
+    # Junta os eventos da requisição e grava todos em um INSERT ao final dela, com o usuário logado
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token_requisicao = _requisicao.set(request)
+        token_pendentes = _pendentes.set([])
+        try:
+            return self.get_response(request)
+        finally:
+            pendentes = _pendentes.get()
+            _pendentes.reset(token_pendentes)
+            _requisicao.reset(token_requisicao)
+            if pendentes:
+                try:
+                    EventoDocumento.objects.bulk_create(pendentes)
+                except Exception:
+                    # As alterações já foram confirmadas; a falha no histórico não desfaz a resposta
+                    logger.exception('Falha ao gravar %d evento(s) do histórico', len(pendentes))
+
+
+def linha_tempo(documento, limite=500):
+    # Eventos do documento e das suas tramitações, dos mais recentes para os mais antigos
+    # (índice eventodocumento_documento_criado em cada partição)
+    eventos = list(EventoDocumento.objects.filter(documento_id=documento.pk).select_related('usuario')
+                   .order_by('-criado', '-id')[:limite])
+    ids_usuarios = {pk for item in eventos for campo, valores in item.alteracoes.items()
+                    if campo in ('de_id', 'para_id') for pk in valores if pk}
+    nomes_usuarios = {usuario.pk: usuario.get_full_name() or usuario.get_username()
+                      for usuario in get_user_model().objects.filter(pk__in=ids_usuarios)}
+    for item in eventos:
+        item.descricao = descrever(item, nomes_usuarios)
+    return eventos
+
+
+def descrever(item, nomes_usuarios):
+    # [(campo, antes, depois)] com os nomes dos campos e os valores como aparecem nos formulários
+    modelo = next((modelo for modelo in MODELOS if modelo._meta.model_name == item.modelo), None)
+    linhas = []
+    for nome, (antes, depois) in item.alteracoes.items():
+        campo = next((campo for campo in campos(modelo) if campo.attname == nome), None) if modelo else None
+        if campo is None:
+            linhas.append((nome, antes, depois))
+            continue
+        linhas.append((campo.verbose_name, exibir(campo, antes, nomes_usuarios), exibir(campo, depois, nomes_usuarios)))
+    return linhas
+
+
+def exibir(campo, bruto, nomes_usuarios):
+    if bruto in (None, ''):
+        return ''
+    if campo.choices:
+        return dict(campo.flatchoices).get(bruto, bruto)
+    if campo.is_relation:
+        if campo.related_model is Assunto:
+            return referencias.assuntos().get(bruto, bruto)
+        if campo.related_model in (Setor, Servidor):
+            return referencias.rotulos(campo.related_model).get(str(bruto), bruto)
+        return nomes_usuarios.get(bruto, bruto)
+    if isinstance(campo, models.DateField) and not isinstance(campo, models.DateTimeField):
+        return campo.to_python(bruto).strftime('%d/%m/%Y')
+    return bruto
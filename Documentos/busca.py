@@ -0,0 +1,100 @@
+import unicodedata
+
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import Q, Value
+
+# Configuração de texto completo criada na migração 0003: dicionário português
+# precedido do unaccent, para que "oficio" encontre "Ofício".
+CONFIGURACAO_BUSCA = 'portugues_sem_acento'
+
+# Campos indexados por tipo de documento (os mesmos que a busca do admin usava)
+CAMPOS_BUSCA = {
+    'processo': ('numero_processo', 'requerente', 'assunto'),
+    'oficio': ('numero_oficio', 'assunto', 'data_vencimento'),
+    'ordemservico': ('numero_os', 'assunto', 'responsavel__nome'),
+    'cadastroemail': ('remetente', 'email', 'assunto'),
+}
+
+
+def normalizar(texto):
+    # Remove acentos e caixa para a busca por trigramas
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def valores_busca(documento, tipo):
+    # Lê os campos indexados, seguindo relações como 'responsavel__nome'
+    valores = []
+    for caminho in CAMPOS_BUSCA.get(tipo, ()):
+        valor = documento
+        for atributo in caminho.split('__'):
+            valor = getattr(valor, atributo, None)
+            if valor is None:
+                break
+        if valor is not None:
+            valores.append(str(valor))
+    return valores
+
+
+def texto_busca(valores):
+    return normalizar(' '.join(valores))
+
+
+def vetor_busca(rotulo, valores, texto_anexo=''):
+    # O rótulo tem peso maior que os demais campos, e o texto extraído do anexo o menor
+    vetor = (SearchVector(Value(rotulo), weight='A', config=CONFIGURACAO_BUSCA) +
+             SearchVector(Value(' '.join(valores)), weight='B', config=CONFIGURACAO_BUSCA))
+    if texto_anexo:
+        vetor += SearchVector(Value(texto_anexo), weight='C', config=CONFIGURACAO_BUSCA)
+    return vetor
+
+
+def reindexar(Documento, Subclasse, tipo, tamanho_lote=1000, filtros=None):
+    # Recalcula o índice de busca dos documentos de um tipo (todos, ou os que atendem a `filtros`), em lotes.
+    # Recebe os modelos como parâmetro para poder ser usada também nas migrações.
+    relacionados = [campo.split('__')[0] for campo in CAMPOS_BUSCA[tipo]
+                    if '__' in campo or Subclasse._meta.get_field(campo).is_relation]
+    documentos = Subclasse._default_manager.filter(**(filtros or {})).select_related(*relacionados)
+    total = 0
+    lote = []
+    for documento in documentos.iterator(chunk_size=tamanho_lote):
+        valores = valores_busca(documento, tipo)
+        lote.append(Documento(pk=documento.pk, texto_busca=texto_busca(valores),
+                              vetor_busca=vetor_busca(documento.rotulo, valores, getattr(documento, 'texto_anexo', ''))))
+        if len(lote) == tamanho_lote:
+            Documento._default_manager.bulk_update(lote, ['texto_busca', 'vetor_busca'])
+            total += len(lote)
+            lote = []
+    Documento._default_manager.bulk_update(lote, ['texto_busca', 'vetor_busca'])
+    return total + len(lote)
+
+
+def reindexar_relacionados(Documento, modelo, pk):
+    # Depois de renomear um registro de `modelo` (ex.: o nome de um servidor), recalcula o índice só dos
+    # documentos que o copiam nos campos de busca (ex.: 'responsavel__nome' das ordens de serviço)
+    total = 0
+    for Subclasse in Documento.__subclasses__():
+        tipo = Subclasse._meta.model_name
+        for caminho in CAMPOS_BUSCA.get(tipo, ()):
+            campo = Subclasse._meta.get_field(caminho.split('__')[0])
+            if campo.is_relation and campo.related_model is modelo:
+                total += reindexar(Documento, Subclasse, tipo, filtros={campo.name: pk})
+                break
+    return total
+
+
+def filtro_busca(termo, prefixo=''):
+    # Casa pelo índice de texto completo ou, para números e trechos de palavras,
+    # pelo índice de trigramas sobre o texto normalizado.
+    consulta = SearchQuery(termo, config=CONFIGURACAO_BUSCA, search_type='websearch')
+    trechos = Q()
+    for palavra in normalizar(termo).split():
+        trechos &= Q(**{f'{prefixo}texto_busca__contains': palavra})
+    return Q(**{f'{prefixo}vetor_busca': consulta}) | trechos
+
+
+def buscar(queryset, termo, prefixo=''):
+    termo = termo.strip()
+    if not termo:
+        return queryset
+    return queryset.filter(filtro_busca(termo, prefixo))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from . import referencias
+from .models import Tramitacao
+
+
+def caixa_entrada(request):
+    # Quantidade de tramitações pendentes exibida na barra superior do base.html.
+    # A contagem só é executada se o template usar a variável (consulta coberta pelo índice da caixa de entrada).
+    usuario = getattr(request, 'user', None)
+    if usuario is None or not usuario.is_authenticated:
+        return {}
+    return {'tramitacoes_pendentes': SimpleLazyObject(lambda: Tramitacao.objects.pendentes_para(usuario).count())}
+
+
+def cache_layout(request):
+    # Tempo dos fragmentos em cache do base.html e a versão do fragmento com o nome do usuário,
+    # trocada quando o usuário é alterado (ver referencias.py)
+    contexto = {'tempo_cache_layout': settings.CACHE_FRAGMENTOS_SEGUNDOS}
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        contexto['versao_usuario'] = SimpleLazyObject(lambda: referencias.versao('usuario', usuario.pk))
+    return contexto
@@ -0,0 +1,152 @@
+import math
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from .models import Documento, Processo, Tramitacao
+
+
+def changelist(modelo, parametros=None, usuario=None):
+    # A mesma ChangeList do admin (filtros, ordenação e JOINs), montada para um superusuário
+    model_admin = admin.site._registry[modelo]
+    request = RequestFactory().get(reverse(f'admin:Documentos_{modelo._meta.model_name}_changelist'),
+                                   parametros or {})
+    request.user = usuario or get_user_model()(is_superuser=True, is_staff=True, is_active=True)
+    return model_admin.get_changelist_instance(request)
+
+
+class ContadorConsultas:
+    # Conta as consultas executadas em todos os bancos (primário, réplica e conexão direta)
+    def __init__(self):
+        self.quantidade = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.quantidade += 1
+        return execute(sql, params, many, context)
+
+
+def resumir(tempos):
+    # Estatísticas em milissegundos; p95 pelo método do posto mais próximo
+    ordenados = sorted(tempos)
+    return {
+        'p50': round(statistics.median(ordenados) * 1000, 2),
+        'p95': round(ordenados[math.ceil(0.95 * len(ordenados)) - 1] * 1000, 2),
+        'media': round(statistics.fmean(ordenados) * 1000, 2),
+        'minimo': round(ordenados[0] * 1000, 2),
+    }
+
+
+class Medidor:
+    # Mede as telas e operações principais pelo cliente de testes do Django, passando por URLs,
+    # middlewares, admin e templates como uma requisição real (sem o servidor HTTP). Cada cenário
+    # é executado uma vez para aquecer conexões e cache e depois `repeticoes` vezes.
+
+    CENARIOS = ('dashboard', 'processos', 'processos_abertos', 'oficios', 'tramitacoes', 'busca',
+                'autocomplete_documento', 'autocomplete_servidor', 'caixa_entrada', 'processos_pagina_chave',
+                'processos_arquivo', 'despacho')
+
+    def __init__(self, usuario, repeticoes=20, termo='oficio', profundidade=1000):
+        self.usuario = usuario
+        self.repeticoes = repeticoes
+        self.termo = termo
+        self.profundidade = profundidade
+        self.cliente = Client()
+        self.cliente.force_login(usuario)
+
+    def cenarios(self):
+        # {nome: (descrição, função que faz a requisição)}; cenários sem dados ficam de fora.
+        # As requisições devem responder 200, e o despacho redirecionar (302) depois de gravar.
+        cenarios = {
+            'dashboard': ('Página inicial com os totais', self.get(reverse('Documentos:index'))),
+            'processos': ('Lista de processos, primeira página', self.get(self.lista('processo'))),
+            'processos_abertos': ('Lista de processos filtrada por status',
+                                  self.get(self.lista('processo'), {'status__exact': 'Aberto'})),
+            'processos_arquivo': ('Lista de processos do arquivo',
+                                  self.get(self.lista('processo'), {'arquivo': '1'})),
+            'oficios': ('Lista de ofícios', self.get(self.lista('oficio'))),
+            'tramitacoes': ('Lista de tramitações', self.get(self.lista('tramitacao'))),
+            'busca': ('Busca textual na lista de processos', self.get(self.lista('processo'), {'q': self.termo})),
+            'autocomplete_documento': ('Autocomplete de documentos', self.get(
+                reverse('admin:Documentos_documento_autocomplete'),
+                {'term': self.termo, 'app_label': 'Documentos', 'model_name': 'tramitacao',
+                 'field_name': 'num_documento'})),
+            'autocomplete_servidor': ('Autocomplete de servidores', self.get(
+                reverse('admin:autocomplete'),
+                {'term': 'servidor', 'app_label': 'Documentos', 'model_name': 'processo',
+                 'field_name': 'responsavel'})),
+            'caixa_entrada': ('Caixa de entrada do usuário', self.get(reverse('Documentos:caixa_entrada'))),
+        }
+        cl = changelist(Processo, usuario=self.usuario)
+        linha = cl.queryset[self.profundidade - 1:self.profundidade].first()
+        cl.chave = cl.campos_chave()
+        if linha is not None and cl.chave:
+            cenarios['processos_pagina_chave'] = (
+                'Lista de processos após a linha --profundidade',
+                self.get(self.lista('processo'), {'apos': cl.cursor(linha)}))
+        documento = Documento.objects.order_by('-pk').values_list('pk', flat=True).first()
+        if documento is not None:
+            cenarios['despacho'] = ('Tramitação cadastrada pelo admin (desfeita ao final)', self.despacho(documento))
+        return cenarios
+
+    def lista(self, nome_modelo):
+        return reverse(f'admin:Documentos_{nome_modelo}_changelist')
+
+    def get(self, url, parametros=None):
+        def requisitar():
+            return self.cliente.get(url, parametros or {})
+        return requisitar
+
+    def despacho(self, documento):
+        url = reverse('admin:Documentos_tramitacao_add')
+        dados = {'num_documento': documento, 'para': self.usuario.pk, 'status': 'Nao'}
+
+        def requisitar():
+            # A gravação é desfeita: repetir o cenário não altera o volume medido
+            with transaction.atomic():
+                resposta = self.cliente.post(url, dados)
+                transaction.set_rollback(True)
+            return resposta
+        requisitar.status_esperado = 302
+        return requisitar
+
+    def medir(self, requisitar):
+        resposta = requisitar()
+        if resposta.status_code != getattr(requisitar, 'status_esperado', 200):
+            return {'erro': f'HTTP {resposta.status_code}'}
+        contador = ContadorConsultas()
+        tempos = []
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(contador))
+            for _ in range(self.repeticoes):
+                inicio = time.perf_counter()
+                requisitar()
+                tempos.append(time.perf_counter() - inicio)
+        return {**resumir(tempos), 'consultas': contador.quantidade // self.repeticoes}
+
+    def executar(self, escolhidos=None, ao_medir=None):
+        resultados = {}
+        for nome, (descricao, requisitar) in self.cenarios().items():
+            if escolhidos and nome not in escolhidos:
+                continue
+            resultados[nome] = self.medir(requisitar)
+            if ao_medir:
+                ao_medir(nome, descricao, resultados[nome])
+        return resultados
+
+    def encerrar(self):
+        self.cliente.logout()
+
+
+def volumes():
+    return {
+        'documentos': Documento.todos.count(),
+        'processos': Processo.todos.count(),
+        'tramitacoes': Tramitacao.todos.count(),
+    }
@@ -0,0 +1,275 @@
+import csv
+import zipfile
+from collections import Counter
+from datetime import date, datetime
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, connections, models, router, transaction
+
+from . import auditoria, busca, referencias
+from .models import Assunto, ContagemDocumento, Documento, Oficio, OrdemServico, Processo, Servidor, Setor
+
+# Tipos de documento aceitos pela importação (nome usado no comando e na URL do admin)
+MODELOS_IMPORTACAO = {
+    'processo': Processo,
+    'oficio': Oficio,
+    'ordemservico': OrdemServico,
+}
+
+FORMATOS_DATA = ('%d/%m/%Y', '%Y-%m-%d')
+
+
+def linhas_texto(arquivo):
+    # Decodifica o arquivo linha a linha como UTF-8 (com ou sem BOM). Na primeira linha inválida, passa a
+    # cp1252, o padrão do Excel no Windows em português: as linhas anteriores, só com ASCII, são iguais
+    # nas duas codificações.
+    codificacao = 'utf-8-sig'
+    for linha in arquivo:
+        if codificacao != 'cp1252':
+            try:
+                texto = linha.decode(codificacao)
+            except UnicodeDecodeError:
+                codificacao = 'cp1252'
+            else:
+                codificacao = 'utf-8'  # o BOM só pode estar no início
+                yield texto
+                continue
+        yield linha.decode(codificacao, errors='replace')
+
+
+def ler_csv(arquivo):
+    # Lê o CSV em streaming (linha a linha); aceita ',', ';' ou tabulação como separador
+    texto = linhas_texto(arquivo)
+    cabecalho = next(texto, '')
+    try:
+        dialeto = csv.Sniffer().sniff(cabecalho, delimiters=',;\t')
+    except csv.Error:
+        # Cabeçalho com uma coluna só (ou sem separador reconhecível)
+        dialeto = csv.excel
+    colunas = [coluna.strip().lower() for coluna in next(csv.reader([cabecalho], dialeto), [])]
+    return linhas_csv(csv.DictReader(texto, fieldnames=colunas, dialect=dialeto))
+
+
+def linhas_csv(leitor):
+    try:
+        yield from leitor
+    except csv.Error as erro:
+        raise ValidationError(f'Arquivo CSV inválido (linha {leitor.line_num}): {erro}')
+
+
+def ler_xlsx(arquivo):
+    # openpyxl em modo somente leitura percorre a planilha sem carregá-la inteira na memória
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True).active
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as erro:
+        raise ValidationError(f'Arquivo XLSX inválido: {erro}')
+    return linhas_xlsx(planilha.iter_rows(values_only=True))
+
+
+def linhas_xlsx(linhas):
+    colunas = [str(coluna).strip().lower() if coluna is not None else '' for coluna in next(linhas, ())]
+    for valores in linhas:
+        if any(valor not in (None, '') for valor in valores):
+            yield dict(zip(colunas, valores))
+
+
+def ler_arquivo(arquivo, nome):
+    # Abre o arquivo e devolve as linhas {coluna: valor}. Arquivos ilegíveis levantam ValidationError,
+    # aqui ou ao percorrer as linhas.
+    if nome.lower().endswith('.xlsx'):
+        return ler_xlsx(arquivo)
+    return ler_csv(arquivo)
+
+
+class Importador:
+    # Importa processos, ofícios ou ordens de serviço a partir de linhas {coluna: valor}.
+    # As colunas têm o nome dos campos do modelo; 'setor' recebe a sigla, 'responsavel' o nome do servidor
+    # e 'assunto' (processos) o nome do assunto, com ou sem acentos.
+    # Cada linha é validada com as regras do modelo (clean_fields/clean) e as válidas são gravadas em lotes.
+
+    def __init__(self, modelo, usuario=None, tamanho_lote=1000):
+        self.modelo = modelo
+        self.usuario = usuario
+        self.tamanho_lote = tamanho_lote
+        self.campo_numero = modelo.campo_rotulo
+        self.campos = [campo for campo in modelo._meta.concrete_fields
+                       if campo.editable and not campo.primary_key and campo.name != 'anexo']
+        self.escolhas = {campo.name: self.mapa_escolhas(campo) for campo in self.campos if campo.choices}
+        self.setores = {}
+        self.servidores = {}
+        # Catálogo de assuntos pelo nome normalizado, lido da memória do processo (sem consulta por linha)
+        self.assuntos = {busca.normalizar(nome): Assunto(pk=pk, nome=nome) for pk, nome in referencias.assuntos().items()}
+        self.numeros = set()
+        self.importadas = 0
+        self.rejeitadas = []  # [(número da linha, mensagem)]
+
+    @staticmethod
+    def mapa_escolhas(campo):
+        # Aceita tanto o valor gravado quanto o rótulo exibido, sem acentos e sem diferenciar caixa
+        mapa = {}
+        for valor, rotulo in campo.choices:
+            mapa[busca.normalizar(rotulo)] = valor
+            mapa[busca.normalizar(valor)] = valor
+        return mapa
+
+    def buscar(self, cache, modelo, campo, valor):
+        # Consulta cada setor/servidor uma única vez por importação
+        if valor not in cache:
+            cache[valor] = modelo.objects.filter(**{campo: valor}).first()
+        return cache[valor]
+
+    def converter(self, campo, valor):
+        if isinstance(valor, float) and valor.is_integer():
+            valor = int(valor)
+        if isinstance(campo, models.DateField):
+            if isinstance(valor, datetime):
+                return valor.date()
+            if isinstance(valor, date):
+                return valor
+            for formato in FORMATOS_DATA:
+                try:
+                    return datetime.strptime(str(valor), formato).date()
+                except ValueError:
+                    pass
+            raise ValidationError(f'data inválida "{valor}"')
+        if campo.name in self.escolhas:
+            return self.escolhas[campo.name].get(busca.normalizar(valor), valor)
+        return campo.to_python(str(valor) if isinstance(campo, models.CharField) else valor)
+
+    def construir(self, linha):
+        documento = self.modelo(usuario=self.usuario)
+        erros = []
+        for campo in self.campos:
+            valor = linha.get(campo.name)
+            valor = valor.strip() if isinstance(valor, str) else valor
+            if valor in (None, ''):
+                continue
+            try:
+                if campo.name == 'setor':
+                    setor = self.buscar(self.setores, Setor, 'sigla_setor', str(valor))
+                    if setor is None:
+                        raise ValidationError(f'setor "{valor}" não cadastrado')
+                    documento.setor = setor
+                elif campo.name == 'responsavel':
+                    responsavel = self.buscar(self.servidores, Servidor, 'nome', str(valor))
+                    if responsavel is None:
+                        raise ValidationError(f'servidor "{valor}" não cadastrado')
+                    documento.responsavel = responsavel
+                elif campo.is_relation and campo.related_model is Assunto:
+                    assunto = self.assuntos.get(busca.normalizar(valor))
+                    if assunto is None:
+                        raise ValidationError(f'assunto "{valor}" não cadastrado')
+                    documento.assunto = assunto
+                else:
+                    setattr(documento, campo.attname, self.converter(campo, valor))
+            except ValidationError as erro:
+                erros.append(f'{campo.name}: {"; ".join(erro.messages)}')
+        # As chaves estrangeiras já foram resolvidas acima; não revalidá-las evita uma consulta por linha
+        lidos = {campo.name for campo in self.campos}
+        excluir = [campo.name for campo in self.modelo._meta.concrete_fields
+                   if campo.name not in lidos or campo.is_relation]
+        try:
+            documento.clean_fields(exclude=excluir)
+            documento.clean()
+        except ValidationError as erro:
+            erros.extend(self.mensagens(erro))
+        relacoes = [campo.name for campo in self.campos if campo.is_relation]
+        for campo in relacoes:
+            if getattr(documento, f'{campo}_id') is None and not any(e.startswith(f'{campo}:') for e in erros):
+                erros.append(f'{campo}: campo obrigatório')
+        if erros:
+            raise ValidationError(erros)
+        return documento
+
+    @staticmethod
+    def mensagens(erro):
+        if not hasattr(erro, 'error_dict'):
+            return erro.messages
+        return [f'{campo}: {"; ".join(mensagens)}' if campo != NON_FIELD_ERRORS else '; '.join(mensagens)
+                for campo, mensagens in erro.message_dict.items()]
+
+    def importar(self, linhas):
+        lote = []
+        for numero_linha, linha in enumerate(linhas, start=2):
+            try:
+                documento = self.construir(linha)
+            except ValidationError as erro:
+                self.rejeitadas.append((numero_linha, '; '.join(erro.messages)))
+                continue
+            numero = getattr(documento, self.campo_numero)
+            if numero in self.numeros:
+                self.rejeitadas.append((numero_linha, f'{self.campo_numero} "{numero}" repetido no arquivo'))
+                continue
+            self.numeros.add(numero)
+            lote.append((numero_linha, documento))
+            if len(lote) == self.tamanho_lote:
+                self.gravar(lote)
+                lote = []
+        if lote:
+            self.gravar(lote)
+        return self
+
+    def gravar(self, lote):
+        numeros = [getattr(documento, self.campo_numero) for _, documento in lote]
+        existentes = set(self.modelo.todos.filter(**{f'{self.campo_numero}__in': numeros})
+                         .values_list(self.campo_numero, flat=True))
+        documentos = []
+        for numero_linha, documento in lote:
+            if getattr(documento, self.campo_numero) in existentes:
+                self.rejeitadas.append((numero_linha, f'{self.campo_numero} "{getattr(documento, self.campo_numero)}" já cadastrado'))
+            else:
+                documentos.append(documento)
+        if not documentos:
+            return
+        try:
+            self.inserir(documentos)
+        except IntegrityError as erro:
+            # Ex.: número cadastrado por outro usuário durante a importação; o lote inteiro é desfeito
+            self.rejeitadas.extend((numero_linha, f'lote não gravado: {erro}') for numero_linha, documento in lote
+                                   if documento in documentos)
+            return
+        self.importadas += len(documentos)
+
+    def inserir(self, documentos):
+        with transaction.atomic():
+            inserir_documentos(self.modelo, documentos)
+            auditoria.registrar_importacao(documentos, self.usuario)
+
+
+def inserir_documentos(modelo, documentos):
+    # Grava em lote documentos de uma subclasse e ajusta as contagens. Não passa pelo save() nem envia
+    # post_save: os campos derivados (tipo, rótulo, índice de busca) são preenchidos aqui, e o histórico
+    # fica a cargo de quem chama (ver Importador.inserir).
+    for documento in documentos:
+        documento.preencher_campos_derivados()
+    with transaction.atomic():
+        # bulk_create não aceita herança multitabela: grava primeiro as linhas de Documento
+        # (recebendo os ids pelo RETURNING) e depois as da subclasse, um INSERT por tabela.
+        campos_pai = [campo for campo in Documento._meta.concrete_fields if not campo.primary_key]
+        pais = Documento.objects.bulk_create([
+            Documento(**{campo.attname: getattr(documento, campo.attname) for campo in campos_pai})
+            for documento in documentos
+        ])
+        for documento, pai in zip(documentos, pais):
+            documento.id = documento.documento_ptr_id = pai.pk
+            documento.criado, documento.modificado = pai.criado, pai.modificado
+            documento._state.adding, documento._state.db = False, pai._state.db
+        inserir_linhas_subclasse(modelo, documentos)
+        for chave, quantidade in Counter(documento.chave_contagem() for documento in documentos).items():
+            ContagemDocumento.objects.ajustar(*chave, quantidade)
+
+
+def inserir_linhas_subclasse(modelo, documentos):
+    # INSERT ... VALUES com uma linha por documento na tabela da subclasse (documento_ptr_id e os campos próprios)
+    connection = connections[router.db_for_write(modelo)]
+    campos = modelo._meta.local_concrete_fields
+    colunas = ', '.join(connection.ops.quote_name(campo.column) for campo in campos)
+    linha = '(%s)' % ', '.join(['%s'] * len(campos))
+    valores = [campo.get_db_prep_save(campo.pre_save(documento, True), connection)
+               for documento in documentos for campo in campos]
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(modelo._meta.db_table)} ({colunas}) '
+                       f'VALUES {", ".join([linha] * len(documentos))}', valores)
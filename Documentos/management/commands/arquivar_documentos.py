@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Documentos.arquivo import STATUS_ARQUIVAVEIS, arquivar
+
+
+class Command(BaseCommand):
+    help = ('Move para o arquivo os documentos concluídos ou arquivados há mais de --dias dias, com as suas '
+            'tramitações. Os arquivados saem das listas do admin e das consultas do conjunto em uso, e voltam '
+            'a ele ao serem reabertos. Agende a execução periódica (ex.: cron semanal).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.ARQUIVO_DIAS,
+                            help='Idade mínima, pela data de conclusão (padrão: ARQUIVO_DIAS).')
+        parser.add_argument('--status', nargs='+', default=list(STATUS_ARQUIVAVEIS), choices=STATUS_ARQUIVAVEIS,
+                            help='Status dos documentos arquivados.')
+        parser.add_argument('--lote', type=int, default=1000, help='Documentos movidos por transação.')
+        parser.add_argument('--simular', action='store_true', help='Conta o que seria movido sem alterar nada.')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0 or options['lote'] < 1:
+            raise CommandError('--dias não pode ser negativo e --lote deve ser ao menos 1.')
+        documentos, tramitacoes = arquivar(options['dias'], options['status'], options['lote'], options['simular'])
+        verbo = 'seriam movido(s)' if options['simular'] else 'movido(s)'
+        self.stdout.write(f'{documentos} documento(s) {verbo} para o arquivo.')
+        self.stdout.write(f'{tramitacoes} tramitação(ões) recebida(s) de documentos já arquivados {verbo} para o arquivo.')
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from Documentos.anexos import coletar_anexos, converter_anexos_antigos
+
+
+class Command(BaseCommand):
+    help = ('Remove do armazenamento os anexos que nenhum documento referencia. '
+            'Com --converter, antes regrava pelo conteúdo (SHA-256) os anexos antigos, unificando as cópias repetidas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--converter', action='store_true', help='Endereça pelo conteúdo os anexos antigos.')
+        parser.add_argument('--carencia-horas', type=int, default=24,
+                            help='Mantém arquivos mais novos que isso, que podem pertencer a um upload em andamento.')
+        parser.add_argument('--simular', action='store_true', help='Lista o que seria feito sem alterar nada.')
+
+    def handle(self, *args, **options):
+        if options['converter']:
+            convertidos = converter_anexos_antigos(simular=options['simular'])
+            for antigo, novo in convertidos.items():
+                self.stdout.write(f'{antigo} -> {novo or "(simulação)"}')
+            self.stdout.write(f'{len(convertidos)} anexo(s) convertido(s).')
+        removidos = coletar_anexos(timedelta(hours=options['carencia_horas']), simular=options['simular'])
+        for nome in removidos:
+            self.stdout.write(f'Removido: {nome}')
+        self.stdout.write(f'{len(removidos)} arquivo(s) sem referência removido(s).')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Documentos import particoes
+
+
+class Command(BaseCommand):
+    help = ('Cria as partições mensais do histórico de documentos para os próximos meses, levando para elas '
+            'os eventos que caíram na partição padrão. Agende a execução mensal (ex.: cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3, help='Meses a partir do atual com partição garantida.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            criadas = particoes.criar_particoes(connection, timezone.now().date(), options['meses'])
+        for nome in criadas:
+            self.stdout.write(f'Partição {nome} criada.')
+        self.stdout.write(f'{len(criadas)} partição(ões) criada(s).')
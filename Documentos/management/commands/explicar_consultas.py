@@ -0,0 +1,111 @@
+import re
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Documentos import busca
+from Documentos.desempenho import changelist
+from Documentos.prazos import oficios_a_notificar
+from Documentos.models import Documento, Oficio, Processo, Servidor, Tramitacao
+
+INDICES = re.compile(r'Index (?:Only )?Scan(?: Backward)? using (\S+)|Bitmap Index Scan on (\S+)')
+VARREDURAS = re.compile(r'Seq Scan on (\S+)')
+
+
+class Command(BaseCommand):
+    help = ('Executa EXPLAIN ANALYZE nas consultas principais da aplicação (listas do admin, caixa de entrada, '
+            'busca, autocomplete e prazos) e resume os índices usados e as varreduras sequenciais de cada plano. '
+            'Use depois de carregar um volume de produção, com as estatísticas atualizadas (--atualizar-estatisticas).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('consultas', nargs='*', help='Consultas a explicar (padrão: todas).')
+        parser.add_argument('--sem-analyze', action='store_true',
+                            help='Mostra só o plano estimado, sem executar as consultas.')
+        parser.add_argument('--atualizar-estatisticas', action='store_true',
+                            help='Executa ANALYZE no banco antes dos planos.')
+        parser.add_argument('--resumo', action='store_true', help='Omite os planos e mostra só o resumo.')
+        parser.add_argument('--termo', default='oficio', help='Termo da busca e do autocomplete.')
+        parser.add_argument('--usuario', help='Usuário da caixa de entrada (padrão: o da tramitação mais recente).')
+        parser.add_argument('--profundidade', type=int, default=1000,
+                            help='Linha a partir da qual a lista de processos é paginada por chave.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        consultas = {
+            'processos': ('Lista de processos, primeira página', self.processos),
+            'processos_abertos': ('Lista de processos filtrada por status Aberto', self.processos_abertos),
+            'processos_pagina_chave': ('Lista de processos, página após a linha --profundidade', self.processos_pagina_chave),
+            'processos_arquivo': ('Lista de processos do arquivo', lambda: self.lista(Processo, {'arquivo': '1'})),
+            'oficios': ('Lista de ofícios por vencimento', lambda: self.lista(Oficio)),
+            'tramitacoes': ('Lista de tramitações por despacho', lambda: self.lista(Tramitacao)),
+            'caixa_entrada': ('Caixa de entrada do usuário', self.caixa_entrada),
+            'busca': ('Busca textual nos documentos', lambda: busca.buscar(Documento.objects.all(), options['termo'])[:100]),
+            'autocomplete_documento': ('Autocomplete de documentos por prefixo',
+                                       lambda: Documento.objects.prefixo(options['termo']).order_by('rotulo_busca', 'pk')[:21]),
+            'servidores_ativos': ('Lista de servidores ativos',
+                                  lambda: Servidor.objects.filter(ativo=True).order_by('nome')[:21]),
+            'prazos': ('Ofícios com prazo a notificar', lambda: oficios_a_notificar(date.today(), 5)),
+        }
+        escolhidas = options['consultas'] or list(consultas)
+        desconhecidas = set(escolhidas) - set(consultas)
+        if desconhecidas:
+            raise CommandError(f'Consultas desconhecidas: {", ".join(sorted(desconhecidas))}. '
+                               f'Disponíveis: {", ".join(consultas)}.')
+        if options['atualizar_estatisticas']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        for nome in escolhidas:
+            descricao, montar = consultas[nome]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{nome}: {descricao}'))
+            queryset = montar()
+            if queryset is None:
+                self.stdout.write('  sem dados para montar a consulta\n')
+                continue
+            plano = self.explicar(queryset)
+            if not options['resumo']:
+                self.stdout.write(plano)
+            indices = sorted({(a or b).strip('"') for a, b in INDICES.findall(plano)})
+            varreduras = sorted({tabela.strip('"') for tabela in VARREDURAS.findall(plano)})
+            self.stdout.write(f'  índices: {", ".join(indices) or "nenhum"}')
+            if varreduras:
+                self.stdout.write(self.style.WARNING(f'  varredura sequencial: {", ".join(varreduras)}'))
+            self.stdout.write('')
+
+    def explicar(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        opcoes = 'COSTS' if self.options['sem_analyze'] else 'ANALYZE, BUFFERS'
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN ({opcoes}) {sql}', params)
+            return '\n'.join(linha[0] for linha in cursor.fetchall())
+
+    def lista(self, modelo, parametros=None):
+        cl = changelist(modelo, parametros)
+        return cl.queryset[:cl.list_per_page + 1]
+
+    def processos(self):
+        return self.lista(Processo)
+
+    def processos_abertos(self):
+        return self.lista(Processo, {'status__exact': 'Aberto'})
+
+    def processos_pagina_chave(self):
+        cl = changelist(Processo)
+        linha = cl.queryset[self.options['profundidade'] - 1:self.options['profundidade']].first()
+        if linha is None:
+            return None
+        cursor = cl.cursor(linha)
+        return cl.queryset.filter(cl.filtro_cursor(cursor))[:cl.list_per_page + 1]
+
+    def caixa_entrada(self):
+        if self.options['usuario']:
+            usuario = get_user_model().objects.filter(username=self.options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f'Usuário "{self.options["usuario"]}" não encontrado.')
+        else:
+            usuario = Tramitacao.objects.recentes().values_list('para', flat=True).first()
+            if usuario is None:
+                return None
+        return Tramitacao.objects.pendentes_para(usuario).recentes()[:26]
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Documentos.sinteticos import GeradorDados
+
+
+class Command(BaseCommand):
+    help = ('Gera dados sintéticos para testes de carga: setores, servidores, usuários, documentos de todos os '
+            'tipos e cadeias de tramitação. Cada execução acrescenta documentos aos já existentes. '
+            'Use apenas em um banco de testes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=10_000, help='Documentos a acrescentar.')
+        parser.add_argument('--setores', type=int, default=50, help='Setores gerados (S0000, S0001, ...).')
+        parser.add_argument('--servidores', type=int, default=500, help='Servidores gerados.')
+        parser.add_argument('--usuarios', type=int, default=100, help='Usuários (equipe) gerados.')
+        parser.add_argument('--tramitacoes-por-documento', type=int, default=2,
+                            help='Média de tramitações na cadeia de cada documento.')
+        parser.add_argument('--semente', type=int, default=0, help='Semente do gerador aleatório.')
+        parser.add_argument('--tamanho-lote', type=int, default=5000, help='Documentos gravados por INSERT.')
+
+    def handle(self, *args, **options):
+        if min(options['setores'], options['servidores'], options['usuarios']) < 1:
+            raise CommandError('São necessários ao menos um setor, um servidor e um usuário.')
+        gerador = GeradorDados(options['semente'], options['tamanho_lote'])
+        gerador.referencias(options['setores'], options['servidores'], options['usuarios'])
+        self.stdout.write(f'{len(gerador.setores)} setor(es), {len(gerador.servidores)} servidor(es), '
+                          f'{len(gerador.usuarios)} usuário(s) ativo(s).')
+
+        def progresso(modelo, gerados, total):
+            self.stdout.write(f'  {modelo._meta.verbose_name_plural}: {gerados}/{total}')
+
+        totais = gerador.gerar(options['documentos'], options['tramitacoes_por_documento'], progresso)
+        self.stdout.write(f'{sum(totais.values())} documento(s) gerado(s).')
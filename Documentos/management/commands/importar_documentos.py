@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from Documentos.importacao import MODELOS_IMPORTACAO, Importador, ler_arquivo
+
+
+class Command(BaseCommand):
+    help = ('Importa processos, ofícios ou ordens de serviço de um arquivo CSV ou XLSX. '
+            'A primeira linha traz os nomes dos campos; "setor" recebe a sigla e "responsavel" o nome do servidor. '
+            'Linhas inválidas são listadas com o motivo e as demais são gravadas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(MODELOS_IMPORTACAO), help='Tipo de documento importado.')
+        parser.add_argument('arquivo', help='Caminho do arquivo .csv ou .xlsx.')
+        parser.add_argument('--usuario', help='Nome de usuário registrado como autor do cadastro.')
+        parser.add_argument('--tamanho-lote', type=int, default=1000, help='Documentos gravados por INSERT.')
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            usuario = get_user_model().objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+        importador = Importador(MODELOS_IMPORTACAO[options['tipo']], usuario, options['tamanho_lote'])
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                importador.importar(ler_arquivo(arquivo, options['arquivo']))
+        except OSError as erro:
+            raise CommandError(erro)
+        except ValidationError as erro:
+            raise CommandError(f'{" ".join(erro.messages)} {importador.importadas} documento(s) importado(s) antes do erro.')
+        for numero_linha, mensagem in importador.rejeitadas:
+            self.stdout.write(self.style.WARNING(f'Linha {numero_linha}: {mensagem}'))
+        self.stdout.write(f'{importador.importadas} documento(s) importado(s), '
+                          f'{len(importador.rejeitadas)} linha(s) rejeitada(s).')
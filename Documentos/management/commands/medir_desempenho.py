@@ -0,0 +1,126 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from Documentos.desempenho import Medidor, volumes
+from Documentos.models import Documento
+from Documentos.sinteticos import GeradorDados
+
+
+def commit_atual():
+    try:
+        resultado = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                   capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return resultado.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = ('Mede o tempo das telas e operações principais (dashboard, listas do admin, busca, autocomplete, '
+            'caixa de entrada e despacho) com o volume atual do banco ou, com --volumes, completando o banco '
+            'com dados sintéticos até cada volume. Grava os resultados em JSON (--saida) para comparar entre '
+            'commits (--comparar). Com --volumes, use apenas em um banco de testes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('cenarios', nargs='*', help='Cenários a medir (padrão: todos).')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Execuções medidas de cada cenário.')
+        parser.add_argument('--usuario', help='Superusuário das requisições (padrão: o primeiro ativo).')
+        parser.add_argument('--termo', default='oficio', help='Termo da busca e do autocomplete.')
+        parser.add_argument('--profundidade', type=int, default=1000,
+                            help='Linha a partir da qual a lista de processos é paginada por chave.')
+        parser.add_argument('--volumes', type=int, nargs='+', metavar='DOCUMENTOS',
+                            help='Volumes de documentos medidos, em ordem crescente (ex.: 10000 100000 1000000).')
+        parser.add_argument('--semente', type=int, default=0, help='Semente dos dados gerados por --volumes.')
+        parser.add_argument('--saida', help='Arquivo JSON em que os resultados são gravados.')
+        parser.add_argument('--comparar', help='Arquivo JSON de uma medição anterior, para comparar o p50.')
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser ao menos 1.')
+        desconhecidos = set(options['cenarios']) - set(Medidor.CENARIOS)
+        if desconhecidos:
+            raise CommandError(f'Cenários desconhecidos: {", ".join(sorted(desconhecidos))}. '
+                               f'Disponíveis: {", ".join(Medidor.CENARIOS)}.')
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as arquivo:
+                    anterior = json.load(arquivo)
+            except (OSError, ValueError) as erro:
+                raise CommandError(f'Não foi possível ler {options["comparar"]}: {erro}')
+
+        usuarios = get_user_model().objects.filter(is_superuser=True, is_active=True)
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+        usuario = usuarios.order_by('pk').first()
+        if usuario is None:
+            raise CommandError('Nenhum superusuário ativo encontrado (crie um com createsuperuser).')
+
+        resultado = {
+            'commit': commit_atual(),
+            'data': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'repeticoes': options['repeticoes'],
+            'medicoes': [],
+        }
+        gerador = None
+        for alvo in options['volumes'] or [None]:
+            if alvo is not None:
+                if gerador is None:
+                    gerador = GeradorDados(options['semente'])
+                    gerador.referencias(50, 500, 100)
+                faltam = alvo - Documento.todos.count()
+                if faltam > 0:
+                    self.stdout.write(f'Gerando {faltam} documento(s)...')
+                    gerador.gerar(faltam)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            medicao = {'alvo': alvo, 'volumes': volumes(), 'cenarios': {}}
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{medicao["volumes"]["documentos"]} documento(s), '
+                f'{medicao["volumes"]["tramitacoes"]} tramitação(ões)'))
+            comparacao = self.medicao_anterior(anterior, alvo)
+            medidor = Medidor(usuario, options['repeticoes'], options['termo'], options['profundidade'])
+            try:
+                medicao['cenarios'] = medidor.executar(
+                    options['cenarios'], lambda nome, descricao, valores: self.mostrar(nome, valores, comparacao))
+            finally:
+                medidor.encerrar()
+            resultado['medicoes'].append(medicao)
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Resultados gravados em {options["saida"]}.')
+
+    def medicao_anterior(self, anterior, alvo):
+        # Cenários da medição anterior com o mesmo volume alvo
+        for medicao in (anterior or {}).get('medicoes', []):
+            if medicao.get('alvo') == alvo:
+                return medicao.get('cenarios', {})
+        return {}
+
+    def mostrar(self, nome, valores, comparacao):
+        if 'erro' in valores:
+            self.stdout.write(self.style.ERROR(f'  {nome:<24} {valores["erro"]}'))
+            return
+        linha = (f'  {nome:<24} p50 {valores["p50"]:>9.2f} ms  p95 {valores["p95"]:>9.2f} ms  '
+                 f'{valores["consultas"]:>3} consulta(s)')
+        antes = comparacao.get(nome, {}).get('p50')
+        if not antes:
+            self.stdout.write(linha)
+            return
+        variacao = 100 * (valores['p50'] - antes) / antes
+        linha += f'  {variacao:+.1f}% (antes {antes:.2f} ms)'
+        # Variações pequenas ficam dentro do ruído da medição
+        if variacao > 10:
+            self.stdout.write(self.style.WARNING(linha))
+        else:
+            self.stdout.write(linha)
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Documentos.prazos import notificar_prazos, tem_email
+
+
+class Command(BaseCommand):
+    help = ('Avisa por e-mail, agrupando por usuário, os ofícios abertos vencidos ou que vencem nos próximos dias. '
+            'Cada ofício é avisado uma única vez por situação; agende a execução diária (ex.: cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=5, help='Antecedência, em dias, do aviso de vencimento.')
+        parser.add_argument('--data', type=date.fromisoformat, help='Data de referência (AAAA-MM-DD); padrão: hoje.')
+        parser.add_argument('--simular', action='store_true', help='Lista os avisos sem enviar nem registrar.')
+
+    def handle(self, *args, **options):
+        hoje = options['data'] or timezone.localdate()
+        grupos = notificar_prazos(hoje, options['dias'], simular=options['simular'])
+        if grupos is None:
+            self.stdout.write('Outra execução de notificar_prazos está em andamento.')
+            return
+        avisados = 0
+        for destinatario, oficios in grupos.items():
+            numeros = ', '.join(oficio.numero_oficio for oficio in oficios)
+            if tem_email(destinatario):
+                self.stdout.write(f'{destinatario.email}: {numeros}')
+                avisados += len(oficios)
+            else:
+                self.stdout.write(self.style.WARNING(f'Sem destinatário com e-mail (não avisados): {numeros}'))
+        self.stdout.write(f'{avisados} ofício(s) avisado(s).')
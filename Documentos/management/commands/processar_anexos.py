@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from Documentos.tarefas import trabalhar
+
+
+def iniciar_worker(intervalo, ate_esvaziar):
+    # Cada processo abre a sua própria conexão com o banco
+    connections.close_all()
+    trabalhar(intervalo, ate_esvaziar)
+
+
+class Command(BaseCommand):
+    help = ('Processa a fila de anexos (extração de texto e miniaturas) com um processo por núcleo. '
+            'Rode como serviço; com --ate-esvaziar, termina quando não houver mais tarefas pendentes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1, help='Número de workers.')
+        parser.add_argument('--intervalo', type=float, default=5, help='Espera, em segundos, com a fila vazia.')
+        parser.add_argument('--ate-esvaziar', action='store_true', help='Termina ao esvaziar a fila.')
+
+    def handle(self, *args, **options):
+        if options['processos'] <= 1:
+            processadas = trabalhar(options['intervalo'], options['ate_esvaziar'])
+            self.stdout.write(f'{processadas} tarefa(s) processada(s).')
+            return
+        connections.close_all()
+        contexto = multiprocessing.get_context('fork')
+        workers = [contexto.Process(target=iniciar_worker, args=(options['intervalo'], options['ate_esvaziar']))
+                   for _ in range(options['processos'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
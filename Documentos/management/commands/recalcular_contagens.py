@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Documentos.models import ContagemDocumento
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as contagens de documentos (por tipo, status e setor) usadas no dashboard.'
+
+    def handle(self, *args, **options):
+        ContagemDocumento.objects.recalcular()
+        for tipo, total in sorted(ContagemDocumento.objects.totais('tipo').items()):
+            self.stdout.write(f'{tipo}: {total}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Documentos.models import Documento
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a última tramitação e o detentor atual de cada documento a partir das tramitações.'
+
+    def handle(self, *args, **options):
+        total = Documento.todos.atualizar_detentores()
+        self.stdout.write(f'{total} documento(s) atualizado(s).')
@@ -0,0 +1,18 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from Documentos import busca
+from Documentos.models import Documento
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o índice de busca (texto completo e trigramas) de todos os documentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=1000, help='Documentos atualizados por UPDATE.')
+
+    def handle(self, *args, **options):
+        for tipo in busca.CAMPOS_BUSCA:
+            Subclasse = apps.get_model('Documentos', tipo)
+            total = busca.reindexar(Documento, Subclasse, tipo, options['tamanho_lote'])
+            self.stdout.write(f'{Subclasse._meta.verbose_name_plural}: {total} documento(s) reindexado(s).')
@@ -0,0 +1,200 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Limites dos histogramas (duração em segundos e consultas por requisição)
+LIMITES_DURACAO = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CONSULTAS = (1, 5, 10, 25, 50, 100, 250, 500)
+
+# {nome: (tipo, descrição)} das métricas expostas em /metrics
+METRICAS = {
+    'controle_requisicoes_total': ('counter', 'Requisições atendidas, por view, método e status.'),
+    'controle_requisicao_segundos': ('histogram', 'Duração das requisições, por view.'),
+    'controle_requisicao_consultas': ('histogram', 'Consultas ao banco por requisição, por view.'),
+    'controle_consultas_segundos_total': ('counter', 'Tempo gasto em consultas ao banco, por view.'),
+    'controle_requisicoes_lentas_total': ('counter', 'Requisições acima de METRICAS_LENTA_SEGUNDOS, por view.'),
+}
+VIEW_METRICAS = 'Documentos:metricas'
+
+
+def rotulos(**valores):
+    texto = ','.join('{}="{}"'.format(nome, str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                     for nome, valor in valores.items())
+    return '{' + texto + '}'
+
+
+def observar(incrementos, nome, valor, limites, **rotulos_serie):
+    # Histograma no formato do Prometheus: cada faixa conta as observações até o seu limite.
+    # Todas as faixas são incrementadas (com 0 acima do valor) para existirem desde a primeira observação.
+    for limite in (*limites, '+Inf'):
+        dentro = limite == '+Inf' or valor <= limite
+        incrementos[f'{nome}_bucket{rotulos(**rotulos_serie, le=limite)}'] = 1 if dentro else 0
+    incrementos[f'{nome}_sum{rotulos(**rotulos_serie)}'] = valor
+    incrementos[f'{nome}_count{rotulos(**rotulos_serie)}'] = 1
+
+
+class ArmazenamentoLocal:
+    # Contadores na memória do processo: servem ao runserver e aos testes. Com vários workers do
+    # gunicorn, cada um teria os seus, e /metrics mostraria apenas os do worker que respondeu.
+    def __init__(self):
+        self.valores = {}
+        self.trava = threading.Lock()
+
+    def incrementar(self, incrementos):
+        with self.trava:
+            for campo, valor in incrementos.items():
+                self.valores[campo] = self.valores.get(campo, 0) + valor
+
+    def ler(self):
+        with self.trava:
+            return dict(self.valores)
+
+    def limpar(self):
+        with self.trava:
+            self.valores.clear()
+
+
+class ArmazenamentoRedis:
+    # Contadores em um hash do Redis, somados por todos os workers e contêineres: cada requisição
+    # envia os seus incrementos em um único pipeline, e /metrics responde o total de qualquer contêiner.
+    # Os contadores sobrevivem à reciclagem dos workers (max_requests) e ao reinício dos contêineres.
+    def __init__(self, url, chave):
+        self.url = url
+        self.chave = chave
+        self._cliente = None
+
+    @property
+    def cliente(self):
+        # Criado no worker, depois do fork (preload_app carrega o Django no processo mestre)
+        if self._cliente is None:
+            import redis
+
+            self._cliente = redis.Redis.from_url(self.url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return self._cliente
+
+    def incrementar(self, incrementos):
+        pipeline = self.cliente.pipeline(transaction=False)
+        for campo, valor in incrementos.items():
+            pipeline.hincrbyfloat(self.chave, campo, valor)
+        pipeline.execute()
+
+    def ler(self):
+        return {campo.decode(): float(valor) for campo, valor in self.cliente.hgetall(self.chave).items()}
+
+    def limpar(self):
+        self.cliente.delete(self.chave)
+
+
+_armazenamento = None
+
+
+def armazenamento():
+    global _armazenamento
+    if _armazenamento is None:
+        if settings.METRICAS_REDIS:
+            _armazenamento = ArmazenamentoRedis(settings.METRICAS_REDIS, f'{settings.CACHES["default"]["KEY_PREFIX"]}:metricas')
+        else:
+            _armazenamento = ArmazenamentoLocal()
+    return _armazenamento
+
+
+def formatar(valor):
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def exportar():
+    # Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)
+    por_metrica = {}
+    for campo, valor in armazenamento().ler().items():
+        nome = campo.partition('{')[0]
+        for sufixo in ('_bucket', '_sum', '_count'):
+            if nome.endswith(sufixo) and nome[:-len(sufixo)] in METRICAS:
+                nome = nome[:-len(sufixo)]
+        por_metrica.setdefault(nome, []).append((campo, valor))
+    linhas = []
+    for nome, (tipo, descricao) in METRICAS.items():
+        linhas.append(f'# HELP {nome} {descricao}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        linhas.extend(f'{campo} {formatar(valor)}' for campo, valor in sorted(por_metrica.get(nome, [])))
+    return '\n'.join(linhas) + '\n'
+
+
+class ConsultasRequisicao:
+    # execute_wrapper que soma quantidade e tempo das consultas e guarda as mais lentas
+    def __init__(self, guardar):
+        self.quantidade = 0
+        self.segundos = 0.0
+        self.guardar = guardar
+        self.lentas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.quantidade += 1
+            self.segundos += duracao
+            # Só o texto com os marcadores (%s): os parâmetros podem conter dados pessoais
+            item = (duracao, self.quantidade, sql)
+            if len(self.lentas) < self.guardar:
+                heapq.heappush(self.lentas, item)
+            elif duracao > self.lentas[0][0]:
+                heapq.heapreplace(self.lentas, item)
+
+
+class MetricasMiddleware:
+    # Registra, pelo nome da URL resolvida, duração, quantidade e tempo das consultas de cada
+    # requisição; as lentas (METRICAS_LENTA_SEGUNDOS) vão para o log com as consultas mais demoradas.
+    # Respostas em streaming (exportação CSV) são medidas até o início do envio.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = ConsultasRequisicao(settings.METRICAS_CONSULTAS_LENTAS)
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(consultas))
+            resposta = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'nao_resolvida'
+        if view != VIEW_METRICAS:
+            self.registrar(request, resposta, view, duracao, consultas)
+        return resposta
+
+    def registrar(self, request, resposta, view, duracao, consultas):
+        incrementos = {
+            'controle_requisicoes_total' + rotulos(view=view, metodo=request.method, status=resposta.status_code): 1,
+            'controle_consultas_segundos_total' + rotulos(view=view): consultas.segundos,
+        }
+        observar(incrementos, 'controle_requisicao_segundos', duracao, LIMITES_DURACAO, view=view)
+        observar(incrementos, 'controle_requisicao_consultas', consultas.quantidade, LIMITES_CONSULTAS, view=view)
+        if duracao >= settings.METRICAS_LENTA_SEGUNDOS:
+            incrementos['controle_requisicoes_lentas_total' + rotulos(view=view)] = 1
+            if random.random() < settings.METRICAS_AMOSTRA_LENTAS:
+                self.registrar_lenta(request, view, duracao, consultas)
+        try:
+            armazenamento().incrementar(incrementos)
+        except Exception:
+            # As métricas nunca derrubam a requisição (Redis fora do ar, por exemplo)
+            logger.warning('Falha ao registrar as métricas da requisição', exc_info=True)
+
+    def registrar_lenta(self, request, view, duracao, consultas):
+        mais_lentas = '\n'.join(
+            f'  {segundos * 1000:.1f} ms (consulta {ordem}): {sql[:500]}'
+            for segundos, ordem, sql in sorted(consultas.lentas, reverse=True))
+        logger.warning('Requisição lenta: %s %s (%s) em %.0f ms, %d consulta(s) em %.0f ms\n%s',
+                       request.method, request.get_full_path(), view, duracao * 1000,
+                       consultas.quantidade, consultas.segundos * 1000, mais_lentas)
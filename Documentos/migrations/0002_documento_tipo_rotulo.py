@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 13:01
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# Subclasse -> campo usado como rótulo
+ROTULOS = {
+    'processo': 'numero_processo',
+    'oficio': 'numero_oficio',
+    'ordemservico': 'numero_os',
+    'cadastroemail': 'assunto',
+}
+
+
+def preencher_tipo_rotulo(apps, schema_editor):
+    Documento = apps.get_model('Documentos', 'Documento')
+    for tipo, campo in ROTULOS.items():
+        Subclasse = apps.get_model('Documentos', tipo)
+        rotulo = Subclasse.objects.filter(pk=OuterRef('pk')).values(campo)[:1]
+        Documento.objects.filter(pk__in=Subclasse.objects.values('pk')).update(
+            tipo=tipo, rotulo=Subquery(rotulo)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='rotulo',
+            field=models.CharField(blank=True, editable=False, max_length=120, verbose_name='Documento'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='tipo',
+            field=models.CharField(blank=True, choices=[('processo', 'Processo'), ('oficio', 'Ofício'), ('ordemservico', 'Ordem de Serviço'), ('cadastroemail', 'E-mail')], editable=False, max_length=13, verbose_name='Tipo de documento'),
+        ),
+        migrations.RunPython(preencher_tipo_rotulo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.2 on 2026-10-18 13:02
+
+import unicodedata
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import Value
+
+# Cópia do estado de Documentos/busca.py quando esta migração foi criada: as mudanças posteriores
+# naquele módulo não alteram o que a migração faz
+CONFIGURACAO_BUSCA = 'portugues_sem_acento'
+
+CAMPOS_BUSCA = {
+    'processo': ('numero_processo', 'requerente', 'assunto'),
+    'oficio': ('numero_oficio', 'assunto', 'data_vencimento'),
+    'ordemservico': ('numero_os', 'assunto', 'responsavel__nome'),
+    'cadastroemail': ('remetente', 'email', 'assunto'),
+}
+
+CRIAR_CONFIGURACAO = f"""
+CREATE TEXT SEARCH CONFIGURATION {CONFIGURACAO_BUSCA} (COPY = portuguese);
+ALTER TEXT SEARCH CONFIGURATION {CONFIGURACAO_BUSCA}
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+"""
+
+REMOVER_CONFIGURACAO = f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {CONFIGURACAO_BUSCA};'
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def valores_busca(documento, tipo):
+    valores = []
+    for caminho in CAMPOS_BUSCA[tipo]:
+        valor = documento
+        for atributo in caminho.split('__'):
+            valor = getattr(valor, atributo, None)
+            if valor is None:
+                break
+        if valor is not None:
+            valores.append(str(valor))
+    return valores
+
+
+def preencher_busca(apps, schema_editor):
+    Documento = apps.get_model('Documentos', 'Documento')
+    for tipo, campos in CAMPOS_BUSCA.items():
+        Subclasse = apps.get_model('Documentos', tipo)
+        relacionados = [campo.split('__')[0] for campo in campos if '__' in campo]
+        lote = []
+        for documento in Subclasse._default_manager.select_related(*relacionados).iterator(chunk_size=1000):
+            valores = valores_busca(documento, tipo)
+            vetor = (SearchVector(Value(documento.rotulo), weight='A', config=CONFIGURACAO_BUSCA) +
+                     SearchVector(Value(' '.join(valores)), weight='B', config=CONFIGURACAO_BUSCA))
+            lote.append(Documento(pk=documento.pk, texto_busca=normalizar(' '.join(valores)), vetor_busca=vetor))
+            if len(lote) == 1000:
+                Documento._default_manager.bulk_update(lote, ['texto_busca', 'vetor_busca'])
+                lote = []
+        Documento._default_manager.bulk_update(lote, ['texto_busca', 'vetor_busca'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0002_documento_tipo_rotulo'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunSQL(CRIAR_CONFIGURACAO, REMOVER_CONFIGURACAO),
+        migrations.AddField(
+            model_name='documento',
+            name='texto_busca',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='vetor_busca',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_busca, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='documento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['vetor_busca'], name='documento_vetor_busca_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['texto_busca'], name='documento_texto_busca_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
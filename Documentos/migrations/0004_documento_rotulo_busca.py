@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 13:04
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar(texto):
+    # Cópia de busca.normalizar quando esta migração foi criada
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def preencher_rotulo_busca(apps, schema_editor):
+    Documento = apps.get_model('Documentos', 'Documento')
+    lote = []
+    for pk, rotulo in Documento._default_manager.values_list('pk', 'rotulo').iterator(chunk_size=1000):
+        lote.append(Documento(pk=pk, rotulo_busca=normalizar(rotulo)))
+        if len(lote) == 1000:
+            Documento._default_manager.bulk_update(lote, ['rotulo_busca'])
+            lote = []
+    Documento._default_manager.bulk_update(lote, ['rotulo_busca'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0003_busca_texto_completo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='rotulo_busca',
+            field=models.CharField(blank=True, db_collation='C', editable=False, max_length=120),
+        ),
+        migrations.RunPython(preencher_rotulo_busca, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['rotulo_busca', 'id'], name='documento_rotulo_busca_id'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def preencher_contagens(apps, schema_editor):
+    Documento = apps.get_model('Documentos', 'Documento')
+    ContagemDocumento = apps.get_model('Documentos', 'ContagemDocumento')
+    agrupados = (Documento.objects.exclude(tipo='').values('tipo', 'status', 'setor_id')
+                 .annotate(total=Count('pk')).order_by())
+    ContagemDocumento.objects.bulk_create([ContagemDocumento(**linha) for linha in agrupados])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0004_documento_rotulo_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContagemDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('processo', 'Processo'), ('oficio', 'Ofício'), ('ordemservico', 'Ordem de Serviço'), ('cadastroemail', 'E-mail')], max_length=13, verbose_name='Tipo de documento')),
+                ('status', models.CharField(choices=[('Aberto', 'Aberto'), ('Arquivado', 'Arquivado'), ('Concluido', 'Concluído')], max_length=9, verbose_name='Status')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('setor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Documentos.setor', verbose_name='Setor')),
+            ],
+            options={
+                'verbose_name': 'Contagem de documentos',
+                'verbose_name_plural': 'Contagens de documentos',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contagemdocumento',
+            constraint=models.UniqueConstraint(fields=('tipo', 'status', 'setor'), name='contagem_documento_unica'),
+        ),
+        migrations.RunPython(preencher_contagens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0005_contagem_documento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tramitacao',
+            index=models.Index(fields=['para', 'status', '-criado', '-id'], name='tramitacao_caixa_entrada'),
+        ),
+    ]
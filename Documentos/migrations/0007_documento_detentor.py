@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 13:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_detentores(apps, schema_editor):
+    Documento = apps.get_model('Documentos', 'Documento')
+    Tramitacao = apps.get_model('Documentos', 'Tramitacao')
+    ultima = Tramitacao.objects.filter(num_documento=OuterRef('pk')).order_by('-criado', '-id')
+    Documento.objects.update(ultima_tramitacao=Subquery(ultima.values('pk')[:1]),
+                             detentor=Subquery(ultima.values('para')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Documentos', '0006_tramitacao_caixa_entrada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='detentor',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documentos_em_carga', to=settings.AUTH_USER_MODEL, verbose_name='Com'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='ultima_tramitacao',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Documentos.tramitacao', verbose_name='Última tramitação'),
+        ),
+        migrations.RunPython(preencher_detentores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['detentor', 'status'], name='documento_detentor_status'),
+        ),
+        migrations.AddIndex(
+            model_name='tramitacao',
+            index=models.Index(fields=['num_documento', '-criado', '-id'], name='tramitacao_documento_criado'),
+        ),
+    ]
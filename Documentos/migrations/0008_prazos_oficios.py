@@ -0,0 +1,59 @@
+# Generated by Django 4.2 on 2026-10-18 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def preencher_vencimento_em_aberto(apps, schema_editor):
+    Oficio = apps.get_model('Documentos', 'Oficio')
+    Oficio.objects.filter(status='Aberto').update(vencimento_em_aberto=F('data_vencimento'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Documentos', '0007_documento_detentor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacaoPrazo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('situacao', models.CharField(choices=[('vencendo', 'Vencendo'), ('vencido', 'Vencido')], max_length=8, verbose_name='Situação')),
+                ('data_vencimento', models.DateField(verbose_name='Data de vencimento')),
+                ('enviado', models.DateTimeField(auto_now_add=True, verbose_name='Enviado em')),
+            ],
+            options={
+                'verbose_name': 'Notificação de prazo',
+                'verbose_name_plural': 'Notificações de prazo',
+            },
+        ),
+        migrations.AddField(
+            model_name='oficio',
+            name='vencimento_em_aberto',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_vencimento_em_aberto, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='oficio',
+            index=models.Index(condition=models.Q(('vencimento_em_aberto__isnull', False)), fields=['vencimento_em_aberto'], name='oficio_vencimento_aberto'),
+        ),
+        migrations.AddField(
+            model_name='notificacaoprazo',
+            name='destinatario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Destinatário'),
+        ),
+        migrations.AddField(
+            model_name='notificacaoprazo',
+            name='oficio',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='Documentos.oficio', verbose_name='Ofício'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacaoprazo',
+            constraint=models.UniqueConstraint(fields=('oficio', 'situacao', 'data_vencimento'), name='notificacao_prazo_unica'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 13:15
+
+import Documentos.armazenamento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0008_prazos_oficios'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documento',
+            name='anexo',
+            field=models.FileField(blank=True, null=True, storage=Documentos.armazenamento.anexos, upload_to='anexos/'),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['anexo'], name='documento_anexo'),
+        ),
+    ]
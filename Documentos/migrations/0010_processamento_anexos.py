@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 13:20
+
+import Documentos.armazenamento
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0009_anexos_armazenamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaAnexo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anexo', models.CharField(max_length=100, verbose_name='Anexo')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=9, verbose_name='Status')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('executar_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar em')),
+                ('erro', models.TextField(blank=True, verbose_name='Último erro')),
+                ('criado', models.DateTimeField(auto_now_add=True, verbose_name='Criação')),
+            ],
+            options={
+                'verbose_name': 'Tarefa de anexo',
+                'verbose_name_plural': 'Tarefas de anexo',
+            },
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='miniatura',
+            field=models.FileField(blank=True, editable=False, null=True, storage=Documentos.armazenamento.anexos, upload_to='miniaturas/'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='texto_anexo',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['miniatura'], name='documento_miniatura'),
+        ),
+        migrations.AddField(
+            model_name='tarefaanexo',
+            name='documento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarefas_anexo', to='Documentos.documento', verbose_name='Documento'),
+        ),
+        migrations.AddIndex(
+            model_name='tarefaanexo',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['executar_em', 'id'], name='tarefa_anexo_pendente'),
+        ),
+    ]
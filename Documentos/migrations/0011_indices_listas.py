@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 13:36
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Índices criados com CREATE INDEX CONCURRENTLY, sem bloquear as gravações nas tabelas grandes
+    # (exige a migração fora de transação)
+    atomic = False
+
+    dependencies = [
+        ('Documentos', '0010_processamento_anexos'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='documento',
+            index=models.Index(fields=['-data_abertura', '-id'], name='documento_abertura_id'),
+        ),
+        AddIndexConcurrently(
+            model_name='documento',
+            index=models.Index(condition=models.Q(('status', 'Aberto')), fields=['-data_abertura', '-id'], name='documento_aberto_abertura'),
+        ),
+        AddIndexConcurrently(
+            model_name='oficio',
+            index=models.Index(fields=['data_vencimento', '-documento_ptr'], name='oficio_vencimento_id'),
+        ),
+        AddIndexConcurrently(
+            model_name='servidor',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome'], name='servidor_ativo_nome'),
+        ),
+        AddIndexConcurrently(
+            model_name='tramitacao',
+            index=models.Index(fields=['-criado', '-id'], name='tramitacao_criado_id'),
+        ),
+    ]
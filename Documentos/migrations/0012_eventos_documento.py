@@ -0,0 +1,71 @@
+# Generated by Django 4.2 on 2026-10-18 13:49
+
+from datetime import date
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+# Nomes e criação das partições copiados de Documentos/particoes.py quando esta migração foi criada
+TABELA = 'Documentos_eventodocumento'
+PADRAO = f'{TABELA}_padrao'
+
+CRIAR_TABELA = f'''
+CREATE TABLE "{TABELA}" (
+    "id" bigserial NOT NULL,
+    "criado" timestamp with time zone NOT NULL,
+    "documento_id" bigint NOT NULL,
+    "modelo" varchar(13) NOT NULL,
+    "objeto_id" bigint NOT NULL,
+    "acao" smallint NOT NULL CHECK ("acao" >= 0),
+    "usuario_id" integer NULL,
+    "alteracoes" jsonb NOT NULL,
+    PRIMARY KEY ("id", "criado")
+) PARTITION BY RANGE ("criado");
+CREATE TABLE "{PADRAO}" PARTITION OF "{TABELA}" DEFAULT;
+CREATE INDEX "eventodocumento_documento_criado" ON "{TABELA}" ("documento_id", "criado" DESC, "id" DESC);
+'''
+
+REMOVER_TABELA = f'DROP TABLE "{TABELA}" CASCADE;'
+
+
+def criar_particoes(apps, schema_editor):
+    # Mês atual e os dois seguintes (a tabela acabou de ser criada, sem eventos a mover); os próximos
+    # são criados pelo comando criar_particoes_eventos
+    hoje = django.utils.timezone.now().date()
+    mes = date(hoje.year, hoje.month, 1)
+    with schema_editor.connection.cursor() as cursor:
+        for _ in range(3):
+            seguinte = date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+            cursor.execute(f'CREATE TABLE "{TABELA}_{mes:%Y_%m}" PARTITION OF "{TABELA}" FOR VALUES FROM (%s) TO (%s)',
+                           [mes.isoformat(), seguinte.isoformat()])
+            mes = seguinte
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Documentos', '0011_indices_listas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoDocumento',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('criado', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data')),
+                ('modelo', models.CharField(max_length=13, verbose_name='Registro')),
+                ('objeto_id', models.BigIntegerField()),
+                ('acao', models.PositiveSmallIntegerField(choices=[(1, 'Criação'), (2, 'Alteração'), (3, 'Exclusão')], verbose_name='Ação')),
+                ('alteracoes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'verbose_name': 'Evento de documento',
+                'verbose_name_plural': 'Eventos de documentos',
+                'db_table': 'Documentos_eventodocumento',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CRIAR_TABELA, REMOVER_TABELA),
+        migrations.RunPython(criar_particoes, migrations.RunPython.noop),
+    ]
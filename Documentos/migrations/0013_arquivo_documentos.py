@@ -0,0 +1,89 @@
+# Generated by Django 4.2 on 2026-10-18 13:54
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+    # Os índices das listas passam a ser parciais (conjunto em uso e arquivo). Os novos são criados com
+    # CREATE INDEX CONCURRENTLY antes de remover os antigos, sem bloquear as gravações nem deixar a
+    # lista sem índice (exige a migração fora de transação)
+    atomic = False
+
+    dependencies = [
+        ('Documentos', '0012_eventos_documento'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='cadastroemail',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='documento',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='oficio',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='ordemservico',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='processo',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='tramitacao',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='arquivo',
+            field=models.BooleanField(default=False, editable=False, verbose_name='No arquivo'),
+        ),
+        migrations.AddField(
+            model_name='tramitacao',
+            name='arquivo',
+            field=models.BooleanField(default=False, editable=False, verbose_name='No arquivo'),
+        ),
+        AddIndexConcurrently(
+            model_name='documento',
+            index=models.Index(condition=models.Q(('arquivo', False)), fields=['-data_abertura', '-id'], name='documento_uso_abertura'),
+        ),
+        AddIndexConcurrently(
+            model_name='documento',
+            index=models.Index(condition=models.Q(('arquivo', True)), fields=['-data_abertura', '-id'], name='documento_arquivo_abertura'),
+        ),
+        AddIndexConcurrently(
+            model_name='tramitacao',
+            index=models.Index(condition=models.Q(('arquivo', False)), fields=['-criado', '-id'], name='tramitacao_uso_criado'),
+        ),
+        AddIndexConcurrently(
+            model_name='tramitacao',
+            index=models.Index(condition=models.Q(('arquivo', True)), fields=['-criado', '-id'], name='tramitacao_arquivo_criado'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='documento',
+            name='documento_abertura_id',
+        ),
+        RemoveIndexConcurrently(
+            model_name='tramitacao',
+            name='tramitacao_criado_id',
+        ),
+    ]
@@ -0,0 +1,139 @@
+# Generated by Django 4.2 on 2026-10-18 13:58
+
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Valores de Processo.TIPO_CHOICES_ASSUNTO (gravado, exibido) antes do catálogo
+ASSUNTOS = (
+    ('ABERTURA DE INSCRICAO IMOBILIARIA AREA RURAL', 'Abertura de inscrição imobiliária área rural'),
+    ('ABERTURA DE MATRICULA', 'Abertura de matrícula'),
+    ('ABERTURA INSCRICAO IMOBILIARIA', 'Abertura inscrição imobiliária'),
+    ('AQUISICAO DE MATERIAL PERMANENTE', 'Aquisição de material permanente'),
+    ('APROVACAO DE PROJETOS ARQUITETONICO', 'Aprovação de projetos arquitetônico'),
+    ('AUTO DE INFRACAO', 'Auto de infração'),
+    ('AVERBACAO', 'Averbação'),
+    ('AVERBACAO EX. OFICIO', 'Averbação ex. ofício'),
+    ('BENEFICIO DO PRODES', 'Benefício do Prodes'),
+    ('CANCELAMENTO DE DEBITO', 'Cancelamento de débito'),
+    ('CERTIDAO', 'Certidão'),
+    ('CERTIDAO DE DEMOLICAO', 'Certidão de demolição'),
+    ('CERTIDAO DE EDIFICACAO', 'Certidão de edificação'),
+    ('CERTIDAO DE VALOR VENAL', 'Certidão de valor venal'),
+    ('CERTIDAO EDIFICACAO – LEI 13.865/2019', 'Certidão edificação – Lei 13.865/2019'),
+    ('CONTRATACAO DE SERVICO', 'Contratação de serviço'),
+    ('DEMANDA DE SOFTWARES DO SETOR', 'Demanda de softwares do setor'),
+    ('DESAFETACAO', 'Desafetação'),
+    ('DESAPROPRIACAO', 'Desapropriação'),
+    ('DESM/REMEM/DESDOBRO E AVERBACAO', 'Desm/remem/desdobro e averbação'),
+    ('DOACAO DE AREA', 'Doação de área'),
+    ('DOACAO EM PAGAMENTO', 'Doação em pagamento'),
+    ('ISENCAO DE IPTU', 'Isenção de IPTU'),
+    ('ISENCAO DE ITBI RURAL', 'Isenção de ITBI rural'),
+    ('ISENCAO DE ITBI URBANO', 'Isenção de ITBI urbano'),
+    ('INDENIZACAO', 'Indenização'),
+    ('LEVANTAMENTO TOPOGRAFICO', 'Levantamento topográfico'),
+    ('LOTEAMENTO', 'Loteamento'),
+    ('NOTIFICACAO DE AUTO DE INFRACAO', 'Notificação de auto de infração'),
+    ('OUTRO ASSUNTO', 'Outro assunto'),
+    ('PARECERES', 'Pareceres'),
+    ('PARECER IMOBILIARIO', 'Parecer imobiliário'),
+    ('PARCELAMENTO', 'Parcelamento'),
+    ('PERMUTA', 'Permuta'),
+    ('PERMISSAO DE USO DE AREA PUBLICA', 'Permissão de uso de área pública'),
+    ('PRESTACAO DE SERVICOS DIVERSOS', 'Prestação de serviços diversos'),
+    ('PROCESSO DE APOSENTADORIA E PENSIONISTA', 'Processo de aposentadoria e pensionista'),
+    ('PROCESSO DE DEBITO', 'Processo de débito'),
+    ('REGULARIZACAO', 'Regularização'),
+    ('REGULARIZACAO FUNDIARIA', 'Regularização fundiária'),
+    ('REMEMBRAMENTO/DESDOBRO', 'Remembramento/desdobro'),
+    ('REVISAO DE DADOS CADASTRAIS', 'Revisão de dados cadastrais'),
+    ('REAVALIACAO DE ITBI RURAL', 'Reavaliação de ITBI rural'),
+    ('REAVALIACAO DE ITBI URBANO', 'Reavaliação de ITBI urbano'),
+    ('SUBSTITUICAO DE RESPONS TRIBUTARIO', 'Substituição de respons tributário'),
+    ('SUBSTITUICAO DE PROJETO', 'Substituição de projeto'),
+    ('VERIFICACAO', 'Verificação'),
+    ('VERIFICACAO DE IPTU', 'Verificação de IPTU'),
+    ('VERIFICACAO DE I.P.T.U.', 'Verificação de I.P.T.U.'),
+    ('REQUERIMENTO', 'Requerimento'),
+)
+
+
+def normalizar(texto):
+    # Cópia de busca.normalizar quando esta migração foi criada
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def preencher_assuntos(apps, schema_editor):
+    # Cria o catálogo com os assuntos da lista antiga, na mesma ordem, e aponta cada processo para o
+    # seu. Textos gravados fora da lista (importações antigas) viram assuntos com o próprio texto,
+    # ou o da lista que só difere em acentos e caixa.
+    Assunto = apps.get_model('Documentos', 'Assunto')
+    Processo = apps.get_model('Documentos', 'Processo')
+    nomes = {}  # {nome normalizado: nome no catálogo}
+    mapa = {}  # {texto gravado: nome no catálogo}
+    for valor, nome in ASSUNTOS:
+        mapa[valor] = nomes.setdefault(normalizar(nome), nome)
+    for valor in Processo._base_manager.values_list('assunto', flat=True).distinct().order_by('assunto'):
+        if valor not in mapa:
+            mapa[valor] = nomes.setdefault(normalizar(valor), valor)
+    Assunto.objects.bulk_create([Assunto(nome=nome) for nome in nomes.values()])
+    ids = dict(Assunto.objects.values_list('nome', 'pk'))
+    valores = [(valor, ids[nome]) for valor, nome in mapa.items()]
+    tabela = Processo._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        # Um único UPDATE, com a correspondência em VALUES
+        cursor.execute(
+            f'UPDATE "{tabela}" SET assunto_novo_id = m.id FROM (VALUES {", ".join(["(%s, %s)"] * len(valores))}) '
+            f'AS m(valor, id) WHERE "{tabela}".assunto = m.valor',
+            [parametro for par in valores for parametro in par])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Documentos', '0013_arquivo_documentos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Assunto',
+            fields=[
+                ('criado', models.DateTimeField(auto_now_add=True, verbose_name='Criação')),
+                ('modificado', models.DateTimeField(auto_now=True, verbose_name='Atualização')),
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=255, unique=True, verbose_name='Assunto')),
+                ('usuario', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Assunto',
+                'verbose_name_plural': 'Assuntos',
+                'ordering': ('nome',),
+            },
+        ),
+        migrations.AddField(
+            model_name='processo',
+            name='assunto_novo',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='Documentos.assunto', verbose_name='Tipo de Assunto'),
+        ),
+        migrations.RunPython(preencher_assuntos, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='processo',
+            name='assunto',
+        ),
+        migrations.RenameField(
+            model_name='processo',
+            old_name='assunto_novo',
+            new_name='assunto',
+        ),
+        migrations.AlterField(
+            model_name='processo',
+            name='assunto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='Documentos.assunto', verbose_name='Tipo de Assunto'),
+        ),
+    ]
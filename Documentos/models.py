@@ -1,9 +1,16 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, router, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.forms import ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from datetime import timedelta
+from . import armazenamento, busca
 
 User = get_user_model()
 
@@ -41,6 +48,10 @@ class Servidor(Base):
     class Meta:
         verbose_name = 'Servidor'
         verbose_name_plural = 'Servidores'
+        indexes = [
+            # Filtro de servidores ativos da lista do admin, em ordem de nome
+            models.Index(fields=['nome'], name='servidor_ativo_nome', condition=models.Q(ativo=True)),
+        ]
     
     def __str__(self):
         return f'{self.nome}'
@@ -52,7 +63,74 @@ class Servidor(Base):
 
     def save(self, *args, **kwargs):
         self.clean()  # Executa a validação ao salvar
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            anterior = Servidor.objects.filter(pk=self.pk).values_list('nome', flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
+            if anterior is not None and anterior != self.nome:
+                # O nome do responsável é copiado para o índice de busca dos documentos
+                busca.reindexar_relacionados(Documento, Servidor, self.pk)
+
+class Assunto(Base):
+    # Catálogo dos assuntos de processo: cada processo guarda a chave de 2 bytes no lugar do texto,
+    # e assuntos novos são cadastrados pelo admin, sem nova versão do sistema
+    id = models.SmallAutoField(primary_key=True)
+    nome = models.CharField(verbose_name='Assunto', max_length=255, unique=True)
+
+    class Meta:
+        verbose_name = 'Assunto'
+        verbose_name_plural = 'Assuntos'
+        ordering = ('nome',)
+
+    def __str__(self):
+        return self.nome
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            anterior = Assunto.objects.filter(pk=self.pk).values_list('nome', flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
+            if anterior is not None and anterior != self.nome:
+                # O nome do assunto é copiado para o índice de busca dos processos
+                busca.reindexar_relacionados(Documento, Assunto, self.pk)
+
+class EmUsoManager(models.Manager):
+    # Conjunto em uso: exclui os registros movidos para o arquivo (ver arquivar_documentos). O manager
+    # `todos`, declarado antes, é o padrão do Django (admin, validação de unicidade, relações reversas).
+    def get_queryset(self):
+        return super().get_queryset().filter(arquivo=False)
+
+class DocumentoQuerySet(models.QuerySet):
+    def prefixo(self, termo):
+        # Documentos cujo rótulo começa com o termo (sem acentos e sem diferenciar caixa)
+        return self.filter(rotulo_busca__startswith=busca.normalizar(termo.strip()))
+
+    def apos(self, cursor):
+        # Paginação por chave: documentos posteriores a (rotulo_busca, id) na ordem do autocomplete
+        rotulo_busca, pk = cursor
+        return self.filter(models.Q(rotulo_busca__gt=rotulo_busca) |
+                           models.Q(rotulo_busca=rotulo_busca, pk__gt=pk)).order_by('rotulo_busca', 'pk')
+
+    def com_usuario(self, usuario):
+        # Documentos atualmente em carga do usuário (índice documento_detentor_status)
+        return self.filter(detentor=usuario)
+
+    def atualizar_detentores(self):
+        # Recalcula última tramitação e detentor a partir das tramitações (usado no backfill)
+        ultima = Tramitacao.todos.filter(num_documento=models.OuterRef('pk')).order_by('-criado', '-id')
+        return self.update(ultima_tramitacao=models.Subquery(ultima.values('pk')[:1]),
+                           detentor=models.Subquery(ultima.values('para')[:1]))
+
+    def arquivar(self):
+        # Move para o arquivo os documentos do queryset (com as linhas das subclasses, que seguem
+        # a do Documento) e as suas tramitações
+        ids = list(self.values_list('pk', flat=True))
+        Tramitacao.todos.filter(num_documento__in=ids).update(arquivo=True)
+        return Documento.todos.filter(pk__in=ids).update(arquivo=True)
+
+    def restaurar(self):
+        # Traz de volta ao conjunto em uso os documentos arquivados do queryset e as suas tramitações
+        ids = list(self.filter(arquivo=True).values_list('pk', flat=True))
+        Tramitacao.todos.filter(num_documento__in=ids, arquivo=True).update(arquivo=False)
+        return Documento.todos.filter(pk__in=ids).update(arquivo=False)
 
 class Documento(Base):
     data_abertura = models.DateField(_('Data de abertura'), blank=False, help_text='Informe a data de abertura do Processo.')
@@ -67,90 +145,164 @@ class Documento(Base):
     data_conclusao = models.DateField(_('Data de conclusão'), blank=True,null=True, help_text='Informe a data de conclusão do Processo.')
     responsavel = models.ForeignKey(Servidor,verbose_name='Responsável', on_delete=models.PROTECT, help_text='Responsável pela carga do documento.')
     observacao = models.TextField(verbose_name='Observações', max_length=400, blank=True)
-    anexo = models.FileField(upload_to='anexos/', blank=True, null=True)
+    # Armazenamento configurável (volume compartilhado ou S3, ver armazenamento.py); o download passa por views.AnexoView
+    anexo = models.FileField(upload_to='anexos/', storage=armazenamento.anexos, blank=True, null=True)
+    # Texto e miniatura do anexo, preenchidos em segundo plano pelo comando processar_anexos (ver tarefas.py)
+    texto_anexo = models.TextField(blank=True, editable=False)
+    miniatura = models.FileField(upload_to='miniaturas/', storage=armazenamento.anexos, blank=True, null=True,
+                                 editable=False)
+    # Tipo concreto (subclasse) e rótulo do documento, mantidos pelo save() das subclasses
+    # para que o __str__ não precise consultar cada tabela filha.
+    TIPO_CHOICES_DOCUMENTO = (
+        ('processo', 'Processo'),
+        ('oficio', 'Ofício'),
+        ('ordemservico', 'Ordem de Serviço'),
+        ('cadastroemail', 'E-mail'),
+    )
+    tipo = models.CharField(verbose_name='Tipo de documento', max_length=13, choices=TIPO_CHOICES_DOCUMENTO, blank=True, editable=False)
+    rotulo = models.CharField(verbose_name='Documento', max_length=120, blank=True, editable=False)
+    # Texto normalizado (sem acentos) e vetor de texto completo usados pela busca (ver busca.py)
+    texto_busca = models.TextField(blank=True, editable=False)
+    # Rótulo normalizado com collation "C": o índice (rotulo_busca, id) atende tanto o LIKE 'termo%'
+    # quanto a ordenação usada na paginação por chave do autocomplete
+    rotulo_busca = models.CharField(max_length=120, blank=True, editable=False, db_collation='C')
+    vetor_busca = SearchVectorField(null=True, editable=False)
+    # Última tramitação e atual detentor do documento, mantidos por Tramitacao.save()
+    ultima_tramitacao = models.ForeignKey('Tramitacao', verbose_name='Última tramitação', on_delete=models.SET_NULL,
+                                          null=True, blank=True, editable=False, related_name='+')
+    detentor = models.ForeignKey(User, verbose_name='Com', on_delete=models.SET_NULL, null=True, blank=True,
+                                 editable=False, related_name='documentos_em_carga')
+    # Documento concluído ou arquivado há tempo, movido para o arquivo por arquivar_documentos;
+    # volta ao conjunto em uso ao ser reaberto
+    arquivo = models.BooleanField(verbose_name='No arquivo', default=False, editable=False)
+
+    # Campos mantidos diretamente no banco, que o save() do documento não deve sobrescrever
+    CAMPOS_MANTIDOS = ('ultima_tramitacao', 'detentor', 'arquivo')
+
+    # Campo da subclasse usado como rótulo do documento
+    campo_rotulo = None
+
+    todos = DocumentoQuerySet.as_manager()
+    objects = EmUsoManager.from_queryset(DocumentoQuerySet)()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['vetor_busca'], name='documento_vetor_busca_gin'),
+            GinIndex(fields=['texto_busca'], name='documento_texto_busca_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['rotulo_busca', 'id'], name='documento_rotulo_busca_id'),
+            models.Index(fields=['detentor', 'status'], name='documento_detentor_status'),
+            # Ordem padrão das listas de processos, e-mails e ordens de serviço (-data_abertura, -id),
+            # também usada na paginação por chave, separada entre o conjunto em uso e o arquivo;
+            # o índice parcial dos abertos atende o filtro por status
+            models.Index(fields=['-data_abertura', '-id'], name='documento_uso_abertura',
+                         condition=models.Q(arquivo=False)),
+            models.Index(fields=['-data_abertura', '-id'], name='documento_arquivo_abertura',
+                         condition=models.Q(arquivo=True)),
+            models.Index(fields=['-data_abertura', '-id'], name='documento_aberto_abertura',
+                         condition=models.Q(status='Aberto')),
+            # Localiza o documento dono de um anexo a partir do nome do arquivo (download de anexos)
+            models.Index(fields=['anexo'], name='documento_anexo'),
+            models.Index(fields=['miniatura'], name='documento_miniatura'),
+        ]
 
     def clean(self):
         # Validação personalizada para garantir que a data de entrada seja anterior à data de saída.
         if self.data_conclusao and self.data_abertura and self.data_abertura > self.data_conclusao:
             raise ValidationError(_('A data de cadastro não pode ser posterior à data de conclusão.'))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        documento = super().from_db(db, field_names, values)
+        # Guarda a posição original do documento nas contagens do dashboard
+        documento._contagem_original = documento.chave_contagem()
+        documento._anexo_original = documento.__dict__.get('anexo') or ''
+        # Valores lidos do banco, comparados no save() para o histórico (ver auditoria.py)
+        documento._valores_originais = dict(zip(field_names, values))
+        return documento
+
+    def chave_contagem(self):
+        # (tipo, status, setor) do documento em ContagemDocumento; None se não for possível determinar
+        if not all(campo in self.__dict__ for campo in ('tipo', 'status', 'setor_id')) or not self.tipo:
+            return None
+        return (self.tipo, self.status, self.setor_id)
+
     def save(self, *args, **kwargs):
         self.clean()  # Executa a validação ao salvar
-        super().save(*args, **kwargs)
+        # Anexo novo ou trocado: o texto e a miniatura do anterior deixam de valer e o processamento é agendado
+        update_fields = kwargs.get('update_fields')
+        anexo_alterado = (update_fields is None or 'anexo' in update_fields) and (
+            (self.anexo and not self.anexo._committed) or
+            (self.anexo.name or '') != getattr(self, '_anexo_original', ''))
+        if anexo_alterado:
+            self.texto_anexo, self.miniatura = '', None
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'texto_anexo', 'miniatura', 'vetor_busca'}
+        # Mantém o tipo, o rótulo e o índice de busca sincronizados com a subclasse
+        if self.campo_rotulo:
+            self.preencher_campos_derivados()
+            update_fields = kwargs.get('update_fields')
+            campos_busca = {campo.split('__')[0] for campo in busca.CAMPOS_BUSCA[self.tipo]}
+            if update_fields is not None and campos_busca.intersection(update_fields):
+                kwargs['update_fields'] = {*update_fields, 'tipo', 'rotulo', 'rotulo_busca', 'texto_busca', 'vetor_busca'}
+        original = None if self._state.adding else getattr(self, '_contagem_original', False)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if (self.pk is not None and kwargs.get('update_fields') is None and
+                    not kwargs.get('force_insert') and not self._state.adding):
+                self.recarregar_campos_mantidos(using)
+            super().save(*args, **kwargs)
+            # Documento antigo sem posição conhecida: as contagens serão corrigidas por recalcular_contagens
+            if original is not False:
+                ContagemDocumento.objects.mover(original, self.chave_contagem(), using=self._state.db)
+            # Reaberto: sai do arquivo
+            if self.arquivo and self.status == 'Aberto':
+                Documento.todos.using(self._state.db).filter(pk=self.pk).restaurar()
+                self.arquivo = False
+            # A tarefa só fica visível para o worker depois do commit, junto com o documento
+            if anexo_alterado and self.anexo:
+                TarefaAnexo.objects.using(self._state.db).create(documento=self, anexo=self.anexo.name)
+        self._contagem_original = self.chave_contagem()
+        self._anexo_original = self.anexo.name or ''
+
+    def recarregar_campos_mantidos(self, using):
+        # Numa gravação completa, última tramitação, detentor e arquivo vêm do banco, e não dos valores
+        # possivelmente antigos da instância. A linha fica bloqueada até o commit, para que uma tramitação
+        # gravada ao mesmo tempo espere (Tramitacao.save atualiza essas colunas).
+        campos = [self._meta.get_field(nome).attname for nome in self.CAMPOS_MANTIDOS]
+        atuais = Documento.todos.using(using).select_for_update().filter(pk=self.pk).values(*campos).first()
+        if atuais is not None:
+            for campo, valor in atuais.items():
+                setattr(self, campo, valor)
+
+    def preencher_campos_derivados(self):
+        # Campos calculados a partir da subclasse; chamado pelo save() e pela importação em lote (bulk_create)
+        self.tipo = self._meta.model_name
+        self.rotulo = getattr(self, self.campo_rotulo)
+        self.rotulo_busca = busca.normalizar(self.rotulo)
+        valores = busca.valores_busca(self, self.tipo)
+        self.texto_busca = busca.texto_busca(valores)
+        self.vetor_busca = busca.vetor_busca(self.rotulo, valores, self.texto_anexo)
 
     def __str__(self):
-        # Se for uma instância de Processo, retorna o número do processo
-        if hasattr(self, 'processo'):
-            return self.processo.numero_processo
-        # Se for uma instância de Oficio, retorna o número do ofício
-        elif hasattr(self, 'oficio'):
-            return self.oficio.numero_oficio
-        # Se for uma instância de OrdemServico, retorna o número da ordem de serviço
-        elif hasattr(self, 'ordemservico'):
-            return self.ordemservico.numero_os
-        # Se for uma instância de CadastroEmail, retorna o assunto do email
-        elif hasattr(self, 'cadastroemail'):
-            return self.cadastroemail.assunto
-        else:
-            return super().__str__()
+        # O rótulo já vem da tabela Documento, sem consultar as tabelas filhas
+        if self.rotulo:
+            return self.rotulo
+        return super().__str__()
+
+    def get_concreto(self):
+        # Retorna a instância da subclasse com uma única consulta, guiada pelo tipo
+        if not self.tipo or type(self) is not Documento:
+            return self
+        return getattr(self, self.tipo)
 
 class Processo(Documento):
     numero_processo = models.CharField(verbose_name= 'Número do Processo', max_length=20, blank=False, unique=True)
     requerente = models.CharField(verbose_name='Requerente', max_length=120, blank=False)
-    TIPO_CHOICES_ASSUNTO = (
-        ('ABERTURA DE INSCRICAO IMOBILIARIA AREA RURAL', 'Abertura de inscrição imobiliária área rural'),
-        ('ABERTURA DE MATRICULA', 'Abertura de matrícula'),
-        ('ABERTURA INSCRICAO IMOBILIARIA', 'Abertura inscrição imobiliária'),
-        ('AQUISICAO DE MATERIAL PERMANENTE', 'Aquisição de material permanente'),
-        ('APROVACAO DE PROJETOS ARQUITETONICO', 'Aprovação de projetos arquitetônico'),
-        ('AUTO DE INFRACAO', 'Auto de infração'),
-        ('AVERBACAO', 'Averbação'),
-        ('AVERBACAO EX. OFICIO', 'Averbação ex. ofício'),
-        ('BENEFICIO DO PRODES', 'Benefício do Prodes'),
-        ('CANCELAMENTO DE DEBITO', 'Cancelamento de débito'),
-        ('CERTIDAO', 'Certidão'),
-        ('CERTIDAO DE DEMOLICAO', 'Certidão de demolição'),
-        ('CERTIDAO DE EDIFICACAO', 'Certidão de edificação'),
-        ('CERTIDAO DE VALOR VENAL', 'Certidão de valor venal'),
-        ('CERTIDAO EDIFICACAO – LEI 13.865/2019', 'Certidão edificação – Lei 13.865/2019'),
-        ('CONTRATACAO DE SERVICO', 'Contratação de serviço'),
-        ('DEMANDA DE SOFTWARES DO SETOR', 'Demanda de softwares do setor'),
-        ('DESAFETACAO', 'Desafetação'),
-        ('DESAPROPRIACAO', 'Desapropriação'),
-        ('DESM/REMEM/DESDOBRO E AVERBACAO', 'Desm/remem/desdobro e averbação'),
-        ('DOACAO DE AREA', 'Doação de área'),
-        ('DOACAO EM PAGAMENTO', 'Doação em pagamento'),
-        ('ISENCAO DE IPTU', 'Isenção de IPTU'),
-        ('ISENCAO DE ITBI RURAL', 'Isenção de ITBI rural'),
-        ('ISENCAO DE ITBI URBANO', 'Isenção de ITBI urbano'),
-        ('INDENIZACAO', 'Indenização'),
-        ('LEVANTAMENTO TOPOGRAFICO', 'Levantamento topográfico'),
-        ('LOTEAMENTO', 'Loteamento'),
-        ('NOTIFICACAO DE AUTO DE INFRACAO', 'Notificação de auto de infração'),
-        ('OUTRO ASSUNTO','Outro assunto'),
-        ('PARECERES', 'Pareceres'),
-        ('PARECER IMOBILIARIO', 'Parecer imobiliário'),
-        ('PARCELAMENTO', 'Parcelamento'),
-        ('PERMUTA', 'Permuta'),
-        ('PERMISSAO DE USO DE AREA PUBLICA', 'Permissão de uso de área pública'),
-        ('PRESTACAO DE SERVICOS DIVERSOS', 'Prestação de serviços diversos'),
-        ('PROCESSO DE APOSENTADORIA E PENSIONISTA', 'Processo de aposentadoria e pensionista'),
-        ('PROCESSO DE DEBITO', 'Processo de débito'),
-        ('REGULARIZACAO', 'Regularização'),
-        ('REGULARIZACAO FUNDIARIA', 'Regularização fundiária'),
-        ('REMEMBRAMENTO/DESDOBRO', 'Remembramento/desdobro'),
-        ('REVISAO DE DADOS CADASTRAIS', 'Revisão de dados cadastrais'),
-        ('REAVALIACAO DE ITBI RURAL', 'Reavaliação de ITBI rural'),
-        ('REAVALIACAO DE ITBI URBANO', 'Reavaliação de ITBI urbano'),
-        ('SUBSTITUICAO DE RESPONS TRIBUTARIO', 'Substituição de respons tributário'),
-        ('SUBSTITUICAO DE PROJETO', 'Substituição de projeto'),
-        ('VERIFICACAO', 'Verificação'),
-        ('VERIFICACAO DE IPTU', 'Verificação de IPTU'),
-        ('VERIFICACAO DE I.P.T.U.', 'Verificação de I.P.T.U.'),
-        ('REQUERIMENTO', 'Requerimento'),
-    )
-    assunto = models.CharField(verbose_name='Tipo de Assunto', max_length=255, choices=TIPO_CHOICES_ASSUNTO, blank=False)
+    # Assunto do catálogo (chave smallint); os nomes ficam em memória em referencias.assuntos()
+    assunto = models.ForeignKey(Assunto, verbose_name='Tipo de Assunto', on_delete=models.PROTECT)
     #inscricao_imob = models.CharField(verbose_name='Inscrição Imobiliária', max_length=11,blank=False)    
+
+    campo_rotulo = 'numero_processo'
         
     class Meta:
         verbose_name = _('Processo')
@@ -164,24 +316,44 @@ class Oficio(Documento):
     assunto = models.CharField(verbose_name='Assunto', max_length=100, blank=False)
     prazo = models.PositiveSmallIntegerField(verbose_name='Prazo', help_text='Quantidade de dias.', blank=False)
     data_vencimento = models.DateField(verbose_name='Data de vencimento', blank=True, editable=False)
+    # Cópia do vencimento apenas enquanto o ofício está aberto. O status fica na tabela Documento,
+    # então é esta coluna que permite um índice parcial só com os prazos em aberto.
+    vencimento_em_aberto = models.DateField(blank=True, null=True, editable=False)
+
+    campo_rotulo = 'numero_oficio'
       
     class Meta:
         verbose_name = ('Ofício')
         verbose_name_plural = ('Ofícios')
+        indexes = [
+            models.Index(fields=['vencimento_em_aberto'], name='oficio_vencimento_aberto',
+                         condition=models.Q(vencimento_em_aberto__isnull=False)),
+            # Ordem padrão da lista de ofícios (data_vencimento, -id)
+            models.Index(fields=['data_vencimento', '-documento_ptr'], name='oficio_vencimento_id'),
+        ]
 
     def __str__(self):
         return f'Ofício: {self.numero_oficio}'
 
-    def save(self, *args, **kwargs):
+    def preencher_campos_derivados(self):
         # Calcula a data de vencimento baseada na data do ofício e no prazo
         if self.data_abertura and self.prazo:
             self.data_vencimento = self.data_abertura + timedelta(days=self.prazo)
+        self.vencimento_em_aberto = self.data_vencimento if self.status == 'Aberto' else None
+        super().preencher_campos_derivados()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'data_abertura', 'prazo', 'status'}.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'data_vencimento', 'vencimento_em_aberto'}
         super().save(*args, **kwargs)
 
 class CadastroEmail(Documento):
     remetente = models.CharField(verbose_name='Remetente', max_length=120, blank=False)
     email = models.EmailField(verbose_name='E-mail', max_length=100, blank=False)
     assunto = models.CharField(verbose_name='Assunto', max_length=120, blank=False)
+
+    campo_rotulo = 'assunto'
     
     class Meta:
         verbose_name = 'E-mail'
@@ -193,6 +365,8 @@ class CadastroEmail(Documento):
 class OrdemServico(Documento):
     numero_os = models.CharField('Número:', max_length=20, blank=False, unique=True)
     assunto = models.CharField(verbose_name='Assunto', max_length=120, blank=False)
+
+    campo_rotulo = 'numero_os'
     
     class Meta:
         verbose_name = 'Ordem de Serviço'
@@ -201,6 +375,32 @@ class OrdemServico(Documento):
     def __str__(self):
         return f'Ordem de serviço: {self.numero_os}'    
     
+class TramitacaoQuerySet(models.QuerySet):
+    def pendentes_para(self, usuario):
+        # Caixa de entrada: tramitações ainda não recebidas pelo usuário (índice tramitacao_caixa_entrada)
+        return self.filter(para=usuario, status='Nao')
+
+    def recentes(self):
+        return self.order_by('-criado', '-id')
+
+    def anteriores_a(self, criado, pk):
+        # Paginação por chave na ordem de recentes()
+        return self.filter(models.Q(criado__lt=criado) | models.Q(criado=criado, pk__lt=pk))
+
+    def marcar_recebidas(self, usuario, ids):
+        # Marca como recebidas, em um único UPDATE, as tramitações pendentes do usuário entre os ids informados
+        from . import auditoria  # auditoria.py importa este módulo
+
+        with transaction.atomic(using=self.db):
+            recebidas = list(self.pendentes_para(usuario).filter(pk__in=ids).select_for_update()
+                             .values_list('pk', 'num_documento_id'))
+            self.filter(pk__in=[pk for pk, _ in recebidas]).update(status='Sim', modificado=timezone.now())
+            auditoria.registrar(
+                EventoDocumento(documento_id=documento_id, modelo='tramitacao', objeto_id=pk,
+                                acao=EventoDocumento.ALTERACAO, usuario=usuario, alteracoes={'status': ['Nao', 'Sim']})
+                for pk, documento_id in recebidas)
+        return len(recebidas)
+
 class Tramitacao(models.Model):
     num_documento = models.ForeignKey(Documento,verbose_name='Documento', on_delete=models.PROTECT) 
     de = models.ForeignKey(User, verbose_name='De', on_delete=models.PROTECT, related_name='tramitações_criadas')
@@ -213,15 +413,194 @@ class Tramitacao(models.Model):
     )
     status = models.CharField(verbose_name='Recebido',
                               max_length=3, choices=TIPO_CHOICES_STATUS, default='Nao')
+    # Acompanha o documento para o arquivo (ver DocumentoQuerySet.arquivar)
+    arquivo = models.BooleanField(verbose_name='No arquivo', default=False, editable=False)
+
+    todos = TramitacaoQuerySet.as_manager()
+    objects = EmUsoManager.from_queryset(TramitacaoQuerySet)()
 
     class Meta:
         verbose_name = 'Tramitação'
         verbose_name_plural = 'Tramitações'
+        indexes = [
+            models.Index(fields=['para', 'status', '-criado', '-id'], name='tramitacao_caixa_entrada'),
+            models.Index(fields=['num_documento', '-criado', '-id'], name='tramitacao_documento_criado'),
+            # Ordem padrão da lista de tramitações (-criado, -id), no conjunto em uso e no arquivo
+            models.Index(fields=['-criado', '-id'], name='tramitacao_uso_criado', condition=models.Q(arquivo=False)),
+            models.Index(fields=['-criado', '-id'], name='tramitacao_arquivo_criado', condition=models.Q(arquivo=True)),
+        ]
     
     def __str__(self):
         return str(self.num_documento)  # Isso usará o __str__ do modelo Documentoos
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        tramitacao = super().from_db(db, field_names, values)
+        # Valores lidos do banco, comparados no save() para o histórico (ver auditoria.py)
+        tramitacao._valores_originais = dict(zip(field_names, values))
+        return tramitacao
+
     def save(self, *args, **kwargs):
         if not self.pk and hasattr(self, '_request') and self._request.user.is_authenticated:
             self.de = self._request.user
-        super().save(*args, **kwargs)
\ No newline at end of file
+        nova = self._state.adding
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            documento = Documento.todos.using(self._state.db).filter(pk=self.num_documento_id)
+            if nova:
+                # O UPDATE bloqueia a linha do documento; só avança o ponteiro se esta for a tramitação mais nova
+                documento.filter(models.Q(ultima_tramitacao__isnull=True) | models.Q(ultima_tramitacao_id__lt=self.pk)) \
+                    .update(ultima_tramitacao=self, detentor=self.para_id)
+            else:
+                documento.filter(ultima_tramitacao=self).update(detentor=self.para_id)
+
+class ContagemDocumentoManager(models.Manager):
+    def ajustar(self, tipo, status, setor_id, quantidade, using=None):
+        # Soma 'quantidade' à contagem de forma atômica (INSERT ... ON CONFLICT), sem ler a linha antes
+        tabela = self.model._meta.db_table
+        with connections[using or self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabela}" (tipo, status, setor_id, total) VALUES (%s, %s, %s, %s) '
+                f'ON CONFLICT (tipo, status, setor_id) DO UPDATE SET total = "{tabela}".total + EXCLUDED.total',
+                [tipo, status, setor_id, quantidade],
+            )
+
+    def mover(self, antiga, nova, using=None):
+        if antiga == nova:
+            return
+        if antiga:
+            self.ajustar(*antiga, -1, using=using)
+        if nova:
+            self.ajustar(*nova, 1, using=using)
+
+    def recalcular(self):
+        # Reconstrói todas as contagens a partir da tabela Documento
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            agrupados = (Documento.todos.exclude(tipo='').values('tipo', 'status', 'setor_id')
+                         .annotate(total=models.Count('pk')).order_by())
+            self.bulk_create([self.model(**linha) for linha in agrupados])
+
+    def totais(self, *campos):
+        # Ex.: totais('tipo') -> {'processo': 215, ...}; totais('setor__sigla_setor', 'status') -> {('SUFGI', 'Aberto'): 3}
+        linhas = self.values(*campos).annotate(soma=models.Sum('total')).order_by()
+        if len(campos) == 1:
+            return {linha[campos[0]]: linha['soma'] for linha in linhas}
+        return {tuple(linha[campo] for campo in campos): linha['soma'] for linha in linhas}
+
+class ContagemDocumento(models.Model):
+    # Contagens por tipo, status e setor mantidas a cada save/delete de documento,
+    # para que o dashboard não execute COUNT(*) sobre as tabelas de documentos.
+    tipo = models.CharField(verbose_name='Tipo de documento', max_length=13, choices=Documento.TIPO_CHOICES_DOCUMENTO)
+    status = models.CharField(verbose_name='Status', max_length=9, choices=Documento.TIPO_CHOICES_STATUS)
+    setor = models.ForeignKey(Setor, verbose_name='Setor', on_delete=models.CASCADE)
+    total = models.IntegerField(verbose_name='Total', default=0)
+
+    objects = ContagemDocumentoManager()
+
+    class Meta:
+        verbose_name = 'Contagem de documentos'
+        verbose_name_plural = 'Contagens de documentos'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'status', 'setor'], name='contagem_documento_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_tipo_display()} / {self.status} / {self.setor_id}: {self.total}'
+
+@receiver(post_delete, sender=Tramitacao)
+def recalcular_detentor(sender, instance, using, **kwargs):
+    # Ao excluir a última tramitação, o documento volta a apontar para a anterior
+    Documento.todos.using(using).filter(pk=instance.num_documento_id, ultima_tramitacao__isnull=True) \
+        .atualizar_detentores()
+
+@receiver(post_delete, sender=Documento)
+def descontar_documento_excluido(sender, instance, using, **kwargs):
+    # A exclusão de qualquer subclasse também exclui a linha de Documento, então basta ouvir o pai
+    ContagemDocumento.objects.mover(instance.chave_contagem(), None, using=using)
+
+class NotificacaoPrazo(models.Model):
+    # Registro dos avisos de prazo já enviados, para que cada execução de notificar_prazos
+    # trate apenas ofícios que ainda não foram avisados naquela situação e vencimento.
+    TIPO_CHOICES_SITUACAO = (
+        ('vencendo', 'Vencendo'),
+        ('vencido', 'Vencido'),
+    )
+    oficio = models.ForeignKey(Oficio, verbose_name='Ofício', on_delete=models.CASCADE, related_name='notificacoes')
+    situacao = models.CharField(verbose_name='Situação', max_length=8, choices=TIPO_CHOICES_SITUACAO)
+    data_vencimento = models.DateField(verbose_name='Data de vencimento')
+    destinatario = models.ForeignKey(User, verbose_name='Destinatário', on_delete=models.SET_NULL, null=True, blank=True)
+    enviado = models.DateTimeField(_('Enviado em'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Notificação de prazo'
+        verbose_name_plural = 'Notificações de prazo'
+        constraints = [
+            models.UniqueConstraint(fields=['oficio', 'situacao', 'data_vencimento'], name='notificacao_prazo_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.oficio_id} - {self.get_situacao_display()} ({self.data_vencimento})'
+
+
+class TarefaAnexo(models.Model):
+    # Fila de processamento de anexos (extração de texto e miniatura), consumida pelo comando
+    # processar_anexos; ver tarefas.py. Criada no mesmo commit do documento que recebeu o anexo.
+    TIPO_CHOICES_STATUS = (
+        ('pendente', 'Pendente'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    )
+    documento = models.ForeignKey(Documento, verbose_name='Documento', on_delete=models.CASCADE, related_name='tarefas_anexo')
+    anexo = models.CharField(verbose_name='Anexo', max_length=100)
+    status = models.CharField(verbose_name='Status', max_length=9, choices=TIPO_CHOICES_STATUS, default='pendente')
+    tentativas = models.PositiveSmallIntegerField(verbose_name='Tentativas', default=0)
+    executar_em = models.DateTimeField(verbose_name='Executar em', default=timezone.now)
+    erro = models.TextField(verbose_name='Último erro', blank=True)
+    criado = models.DateTimeField(_('Criação'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Tarefa de anexo'
+        verbose_name_plural = 'Tarefas de anexo'
+        indexes = [
+            # Só as tarefas pendentes são consultadas pelo worker
+            models.Index(fields=['executar_em', 'id'], name='tarefa_anexo_pendente', condition=models.Q(status='pendente')),
+        ]
+
+    def __str__(self):
+        return f'{self.anexo} ({self.get_status_display()})'
+
+
+class EventoDocumento(models.Model):
+    # Histórico de alterações dos documentos e das suas tramitações, somente com inclusões (ver auditoria.py).
+    # A tabela é particionada por mês de `criado` (migração 0012 e comando criar_particoes_eventos),
+    # por isso não é gerenciada pelo Django; as referências não têm chave estrangeira no banco
+    # para que os eventos sobrevivam à exclusão do documento ou do usuário.
+    TIPO_CHOICES_ACAO = (
+        (1, 'Criação'),
+        (2, 'Alteração'),
+        (3, 'Exclusão'),
+    )
+    CRIACAO, ALTERACAO, EXCLUSAO = 1, 2, 3
+
+    id = models.BigAutoField(primary_key=True)
+    criado = models.DateTimeField(_('Data'), default=timezone.now)
+    documento = models.ForeignKey(Documento, verbose_name='Documento', on_delete=models.DO_NOTHING,
+                                  db_constraint=False, related_name='eventos')
+    # Tipo do documento ou 'tramitacao', e o id da linha alterada
+    modelo = models.CharField(verbose_name='Registro', max_length=13)
+    objeto_id = models.BigIntegerField()
+    acao = models.PositiveSmallIntegerField(verbose_name='Ação', choices=TIPO_CHOICES_ACAO)
+    usuario = models.ForeignKey(User, verbose_name=_('Usuário'), on_delete=models.DO_NOTHING, db_constraint=False,
+                                null=True, blank=True, related_name='+')
+    # Só os campos alterados: {campo: [antes, depois]}
+    alteracoes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        managed = False
+        db_table = 'Documentos_eventodocumento'
+        verbose_name = 'Evento de documento'
+        verbose_name_plural = 'Eventos de documentos'
+
+    def __str__(self):
+        return f'{self.get_acao_display()} de {self.modelo} {self.objeto_id}'
@@ -0,0 +1,87 @@
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import auditoria
+from .models import ContagemDocumento, Documento, EventoDocumento, Oficio, Tramitacao
+
+# Status que encerram o documento e exigem data de conclusão
+STATUS_ENCERRADOS = ('Concluido', 'Arquivado')
+
+
+def despachar(documentos, de, para, status='Nao'):
+    # Tramita de uma vez os documentos do queryset para `para`: um INSERT com todas as tramitações
+    # e um UPDATE que aponta última tramitação e detentor de cada documento para a nova,
+    # no lugar de um Tramitacao.save() por documento. Devolve as tramitações criadas.
+    if not para.is_active:
+        raise ValidationError('O destinatário precisa ser um usuário ativo.')
+    with transaction.atomic():
+        ids = list(documentos.order_by('pk').values_list('pk', flat=True))
+        tramitacoes = Tramitacao.objects.bulk_create([
+            Tramitacao(num_documento_id=pk, de=de, para=para, status=status) for pk in ids
+        ])
+        Documento.todos.filter(pk__in=ids).atualizar_detentores()
+        auditoria.registrar(auditoria.evento(tramitacao, EventoDocumento.CRIACAO,
+                                             {'de_id': [None, de.pk], 'para_id': [None, para.pk], 'status': [None, status]},
+                                             usuario=de)
+                            for tramitacao in tramitacoes)
+    return tramitacoes
+
+
+def alterar_status(documentos, status, data_conclusao=None):
+    # Muda o status dos documentos do queryset com UPDATEs em lote, mantendo as regras do save():
+    # data de conclusão não anterior à abertura nos status encerrados e vazia ao reabrir, vencimento
+    # em aberto dos ofícios, contagens do dashboard e saída do arquivo. Nos status encerrados,
+    # `data_conclusao` (hoje, se não informada) só preenche a dos documentos que ainda não têm uma:
+    # os já encerrados (ex.: de Concluído para Arquivado) mantêm a data original.
+    # Documentos que já estão no status pedido ficam como estão. Devolve a quantidade de documentos alterados.
+    if status not in dict(Documento.TIPO_CHOICES_STATUS):
+        raise ValidationError(f'Status inválido: {status}.')
+    if status in STATUS_ENCERRADOS:
+        data_conclusao = data_conclusao or timezone.localdate()
+    else:
+        data_conclusao = None
+    with transaction.atomic():
+        # As linhas ficam bloqueadas até o commit, para que as contagens partam do status atual
+        linhas = list(Documento.todos.select_for_update()
+                      .filter(pk__in=documentos.values('pk')).exclude(status=status)
+                      .values('pk', 'tipo', 'status', 'setor_id', 'data_abertura', 'data_conclusao', 'rotulo'))
+        if data_conclusao:
+            invalidos = [linha['rotulo'] for linha in linhas
+                         if not linha['data_conclusao'] and linha['data_abertura'] > data_conclusao]
+            if invalidos:
+                raise ValidationError(
+                    'A data de conclusão não pode ser anterior à data de abertura: %s.' % ', '.join(invalidos[:10]))
+        ids = [linha['pk'] for linha in linhas]
+        Documento.todos.filter(pk__in=ids).update(
+            status=status, modificado=timezone.now(),
+            data_conclusao=Coalesce(F('data_conclusao'), Value(data_conclusao)) if data_conclusao else None)
+        Oficio.todos.filter(pk__in=ids).update(
+            vencimento_em_aberto=F('data_vencimento') if status == 'Aberto' else None)
+        if status == 'Aberto':
+            # Reabertos saem do arquivo
+            Documento.todos.filter(pk__in=ids).restaurar()
+        grupos = Counter((linha['tipo'], linha['status'], linha['setor_id']) for linha in linhas if linha['tipo'])
+        for (tipo, anterior, setor_id), quantidade in grupos.items():
+            ContagemDocumento.objects.ajustar(tipo, anterior, setor_id, -quantidade)
+            ContagemDocumento.objects.ajustar(tipo, status, setor_id, quantidade)
+        usuario = auditoria.usuario_atual()
+        auditoria.registrar(
+            EventoDocumento(documento_id=linha['pk'], modelo=linha['tipo'], objeto_id=linha['pk'],
+                            acao=EventoDocumento.ALTERACAO, usuario=usuario,
+                            alteracoes=alteracoes_status(linha, status, data_conclusao))
+            for linha in linhas)
+    return len(ids)
+
+
+def alteracoes_status(linha, status, data_conclusao):
+    # Alterações registradas no histórico: a data de conclusão só entra quando muda
+    alteracoes = {'status': [linha['status'], status]}
+    nova = (linha['data_conclusao'] or data_conclusao) if data_conclusao else None
+    if nova != linha['data_conclusao']:
+        alteracoes['data_conclusao'] = [linha['data_conclusao'], nova]
+    return alteracoes
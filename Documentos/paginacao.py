@@ -0,0 +1,149 @@
+import base64
+import binascii
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Parâmetros da URL com o cursor da página seguinte (após a última linha) ou anterior (antes da primeira)
+CURSOR_APOS = 'apos'
+CURSOR_ANTES = 'antes'
+# Até esta estimativa a contagem exata é barata; acima dela vale a estimativa do planejador
+LIMITE_CONTAGEM_EXATA = 10_000
+
+
+def contagem_estimada(queryset):
+    # Linhas estimadas pelo planejador do PostgreSQL (estatísticas do ANALYZE), sem percorrer a tabela
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+def contar(queryset):
+    # (quantidade, exata): COUNT(*) quando o resultado é pequeno, senão a estimativa
+    estimativa = contagem_estimada(queryset)
+    if estimativa <= LIMITE_CONTAGEM_EXATA:
+        return queryset.count(), True
+    return estimativa, False
+
+
+class PaginadorEstimado(Paginator):
+    # Paginator do admin que evita o COUNT(*) de listas grandes (ver contar)
+    contagem_exata = True
+
+    @cached_property
+    def count(self):
+        quantidade, self.contagem_exata = contar(self.object_list)
+        return quantidade
+
+
+class ChangeListPorChave(ChangeList):
+    # Lista do admin paginada por chave: cada página continua a partir da última (ou antes da primeira)
+    # linha da página atual, na ordenação da lista, em vez de OFFSET. Vale quando a ordenação termina
+    # em uma coluna única (a chave primária que o admin acrescenta para desempatar, ou um número);
+    # ordenações por colunas que aceitam nulo ou por chaves estrangeiras voltam à paginação por OFFSET.
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_APOS, None)
+        lookup_params.pop(CURSOR_ANTES, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filtros, busca e ordenação novos começam da primeira página
+        return super().get_query_string({CURSOR_APOS: None, CURSOR_ANTES: None, **(new_params or {})}, remove)
+
+    def campos_chave(self):
+        # [(campo, decrescente)] da ordenação atual, se ela servir de chave, senão None
+        if self.list_editable:
+            return None
+        campos = []
+        for item in self.queryset.query.order_by:
+            if not isinstance(item, str):
+                return None
+            nome = item.lstrip('-')
+            try:
+                campo = self.lookup_opts.pk if nome == 'pk' else self.lookup_opts.get_field(nome)
+            except FieldDoesNotExist:
+                return None
+            if not campo.concrete or campo.null or (campo.is_relation and not campo.primary_key):
+                return None
+            if any(campo is anterior for anterior, _ in campos):
+                # O admin repete a ordenação padrão do queryset no fim da lista
+                continue
+            campos.append((campo, item.startswith('-')))
+            if campo.primary_key or campo.unique:
+                return campos
+        return None
+
+    def cursor(self, obj):
+        valores = [campo.value_to_string(obj) for campo, _ in self.chave]
+        return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+    def filtro_cursor(self, cursor, anteriores=False):
+        # (a, b, id) > (x, y, z) como a >= x AND (a > x OR a = x AND b > y OR a = x AND b = y AND id > z);
+        # o primeiro termo permite percorrer o índice da ordenação a partir do cursor
+        try:
+            textos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            valores = [campo.to_python(texto) for (campo, _), texto in zip(self.chave, textos, strict=True)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise IncorrectLookupParameters
+        operadores = ['gt' if decrescente == anteriores else 'lt' for _, decrescente in self.chave]
+        primeiro = self.chave[0][0]
+        filtro = Q()
+        for posicao, (campo, _) in enumerate(self.chave):
+            iguais = {anterior.attname: valor for (anterior, _), valor in zip(self.chave[:posicao], valores)}
+            filtro |= Q(**iguais, **{f'{campo.attname}__{operadores[posicao]}': valores[posicao]})
+        return Q(**{f'{primeiro.attname}__{operadores[0]}e': valores[0]}) & filtro
+
+    def pagina(self, apos=None, antes=None):
+        # (linhas, tem_anterior, tem_proxima)
+        linhas = self.queryset
+        if antes:
+            linhas = linhas.filter(self.filtro_cursor(antes, anteriores=True)).reverse()
+        elif apos:
+            linhas = linhas.filter(self.filtro_cursor(apos))
+        linhas = list(linhas[:self.list_per_page + 1])
+        mais = len(linhas) > self.list_per_page
+        linhas = linhas[:self.list_per_page]
+        if not antes:
+            return linhas, bool(apos), mais
+        if not mais:
+            # Chegou ao início da lista: mostra a primeira página completa
+            return self.pagina()
+        return linhas[::-1], True, True
+
+    def get_results(self, request):
+        self.chave = self.campos_chave()
+        self.paginacao_por_chave = self.chave is not None
+        if not self.paginacao_por_chave:
+            super().get_results(request)
+            self.contagem_exata = getattr(self.paginator, 'contagem_exata', True)
+            return
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        linhas, tem_anterior, tem_proxima = self.pagina(self.params.get(CURSOR_APOS), self.params.get(CURSOR_ANTES))
+        self.url_anterior = None
+        if tem_anterior:
+            # Cursor além do fim da lista (linhas excluídas): volta à primeira página
+            self.url_anterior = self.get_query_string({CURSOR_ANTES: self.cursor(linhas[0])} if linhas else {})
+        self.url_proxima = self.get_query_string({CURSOR_APOS: self.cursor(linhas[-1])}) if tem_proxima else None
+
+        self.result_count = paginator.count
+        self.contagem_exata = getattr(paginator, 'contagem_exata', True)
+        # Sem a contagem total da tabela ("N resultados (M no total)"), outro COUNT(*) sobre a lista inteira
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = linhas
+        self.can_show_all = False
+        self.multi_page = tem_anterior or tem_proxima
+        self.paginator = paginator
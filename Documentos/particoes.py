@@ -0,0 +1,46 @@
+from datetime import date
+
+# Histórico de documentos (EventoDocumento), particionado por mês de `criado`. Cada mês tem a sua
+# partição, com o índice (documento_id, criado, id) próprio; a partição padrão recebe os eventos de
+# meses ainda sem partição, para que a gravação nunca falhe.
+TABELA = 'Documentos_eventodocumento'
+PADRAO = f'{TABELA}_padrao'
+
+
+def primeiro_dia(dia):
+    return date(dia.year, dia.month, 1)
+
+
+def proximo_mes(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def nome_particao(mes):
+    return f'{TABELA}_{mes:%Y_%m}'
+
+
+def criar_particao(cursor, mes):
+    # Cria a partição do mês (limites em UTC, o fuso das conexões do Django), levando para ela os
+    # eventos do mês que estavam na partição padrão. Devolve False se ela já existia.
+    nome = nome_particao(mes)
+    cursor.execute('SELECT to_regclass(%s)', [f'"{nome}"'])
+    if cursor.fetchone()[0] is not None:
+        return False
+    limites = [mes.isoformat(), proximo_mes(mes).isoformat()]
+    cursor.execute(f'CREATE TABLE "{nome}" (LIKE "{TABELA}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(f'WITH movidos AS (DELETE FROM "{PADRAO}" WHERE criado >= %s AND criado < %s RETURNING *) '
+                   f'INSERT INTO "{nome}" SELECT * FROM movidos', limites)
+    cursor.execute(f'ALTER TABLE "{TABELA}" ATTACH PARTITION "{nome}" FOR VALUES FROM (%s) TO (%s)', limites)
+    return True
+
+
+def criar_particoes(connection, inicio, meses):
+    # Partições de `meses` meses a partir do mês de `inicio`; devolve os nomes das criadas
+    criadas = []
+    mes = primeiro_dia(inicio)
+    with connection.cursor() as cursor:
+        for _ in range(meses):
+            if criar_particao(cursor, mes):
+                criadas.append(nome_particao(mes))
+            mes = proximo_mes(mes)
+    return criadas
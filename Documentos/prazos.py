@@ -0,0 +1,72 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.mail import send_mass_mail
+from django.db import connection, transaction
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+from .models import NotificacaoPrazo, Oficio
+
+logger = logging.getLogger(__name__)
+
+# Chave do advisory lock que impede duas execuções simultâneas (uma em cada contêiner)
+CHAVE_LOCK = 8_000_001
+
+
+def oficios_a_notificar(hoje, dias):
+    # Ofícios abertos vencidos ou vencendo em até 'dias' dias que ainda não foram avisados
+    # nessa situação. A varredura usa o índice parcial oficio_vencimento_aberto, que só contém
+    # ofícios abertos, então o custo não cresce com o arquivo de ofícios concluídos.
+    situacao = Case(When(vencimento_em_aberto__lt=hoje, then=Value('vencido')), default=Value('vencendo'))
+    avisado = NotificacaoPrazo.objects.filter(oficio=OuterRef('pk'), situacao=OuterRef('situacao'),
+                                              data_vencimento=OuterRef('vencimento_em_aberto'))
+    return (Oficio.objects.filter(vencimento_em_aberto__lte=hoje + timedelta(days=dias))
+            .annotate(situacao=situacao).exclude(Exists(avisado))
+            .select_related('responsavel', 'detentor', 'usuario')
+            .order_by('vencimento_em_aberto', 'pk'))
+
+
+def agrupar_por_destinatario(oficios):
+    # Um aviso por usuário: quem está com o ofício ou, se ainda não tramitou, quem o cadastrou
+    grupos = defaultdict(list)
+    for oficio in oficios:
+        grupos[oficio.detentor or oficio.usuario].append(oficio)
+    return grupos
+
+
+def tem_email(destinatario):
+    return destinatario is not None and bool(destinatario.email)
+
+
+def montar_mensagem(destinatario, oficios, remetente=None):
+    linhas = [f'- Ofício {o.numero_oficio} ({o.assunto}): {"vencido em" if o.situacao == "vencido" else "vence em"} '
+              f'{o.vencimento_em_aberto:%d/%m/%Y}. Responsável: {o.responsavel}' for o in oficios]
+    assunto = f'SUFGI - {len(oficios)} ofício(s) com prazo vencido ou a vencer'
+    return (assunto, '\n'.join(linhas), remetente, [destinatario.email])
+
+
+def notificar_prazos(hoje, dias, simular=False):
+    # Retorna {destinatario: [ofícios]} com os avisos enviados (ou que seriam enviados, se simular).
+    # Os ofícios de quem não tem e-mail também vêm no resultado, mas não são marcados como avisados:
+    # entram de novo na próxima execução, depois que o endereço for cadastrado.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [CHAVE_LOCK])
+            if not cursor.fetchone()[0]:
+                return None
+        grupos = agrupar_por_destinatario(oficios_a_notificar(hoje, dias))
+        if simular:
+            return grupos
+        enviaveis = {destinatario: oficios for destinatario, oficios in grupos.items() if tem_email(destinatario)}
+        sem_email = [oficio.numero_oficio for destinatario, oficios in grupos.items()
+                     if destinatario not in enviaveis for oficio in oficios]
+        if sem_email:
+            logger.warning('Ofício(s) sem destinatário com e-mail, não avisado(s): %s', ', '.join(sem_email))
+        send_mass_mail([montar_mensagem(destinatario, oficios) for destinatario, oficios in enviaveis.items()])
+        NotificacaoPrazo.objects.bulk_create([
+            NotificacaoPrazo(oficio=oficio, situacao=oficio.situacao, data_vencimento=oficio.vencimento_em_aberto,
+                             destinatario=destinatario)
+            for destinatario, oficios in enviaveis.items() for oficio in oficios
+        ], ignore_conflicts=True)
+    return grupos
@@ -0,0 +1,100 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import roteamento
+from .models import Assunto, Servidor, Setor
+
+# Tabelas de referência guardadas no cache: mudam pouco e aparecem em quase todo formulário
+MODELOS = (Setor, Servidor)
+
+
+# As entradas do cache ficam sob uma versão por tabela (ou por usuário, nos fragmentos do base.html).
+# Uma gravação troca a versão, e as entradas antigas deixam de ser lidas e expiram sozinhas.
+# Com um backend compartilhado (redis/memcached), a troca vale para todos os contêineres de uma vez.
+
+def chave_versao(nome, *partes):
+    return ':'.join(('versao', nome, *map(str, partes)))
+
+
+def versao(nome, *partes):
+    chave = chave_versao(nome, *partes)
+    atual = cache.get(chave)
+    if atual is None:
+        # Versão nova (e não um contador): se a chave for descartada pelo cache, não volta a valer
+        # uma versão usada antes, cujas entradas ainda podem estar guardadas
+        atual = time.time_ns()
+        cache.add(chave, atual, None)
+        atual = cache.get(chave, atual)
+    return atual
+
+
+def invalidar(nome, *partes):
+    # Troca a versão na hora (a própria transação passa a ler o dado novo) e de novo depois do commit:
+    # até ele, outra requisição ainda lê os dados antigos e pode guardá-los sob a versão nova
+    def trocar():
+        cache.set(chave_versao(nome, *partes), time.time_ns(), None)
+
+    trocar()
+    transaction.on_commit(trocar)
+
+
+def em_cache(nome, partes, calcular):
+    # Valor guardado sob a versão atual da tabela `nome`; `calcular` é chamado na ausência dele.
+    # As partes vão em hash (termos de busca têm espaços, inválidos como chave no memcached).
+    resumo = hashlib.md5(repr(partes).encode()).hexdigest()
+    chave = f'referencia:{nome}:{versao(nome)}:{resumo}'
+    valor = cache.get(chave)
+    if valor is None:
+        # Lê do primário: a réplica atrasada guardaria sob a versão nova o dado já alterado
+        with roteamento.ler_do_primario():
+            valor = calcular()
+        cache.set(chave, valor, settings.CACHE_REFERENCIAS_SEGUNDOS)
+    return valor
+
+
+def rotulos(modelo):
+    # {pk (texto): str(objeto)} da tabela inteira; setores e servidores são poucas centenas de linhas
+    return em_cache(modelo._meta.model_name, ('rotulos',),
+                    lambda: {str(objeto.pk): str(objeto) for objeto in modelo._default_manager.all()})
+
+
+# Cópias na memória do processo: {nome da tabela: (versão, valor)}
+_memoria = {}
+
+
+def em_memoria(nome, calcular):
+    # Valor mantido na memória do processo enquanto a versão da tabela `nome` não muda: cada uso custa
+    # só a leitura da versão, sem trazer e desserializar o valor do cache compartilhado
+    atual = versao(nome)
+    guardado = _memoria.get(nome)
+    if guardado is None or guardado[0] != atual:
+        with roteamento.ler_do_primario():
+            guardado = _memoria[nome] = (atual, calcular())
+    return guardado[1]
+
+
+def assuntos():
+    # {id: nome} do catálogo de assuntos, para exibir e agrupar processos pela chave sem JOIN
+    return em_memoria('assunto', lambda: dict(Assunto.objects.values_list('pk', 'nome')))
+
+
+@receiver([post_save, post_delete], sender=Assunto)
+@receiver([post_save, post_delete], sender=Setor)
+@receiver([post_save, post_delete], sender=Servidor)
+def invalidar_referencia(sender, **kwargs):
+    invalidar(sender._meta.model_name)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidar_usuario(sender, instance, update_fields=None, **kwargs):
+    # Nome exibido na barra superior; o login só grava last_login e não muda o fragmento
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidar('usuario', instance.pk)
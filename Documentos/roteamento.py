@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+# Leituras liberadas para a réplica no trecho atual (ver ler_da_replica)
+_leitura_replica = ContextVar('leitura_replica', default=False)
+# A requisição atual deve ficar no primário (o usuário gravou algo há pouco)
+_fixar_primario = ContextVar('fixar_primario', default=False)
+# A requisição atual gravou no banco
+_houve_escrita = ContextVar('houve_escrita', default=False)
+
+COOKIE_PRIMARIO = 'usar_primario'
+# Modelos cuja gravação não indica alteração de dados pelo usuário
+MODELOS_IGNORADOS = ('sessions.session',)
+
+
+def banco_leitura():
+    # Alias a usar nas leituras do trecho atual: a réplica, se configurada e permitida, senão None
+    replica = settings.BANCO_REPLICA
+    if not replica or not _leitura_replica.get() or _fixar_primario.get():
+        return None
+    # Dentro de uma transação no primário, as leituras precisam enxergar o que ela gravou
+    if transaction.get_connection(DEFAULT_DB_ALIAS).in_atomic_block:
+        return None
+    return replica
+
+
+@contextmanager
+def ler_da_replica():
+    # Libera as leituras do bloco para a réplica. Usado só em telas de consulta (dashboard,
+    # listas do admin, exportação, autocomplete); o restante continua lendo do primário.
+    token = _leitura_replica.set(True)
+    try:
+        yield
+    finally:
+        _leitura_replica.reset(token)
+
+
+@contextmanager
+def ler_do_primario():
+    # Volta a ler do primário dentro de um bloco ler_da_replica (ex.: dados que vão para o cache)
+    token = _leitura_replica.set(False)
+    try:
+        yield
+    finally:
+        _leitura_replica.reset(token)
+
+
+class RoteadorReplica:
+    # Envia à réplica (settings.BANCO_REPLICA) as leituras feitas dentro de ler_da_replica();
+    # as gravações vão sempre para o primário e são registradas para o RoteamentoMiddleware.
+
+    def db_for_read(self, model, **hints):
+        return banco_leitura()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower not in MODELOS_IGNORADOS:
+            _houve_escrita.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema pela replicação do PostgreSQL
+        return db != settings.BANCO_REPLICA
+
+
+class RoteamentoMiddleware:
+    # Leitura das próprias gravações: depois de uma requisição que gravou no banco, o usuário
+    # recebe um cookie que mantém as suas próximas requisições no primário pelo tempo
+    # necessário para a réplica alcançá-lo (REPLICA_FIXAR_PRIMARIO_SEGUNDOS).
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token_fixar = _fixar_primario.set(COOKIE_PRIMARIO in request.COOKIES)
+        token_escrita = _houve_escrita.set(False)
+        try:
+            resposta = self.get_response(request)
+            if _houve_escrita.get() and settings.BANCO_REPLICA:
+                resposta.set_cookie(COOKIE_PRIMARIO, '1', max_age=settings.REPLICA_FIXAR_PRIMARIO_SEGUNDOS,
+                                    httponly=True, samesite='Lax')
+            return resposta
+        finally:
+            _houve_escrita.reset(token_escrita)
+            _fixar_primario.reset(token_fixar)
+
+
+class LeituraReplicaMixin:
+    # Para views de consulta: executa a view e renderiza o template com as leituras na réplica
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with ler_da_replica():
+            resposta = super().dispatch(request, *args, **kwargs)
+            if hasattr(resposta, 'render') and not resposta.is_rendered:
+                resposta.render()
+        return resposta
@@ -0,0 +1,132 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+
+from . import busca
+from .importacao import inserir_documentos
+from .models import Assunto, CadastroEmail, Documento, Oficio, OrdemServico, Processo, Servidor, Setor, Tramitacao
+
+User = get_user_model()
+
+# Participação de cada tipo no total de documentos gerados
+PROPORCOES = ((Processo, 0.55), (Oficio, 0.2), (CadastroEmail, 0.15), (OrdemServico, 0.1))
+STATUS = (('Aberto', 0.3), ('Concluido', 0.6), ('Arquivado', 0.1))
+PRAZOS = (5, 10, 15, 30, 60)
+NOMES = ('Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Fábio', 'Gabriela', 'Hugo', 'Isabel', 'João',
+         'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sônia', 'Tiago', 'Vera', 'Wagner')
+SOBRENOMES = ('Almeida', 'Barbosa', 'Cardoso', 'Dias', 'Esteves', 'Ferreira', 'Gomes', 'Lima', 'Martins',
+              'Nogueira', 'Oliveira', 'Pereira', 'Ribeiro', 'Santos', 'Souza', 'Teixeira', 'Vieira')
+TEMAS = ('solicitação de vistoria', 'pedido de informações', 'encaminhamento de documentos', 'revisão de cadastro',
+         'manutenção predial', 'regularização de imóvel', 'convocação para reunião', 'resposta a requerimento',
+         'atualização de valores', 'notificação de prazo')
+
+
+class GeradorDados:
+    # Gera volumes realistas para testes de carga: setores, servidores, usuários, documentos de todos
+    # os tipos (processos com os assuntos do cadastro, ofícios com prazos) e cadeias de tramitação.
+    # Os documentos são gravados em lote como na importação; execuções seguidas acrescentam dados.
+    # A mesma semente gera os mesmos dados sobre o mesmo banco.
+
+    def __init__(self, semente=0, tamanho_lote=5000, inicio=date(2015, 1, 1), hoje=None):
+        self.aleatorio = random.Random(semente)
+        self.tamanho_lote = tamanho_lote
+        self.inicio = inicio
+        self.hoje = hoje or date.today()
+
+    def escolher(self, pesos):
+        valores, probabilidades = zip(*pesos)
+        return self.aleatorio.choices(valores, probabilidades)[0]
+
+    def nome(self):
+        return f'{self.aleatorio.choice(NOMES)} {self.aleatorio.choice(SOBRENOMES)}'
+
+    def data(self):
+        return self.inicio + timedelta(days=self.aleatorio.randrange((self.hoje - self.inicio).days + 1))
+
+    def referencias(self, setores, servidores, usuarios):
+        # Completa as tabelas de referência até as quantidades pedidas (os nomes gerados são numerados)
+        Setor.objects.bulk_create([Setor(sigla_setor=f'S{numero:04d}') for numero in range(setores)],
+                                  ignore_conflicts=True)
+        self.setores = list(Setor.objects.all())
+        Servidor.objects.bulk_create([
+            Servidor(nome=f'Servidor {numero:05d}', setor_servidor=self.aleatorio.choice(self.setores),
+                     data_entrada=self.data(), ativo=self.aleatorio.random() > 0.1)
+            for numero in range(servidores)
+        ], ignore_conflicts=True)
+        self.servidores = list(Servidor.objects.all())
+        # Os assuntos vêm do catálogo criado pela migração
+        self.assuntos = list(Assunto.objects.all())
+        senha = make_password(None)
+        User.objects.bulk_create([
+            User(username=f'usuario{numero:04d}', first_name=self.aleatorio.choice(NOMES),
+                 last_name=self.aleatorio.choice(SOBRENOMES), is_staff=True, password=senha)
+            for numero in range(usuarios)
+        ], ignore_conflicts=True)
+        self.usuarios = list(User.objects.filter(is_active=True).values_list('pk', flat=True))
+
+    def documento(self, modelo, numero):
+        abertura = self.data()
+        status = self.escolher(STATUS)
+        conclusao = None
+        if status != 'Aberto':
+            conclusao = min(abertura + timedelta(days=self.aleatorio.randrange(1, 180)), self.hoje)
+        campos = {
+            'data_abertura': abertura, 'status': status, 'data_conclusao': conclusao,
+            'setor': self.aleatorio.choice(self.setores), 'responsavel': self.aleatorio.choice(self.servidores),
+            'usuario_id': self.aleatorio.choice(self.usuarios),
+        }
+        tema = self.aleatorio.choice(TEMAS)
+        if modelo is Processo:
+            campos.update(numero_processo=f'{numero:07d}/{abertura.year}', requerente=self.nome(),
+                          assunto=self.aleatorio.choice(self.assuntos))
+        elif modelo is Oficio:
+            campos.update(numero_oficio=f'OF {numero:07d}/{abertura.year}', assunto=tema.capitalize(),
+                          prazo=self.aleatorio.choice(PRAZOS))
+        elif modelo is CadastroEmail:
+            remetente = self.nome()
+            campos.update(remetente=remetente, assunto=f'{tema.capitalize()} nº {numero}',
+                          email=f"{busca.normalizar(remetente).replace(' ', '.')}.{numero}@exemplo.gov.br")
+        else:
+            campos.update(numero_os=f'OS {numero:07d}/{abertura.year}', assunto=tema.capitalize())
+        return modelo(**campos)
+
+    def tramitacoes(self, documentos, media):
+        # Cadeia de despachos de cada documento: cada tramitação parte de quem recebeu a anterior;
+        # só a última pode estar pendente (ainda não recebida)
+        tramitacoes = []
+        for documento in documentos:
+            de = documento.usuario_id
+            quantidade = self.aleatorio.randint(0, 2 * media) if media else 0
+            for posicao in range(quantidade):
+                para = self.aleatorio.choice(self.usuarios)
+                ultima = posicao == quantidade - 1
+                status = 'Nao' if ultima and self.aleatorio.random() < 0.3 else 'Sim'
+                tramitacoes.append(Tramitacao(num_documento_id=documento.pk, de_id=de, para_id=para, status=status))
+                de = para
+        Tramitacao.objects.bulk_create(tramitacoes)
+        # Última tramitação e detentor, mantidos pelo Tramitacao.save() no uso normal
+        Documento.objects.filter(pk__in=[documento.pk for documento in documentos]).atualizar_detentores()
+        return len(tramitacoes)
+
+    def gerar(self, documentos, tramitacoes_por_documento=2, progresso=None):
+        # Acrescenta `documentos` documentos, divididos entre os tipos conforme PROPORCOES
+        numero = (Documento.todos.aggregate(maior=Max('pk'))['maior'] or 0) + 1
+        quantidades = {modelo: int(documentos * proporcao) for modelo, proporcao in PROPORCOES}
+        quantidades[Processo] += documentos - sum(quantidades.values())
+        totais = {}
+        for modelo, quantidade in quantidades.items():
+            totais[modelo] = 0
+            while totais[modelo] < quantidade:
+                tamanho = min(self.tamanho_lote, quantidade - totais[modelo])
+                lote = [self.documento(modelo, numero + posicao) for posicao in range(tamanho)]
+                numero += tamanho
+                inserir_documentos(modelo, lote)
+                self.tramitacoes(lote, tramitacoes_por_documento)
+                totais[modelo] += tamanho
+                if progresso:
+                    progresso(modelo, totais[modelo], quantidade)
+        return totais
+
@@ -0,0 +1,41 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Autocomplete de documentos paginado por chave: guarda o cursor devolvido
+    // em cada página e o envia ao pedir a página seguinte.
+    $.fn.documentoSelect2 = function() {
+        $.each(this, function(i, element) {
+            const cursores = {};
+            const chave = (params) => (params.term || '') + '|' + (params.page || 1);
+            $(element).select2({
+                ajax: {
+                    data: (params) => {
+                        return {
+                            term: params.term,
+                            cursor: cursores[chave(params)],
+                            app_label: element.dataset.appLabel,
+                            model_name: element.dataset.modelName,
+                            field_name: element.dataset.fieldName
+                        };
+                    },
+                    processResults: (data, params) => {
+                        if (data.pagination.cursor) {
+                            cursores[chave({term: params.term, page: (params.page || 1) + 1})] = data.pagination.cursor;
+                        }
+                        return data;
+                    }
+                }
+            });
+        });
+        return this;
+    };
+
+    $(function() {
+        $('.documento-autocomplete').not('[name*=__prefix__]').documentoSelect2();
+    });
+
+    document.addEventListener('formset:added', (event) => {
+        $(event.target).find('.documento-autocomplete').documentoSelect2();
+    });
+}
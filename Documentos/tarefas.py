@@ -0,0 +1,132 @@
+import io
+import logging
+import posixpath
+import time
+import traceback
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, InterfaceError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Documento, TarefaAnexo
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVAS = 5
+# O tsvector do PostgreSQL é limitado a 1 MB; o início do documento basta para a busca
+LIMITE_TEXTO = 200_000
+TAMANHO_MINIATURA = (320, 320)
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def extrair_pdf(arquivo):
+    # Texto de todas as páginas e a primeira imagem da primeira página (a digitalização, nos PDFs escaneados)
+    from pypdf import PdfReader
+
+    leitor = PdfReader(arquivo)
+    partes, tamanho = [], 0
+    for pagina in leitor.pages:
+        texto = pagina.extract_text() or ''
+        partes.append(texto)
+        tamanho += len(texto)
+        if tamanho >= LIMITE_TEXTO:
+            break
+    imagem = None
+    if leitor.pages and leitor.pages[0].images:
+        imagem = leitor.pages[0].images[0].image
+    return '\n'.join(partes)[:LIMITE_TEXTO], imagem
+
+
+def extrair(arquivo, nome):
+    # Devolve (texto, imagem Pillow ou None) conforme o tipo do anexo
+    from PIL import Image
+
+    extensao = posixpath.splitext(nome)[1].lower()
+    if extensao == '.pdf':
+        return extrair_pdf(arquivo)
+    if extensao in EXTENSOES_IMAGEM:
+        return '', Image.open(arquivo)
+    if extensao == '.txt':
+        return arquivo.read(LIMITE_TEXTO).decode('utf-8', 'replace'), None
+    return '', None
+
+
+def gerar_miniatura(imagem):
+    imagem = imagem.convert('RGB')
+    imagem.thumbnail(TAMANHO_MINIATURA)
+    saida = io.BytesIO()
+    imagem.save(saida, format='PNG', optimize=True)
+    return ContentFile(saida.getvalue(), name='miniatura.png')
+
+
+def processar(tarefa):
+    documento = Documento.todos.get(pk=tarefa.documento_id)
+    # O mesmo arquivo já processado para outro documento (anexos deduplicados): reaproveita o resultado
+    pronto = (Documento.todos.filter(anexo=tarefa.anexo).exclude(pk=documento.pk)
+              .exclude(Q(texto_anexo='') & (Q(miniatura='') | Q(miniatura__isnull=True)))
+              .values('texto_anexo', 'miniatura').first())
+    if pronto:
+        texto, miniatura = pronto['texto_anexo'], pronto['miniatura']
+    else:
+        armazenamento = documento.anexo.storage
+        with armazenamento.open(tarefa.anexo) as arquivo:
+            texto, imagem = extrair(arquivo, tarefa.anexo)
+            miniatura = armazenamento.save('miniaturas/miniatura.png', gerar_miniatura(imagem)) if imagem else None
+    concreto = documento.get_concreto()
+    concreto.texto_anexo = texto.replace('\x00', '')
+    concreto.preencher_campos_derivados()
+    # Não sobrescreve se o anexo foi trocado enquanto a tarefa rodava (a troca gera outra tarefa)
+    Documento.todos.filter(pk=documento.pk, anexo=tarefa.anexo).update(
+        texto_anexo=concreto.texto_anexo, vetor_busca=concreto.vetor_busca, miniatura=miniatura)
+
+
+def executar_proxima():
+    # Reserva a próxima tarefa pendente com FOR UPDATE SKIP LOCKED, de modo que vários workers
+    # consumam a fila sem disputa. A transação fica aberta durante o processamento: se o worker
+    # morrer, o bloqueio é liberado e a tarefa volta a ficar disponível.
+    with transaction.atomic():
+        tarefa = (TarefaAnexo.objects.select_for_update(skip_locked=True)
+                  .filter(status='pendente', executar_em__lte=timezone.now())
+                  .order_by('executar_em', 'id').first())
+        if tarefa is None:
+            return None
+        tarefa.tentativas += 1
+        try:
+            with transaction.atomic():
+                processar(tarefa)
+        except Exception:
+            tarefa.erro = traceback.format_exc()
+            if tarefa.tentativas >= MAX_TENTATIVAS:
+                tarefa.status = 'falhou'
+            else:
+                # Nova tentativa com espera crescente: 2, 4, 8, 16 minutos
+                tarefa.executar_em = timezone.now() + timedelta(minutes=2 ** tarefa.tentativas)
+        else:
+            tarefa.status = 'concluida'
+            tarefa.erro = ''
+        tarefa.save(update_fields=['status', 'tentativas', 'executar_em', 'erro'])
+        return tarefa
+
+
+def trabalhar(intervalo=5, ate_esvaziar=False):
+    # Laço de um worker: processa enquanto houver tarefas e, com a fila vazia, espera o intervalo
+    processadas = 0
+    while True:
+        try:
+            tarefa = executar_proxima()
+        except (DatabaseError, InterfaceError):
+            # Banco indisponível (reinício, failover): o serviço reconecta em vez de encerrar o worker
+            if ate_esvaziar:
+                raise
+            logger.exception('Falha de conexão no worker de anexos')
+            connection.close()
+            time.sleep(intervalo)
+            continue
+        if tarefa is not None:
+            processadas += 1
+        elif ate_esvaziar:
+            return processadas
+        else:
+            time.sleep(intervalo)
@@ -1,3 +1,1321 @@
-from django.test import TestCase
+import hashlib
+import importlib.util
+import os
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from model_mommy import mommy
+
+from . import busca, metricas, operacoes, particoes, referencias
+from .roteamento import COOKIE_PRIMARIO, RoteadorReplica, RoteamentoMiddleware, banco_leitura, ler_da_replica
+from .tarefas import trabalhar
+from .anexos import armazenamento, coletar_anexos
+from .importacao import Importador, ler_arquivo
+from .prazos import notificar_prazos
+from .desempenho import Medidor
+from .sinteticos import GeradorDados
+from .models import Processo, Oficio, Setor, Servidor, CadastroEmail, OrdemServico, Tramitacao, Documento, ContagemDocumento, Assunto, EventoDocumento, NotificacaoPrazo, TarefaAnexo
+
+User = get_user_model()
+
+
+class ChangelistQueryBudgetTests(TestCase):
+    # Garante que as listas do admin usam um número constante de consultas,
+    # independentemente da quantidade de linhas exibidas na página.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def criar_documento(self, modelo, **kwargs):
+        if modelo is Oficio:
+            kwargs.setdefault('prazo', 10)
+        return mommy.make(modelo, setor=self.criar_setor(), responsavel=self.criar_servidor(),
+                          usuario=self.admin, data_abertura=date(2024, 1, 1), data_conclusao=None, **kwargs)
+
+    def criar_tramitacao(self):
+        documento = self.criar_documento(Processo)
+        de = mommy.make(User, first_name='De', last_name='Fulano')
+        para = mommy.make(User, first_name='Para', last_name='Beltrano')
+        return mommy.make(Tramitacao, num_documento=documento, de=de, para=para)
+
+    def criar_servidor(self):
+        return mommy.make(Servidor, setor_servidor=mommy.make(Setor, sigla_setor=mommy.random_gen.gen_string(5)),
+                          data_saida=None)
+
+    def criar_setor(self):
+        return mommy.make(Setor, sigla_setor=mommy.random_gen.gen_string(5))
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas)
+
+    def assertConsultasConstantes(self, modelo, criar):
+        url = reverse(f'admin:Documentos_{modelo._meta.model_name}_changelist')
+        criar()
+        poucas_linhas = self.contar_consultas(url)
+        for _ in range(5):
+            criar()
+        muitas_linhas = self.contar_consultas(url)
+        self.assertEqual(poucas_linhas, muitas_linhas,
+                         f'A lista de {modelo.__name__} cresce com o número de linhas.')
+
+    def test_setor_changelist(self):
+        self.assertConsultasConstantes(Setor, self.criar_setor)
+
+    def test_servidor_changelist(self):
+        self.assertConsultasConstantes(Servidor, self.criar_servidor)
+
+    def test_documento_changelist(self):
+        self.assertConsultasConstantes(Documento, lambda: self.criar_documento(Processo))
+
+    def test_processo_changelist(self):
+        self.assertConsultasConstantes(Processo, lambda: self.criar_documento(Processo))
+
+    def test_oficio_changelist(self):
+        self.assertConsultasConstantes(Oficio, lambda: self.criar_documento(Oficio))
+
+    def test_email_changelist(self):
+        self.assertConsultasConstantes(CadastroEmail, lambda: self.criar_documento(CadastroEmail))
+
+    def test_ordemservico_changelist(self):
+        self.assertConsultasConstantes(OrdemServico, lambda: self.criar_documento(OrdemServico))
+
+    def test_tramitacao_changelist(self):
+        self.assertConsultasConstantes(Tramitacao, self.criar_tramitacao)
+
+
+class BuscaDocumentoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        responsavel = mommy.make(Servidor, setor_servidor=setor, nome='José da Silva', data_saida=None)
+        cls.processo = mommy.make(Processo, numero_processo='12345/2024', requerente='João Conceição',
+                                  assunto=Assunto.objects.get(nome='Certidão'), setor=setor, responsavel=responsavel,
+                                  data_abertura=date(2024, 1, 1), data_conclusao=None)
+        cls.ordem = mommy.make(OrdemServico, numero_os='OS-77', assunto='Manutenção elétrica',
+                               setor=setor, responsavel=responsavel,
+                               data_abertura=date(2024, 1, 1), data_conclusao=None)
+
+    def buscar(self, termo, queryset=None):
+        return set(busca.buscar(queryset or Documento.objects.all(), termo).values_list('pk', flat=True))
+
+    def test_busca_ignora_acentos_e_flexoes(self):
+        self.assertEqual(self.buscar('joao conceicao'), {self.processo.pk})
+        self.assertEqual(self.buscar('eletricas'), {self.ordem.pk})
+        self.assertEqual(self.buscar('JOSÉ'), {self.ordem.pk})
+
+    def test_busca_trecho_de_numero(self):
+        self.assertEqual(self.buscar('12345'), {self.processo.pk})
+        self.assertEqual(self.buscar('os-7'), {self.ordem.pk})
+
+    def test_indice_atualizado_ao_salvar(self):
+        self.processo.requerente = 'Maria Aparecida'
+        self.processo.save()
+        self.assertEqual(self.buscar('aparecida'), {self.processo.pk})
+        self.assertEqual(self.buscar('conceicao'), set())
+
+    def test_indice_atualizado_ao_renomear_servidor(self):
+        responsavel = self.ordem.responsavel
+        responsavel.nome = 'Joaquim Pereira'
+        responsavel.save()
+        self.assertEqual(self.buscar('joaquim'), {self.ordem.pk})
+        self.assertEqual(self.buscar('jose'), set())
+
+    def test_busca_no_admin_de_tramitacao(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        mommy.make(Tramitacao, num_documento=self.processo.documento_ptr, de=admin, para=admin)
+        self.client.force_login(admin)
+        resposta = self.client.get(reverse('admin:Documentos_tramitacao_changelist'), {'q': '12345'})
+        self.assertContains(resposta, '12345/2024')
+
+
+class DocumentoAutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        responsavel = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        for numero in range(25):
+            mommy.make(Processo, numero_processo=f'{numero:03d}/2024', setor=setor, responsavel=responsavel,
+                       data_abertura=date(2024, 1, 1), data_conclusao=None)
+        mommy.make(CadastroEmail, assunto='Ofício de notificação', setor=setor, responsavel=responsavel,
+                   data_abertura=date(2024, 1, 1), data_conclusao=None)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def autocomplete(self, termo, cursor=None):
+        parametros = {'term': termo, 'app_label': 'Documentos', 'model_name': 'tramitacao',
+                      'field_name': 'num_documento'}
+        if cursor:
+            parametros['cursor'] = cursor
+        return self.client.get(reverse('admin:Documentos_documento_autocomplete'), parametros).json()
+
+    def test_prefixo_sem_acento(self):
+        dados = self.autocomplete('oficio')
+        self.assertEqual([r['text'] for r in dados['results']], ['Ofício de notificação'])
+        self.assertFalse(dados['pagination']['more'])
+
+    def test_paginacao_por_chave(self):
+        primeira = self.autocomplete('0')
+        self.assertEqual(len(primeira['results']), 20)
+        self.assertTrue(primeira['pagination']['more'])
+        segunda = self.autocomplete('0', primeira['pagination']['cursor'])
+        textos = [r['text'] for r in primeira['results'] + segunda['results']]
+        self.assertEqual(textos, [f'{numero:03d}/2024' for numero in range(25)])
+        self.assertFalse(segunda['pagination']['more'])
+
+    def test_rotulos_em_uma_consulta(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.autocomplete('0')
+        consultas_documento = [c for c in consultas if 'Documentos_documento' in c['sql']]
+        self.assertEqual(len(consultas_documento), 1)
+
+    def test_formulario_de_tramitacao_usa_autocomplete(self):
+        resposta = self.client.get(reverse('admin:Documentos_tramitacao_add'))
+        self.assertContains(resposta, 'documento-autocomplete')
+        self.assertContains(resposta, reverse('admin:Documentos_documento_autocomplete'))
+
+
+class ContagemDocumentoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sufgi = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.semadur = mommy.make(Setor, sigla_setor='SEMAD')
+        cls.responsavel = mommy.make(Servidor, setor_servidor=cls.sufgi, data_saida=None)
+
+    def criar(self, modelo, **kwargs):
+        kwargs.setdefault('setor', self.sufgi)
+        if modelo is Oficio:
+            kwargs.setdefault('prazo', 10)
+        return mommy.make(modelo, responsavel=self.responsavel, data_abertura=date(2024, 1, 1),
+                          data_conclusao=None, **kwargs)
+
+    def contagens(self):
+        return ContagemDocumento.objects.totais('tipo', 'status', 'setor__sigla_setor')
+
+    def test_contagens_acompanham_save_e_delete(self):
+        processo = self.criar(Processo)
+        self.criar(Processo)
+        oficio = self.criar(Oficio)
+        self.assertEqual(self.contagens(), {('processo', 'Aberto', 'SUFGI'): 2, ('oficio', 'Aberto', 'SUFGI'): 1})
+
+        processo = Processo.objects.get(pk=processo.pk)
+        processo.status = 'Concluido'
+        processo.setor = self.semadur
+        processo.save()
+        Oficio.objects.filter(pk=oficio.pk).delete()
+        self.assertEqual(self.contagens(), {
+            ('processo', 'Aberto', 'SUFGI'): 1,
+            ('processo', 'Concluido', 'SEMAD'): 1,
+            ('oficio', 'Aberto', 'SUFGI'): 0,
+        })
+
+    def test_recalcular(self):
+        self.criar(CadastroEmail)
+        self.criar(OrdemServico, status='Arquivado')
+        ContagemDocumento.objects.update(total=99)
+        ContagemDocumento.objects.recalcular()
+        self.assertEqual(self.contagens(), {('cadastroemail', 'Aberto', 'SUFGI'): 1,
+                                            ('ordemservico', 'Arquivado', 'SUFGI'): 1})
+
+    def test_dashboard(self):
+        self.criar(Processo)
+        self.criar(Processo, setor=self.semadur)
+        with self.assertNumQueries(2):
+            resposta = self.client.get(reverse('Documentos:index'))
+        self.assertEqual(resposta.context['total_processos'], 2)
+        self.assertEqual(resposta.context['contagens_por_setor'], [('SEMAD', [1, 0, 0]), ('SUFGI', [1, 0, 0])])
+
+
+class CaixaEntradaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('destino', password='senha', is_staff=True)
+        cls.outro = User.objects.create_user('outro', password='senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        responsavel = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        documento = mommy.make(Processo, numero_processo='1/2024', setor=setor, responsavel=responsavel,
+                               data_abertura=date(2024, 1, 1), data_conclusao=None)
+        cls.pendentes = [mommy.make(Tramitacao, num_documento=documento.documento_ptr, de=cls.outro, para=cls.usuario)
+                         for _ in range(30)]
+        mommy.make(Tramitacao, num_documento=documento.documento_ptr, de=cls.outro, para=cls.usuario, status='Sim')
+        mommy.make(Tramitacao, num_documento=documento.documento_ptr, de=cls.usuario, para=cls.outro)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_exige_login(self):
+        self.client.logout()
+        resposta = self.client.get(reverse('Documentos:caixa_entrada'))
+        self.assertRedirects(resposta, reverse('admin:login') + '?next=' + reverse('Documentos:caixa_entrada'))
+
+    def test_lista_pendentes_com_paginacao_por_chave(self):
+        resposta = self.client.get(reverse('Documentos:caixa_entrada'))
+        primeira = resposta.context['tramitacoes']
+        self.assertEqual(len(primeira), 25)
+        self.assertEqual(resposta.context['tramitacoes_pendentes'], 30)
+        resposta = self.client.get(reverse('Documentos:caixa_entrada'), {'antes': resposta.context['proxima_pagina']})
+        segunda = resposta.context['tramitacoes']
+        self.assertNotIn('proxima_pagina', resposta.context)
+        esperado = sorted(self.pendentes, key=lambda t: (t.criado, t.pk), reverse=True)
+        self.assertEqual([t.pk for t in primeira + segunda], [t.pk for t in esperado])
+
+    def test_marcar_recebidas_em_um_update(self):
+        ids = [str(t.pk) for t in self.pendentes[:3]]
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('Documentos:caixa_entrada'), {'tramitacoes': ids})
+        updates = [c for c in consultas if c['sql'].startswith('UPDATE "Documentos_tramitacao"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Tramitacao.objects.pendentes_para(self.usuario).count(), 27)
+
+    def test_nao_marca_tramitacao_de_outro_usuario(self):
+        alheia = Tramitacao.objects.get(para=self.outro)
+        self.client.post(reverse('Documentos:caixa_entrada'), {'tramitacoes': [str(alheia.pk)]})
+        alheia.refresh_from_db()
+        self.assertEqual(alheia.status, 'Nao')
+
+
+class DetentorDocumentoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana')
+        cls.bruno = User.objects.create_user('bruno')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        responsavel = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        cls.processo = mommy.make(Processo, numero_processo='1/2024', setor=setor, responsavel=responsavel,
+                                  data_abertura=date(2024, 1, 1), data_conclusao=None)
+
+    def tramitar(self, de, para):
+        return Tramitacao.objects.create(num_documento=self.processo.documento_ptr, de=de, para=para)
+
+    def test_tramitacao_atualiza_detentor(self):
+        self.tramitar(self.ana, self.bruno)
+        ultima = self.tramitar(self.bruno, self.ana)
+        documento = Documento.objects.get(pk=self.processo.pk)
+        self.assertEqual(documento.ultima_tramitacao, ultima)
+        self.assertEqual(list(Documento.objects.com_usuario(self.ana)), [documento])
+
+    def test_save_do_documento_nao_sobrescreve_detentor(self):
+        processo = Processo.objects.get(pk=self.processo.pk)
+        self.tramitar(self.ana, self.bruno)
+        processo.status = 'Concluido'
+        processo.save()
+        self.assertEqual(Documento.objects.get(pk=self.processo.pk).detentor, self.bruno)
+
+    def test_save_mantem_o_contrato_do_django(self):
+        # Instância com pk que não está na tabela: o save() completo insere, como no Django
+        processo = Processo.objects.get(pk=self.processo.pk)
+        Processo.objects.filter(pk=processo.pk).delete()
+        processo.save()
+        self.assertTrue(Processo.objects.filter(pk=processo.pk).exists())
+
+    def test_excluir_ultima_tramitacao_volta_para_anterior(self):
+        primeira = self.tramitar(self.ana, self.bruno)
+        self.tramitar(self.bruno, self.ana).delete()
+        documento = Documento.objects.get(pk=self.processo.pk)
+        self.assertEqual((documento.ultima_tramitacao, documento.detentor), (primeira, self.bruno))
+
+    def test_atualizar_detentores(self):
+        ultima = self.tramitar(self.ana, self.bruno)
+        Documento.objects.update(ultima_tramitacao=None, detentor=None)
+        Documento.objects.atualizar_detentores()
+        self.assertEqual(Documento.objects.get(pk=self.processo.pk).ultima_tramitacao, ultima)
+
+
+class NotificarPrazosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', email='ana@example.com')
+        cls.bruno = User.objects.create_user('bruno', email='bruno@example.com')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.responsavel = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        cls.setor = setor
+
+    def criar_oficio(self, abertura, prazo, usuario, **kwargs):
+        return mommy.make(Oficio, data_abertura=abertura, prazo=prazo, usuario=usuario, setor=self.setor,
+                          responsavel=self.responsavel, data_conclusao=None, **kwargs)
+
+    def test_avisa_por_usuario_uma_unica_vez(self):
+        vencido = self.criar_oficio(date(2024, 1, 1), 10, self.ana)
+        vencendo = self.criar_oficio(date(2024, 1, 20), 10, self.ana)
+        self.criar_oficio(date(2024, 1, 20), 60, self.ana)
+        do_bruno = self.criar_oficio(date(2024, 1, 20), 10, self.ana)
+        Tramitacao.objects.create(num_documento=do_bruno.documento_ptr, de=self.ana, para=self.bruno)
+        self.criar_oficio(date(2024, 1, 1), 10, self.ana, status='Concluido')
+
+        grupos = notificar_prazos(date(2024, 1, 27), 5)
+        self.assertEqual({u: {o.pk for o in oficios} for u, oficios in grupos.items()},
+                         {self.ana: {vencido.pk, vencendo.pk}, self.bruno: {do_bruno.pk}})
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ana@example.com', 'bruno@example.com'])
+
+        self.assertEqual(notificar_prazos(date(2024, 1, 27), 5), {})
+        # Ao vencer, o ofício que estava "vencendo" recebe um novo aviso
+        grupos = notificar_prazos(date(2024, 2, 1), 0)
+        self.assertEqual({o.pk for oficios in grupos.values() for o in oficios}, {vencendo.pk, do_bruno.pk})
+        self.assertEqual(NotificacaoPrazo.objects.count(), 5)
+
+    def test_destinatario_sem_email_nao_fica_marcado(self):
+        sem_email = User.objects.create_user('carla')
+        oficio = self.criar_oficio(date(2024, 1, 1), 10, sem_email)
+
+        with self.assertLogs('Documentos.prazos', 'WARNING'):
+            self.assertEqual(notificar_prazos(date(2024, 1, 27), 5), {sem_email: [oficio]})
+        self.assertEqual((len(mail.outbox), NotificacaoPrazo.objects.count()), (0, 0))
+
+        sem_email.email = 'carla@example.com'
+        sem_email.save()
+        notificar_prazos(date(2024, 1, 28), 5)
+        self.assertEqual([m.to for m in mail.outbox], [['carla@example.com']])
+        self.assertTrue(NotificacaoPrazo.objects.filter(oficio=oficio, destinatario=sem_email).exists())
+
+    def test_concluir_remove_do_indice_de_prazos(self):
+        oficio = self.criar_oficio(date(2024, 1, 1), 10, self.ana)
+        self.assertEqual(oficio.vencimento_em_aberto, date(2024, 1, 11))
+        oficio.status = 'Concluido'
+        oficio.save(update_fields=['status'])
+        oficio.refresh_from_db()
+        self.assertIsNone(oficio.vencimento_em_aberto)
+
+
+class ImportacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        cls.setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.responsavel = mommy.make(Servidor, nome='Maria Souza', setor_servidor=cls.setor, data_saida=None)
+        mommy.make(Processo, numero_processo='100/2024', setor=cls.setor, responsavel=cls.responsavel,
+                   data_abertura=date(2024, 1, 1), data_conclusao=None)
+
+    def importar(self, modelo, conteudo, tamanho_lote=1000):
+        arquivo = io.BytesIO(conteudo.encode('utf-8'))
+        return Importador(modelo, self.usuario, tamanho_lote).importar(ler_arquivo(arquivo, 'dados.csv'))
+
+    def test_importa_processos_e_rejeita_linhas_invalidas(self):
+        conteudo = (
+            'numero_processo;requerente;assunto;data_abertura;setor;responsavel;status;data_conclusao\n'
+            '200/2024;José;Certidão;02/01/2024;SUFGI;Maria Souza;Concluído;10/01/2024\n'
+            '201/2024;Ana;AVERBACAO;2024-01-03;SUFGI;Maria Souza;;\n'
+            '202/2024;Ana;Averbação;03/01/2024;XYZ;Maria Souza;;\n'
+            '100/2024;Ana;Averbação;03/01/2024;SUFGI;Maria Souza;;\n'
+            '201/2024;Ana;Averbação;03/01/2024;SUFGI;Maria Souza;;\n'
+            '203/2024;Ana;Averbação;05/01/2024;SUFGI;Maria Souza;;01/01/2024\n'
+            '204/2024;Ana;Inexistente;31/02/2024;SUFGI;Maria Souza;;\n'
+        )
+        importador = self.importar(Processo, conteudo, tamanho_lote=1)
+        self.assertEqual(importador.importadas, 2)
+        self.assertEqual([linha for linha, _ in importador.rejeitadas], [4, 5, 6, 7, 8])
+        mensagens = dict(importador.rejeitadas)
+        self.assertIn('setor "XYZ"', mensagens[4])
+        self.assertIn('já cadastrado', mensagens[5])
+        self.assertIn('repetido no arquivo', mensagens[6])
+        self.assertIn('data_abertura', mensagens[8])
+        self.assertIn('assunto', mensagens[8])
+
+        processo = Processo.objects.get(numero_processo='200/2024')
+        self.assertEqual((processo.assunto.nome, processo.status, processo.usuario), ('Certidão', 'Concluido', self.usuario))
+        self.assertEqual((processo.tipo, processo.rotulo), ('processo', '200/2024'))
+        self.assertEqual(list(busca.buscar(Processo.objects.all(), 'jose').values_list('numero_processo', flat=True)),
+                         ['200/2024'])
+        self.assertEqual(ContagemDocumento.objects.totais('tipo', 'status'),
+                         {('processo', 'Aberto'): 2, ('processo', 'Concluido'): 1})
+
+    def test_importa_oficios_com_vencimento(self):
+        conteudo = ('numero_oficio,assunto,data_abertura,prazo,setor,responsavel\n'
+                    '7/2024,Pedido,01/02/2024,15,SUFGI,Maria Souza\n')
+        self.assertEqual(self.importar(Oficio, conteudo).importadas, 1)
+        oficio = Oficio.objects.get()
+        self.assertEqual((oficio.data_vencimento, oficio.vencimento_em_aberto), (date(2024, 2, 16), date(2024, 2, 16)))
+
+    def test_le_csv_em_cp1252_e_com_uma_coluna(self):
+        conteudo = ('numero_os;assunto;data_abertura;setor;responsavel\n'
+                    'OS-9;Manutenção elétrica;01/02/2024;SUFGI;Maria Souza\n')
+        linhas = list(ler_arquivo(io.BytesIO(conteudo.encode('cp1252')), 'ordens.csv'))
+        self.assertEqual(linhas[0]['assunto'], 'Manutenção elétrica')
+        # Cabeçalho de uma coluna: o separador não é detectado e vale o padrão
+        self.assertEqual(list(ler_arquivo(io.BytesIO(b'numero_os\nOS-1\n'), 'ordens.csv')), [{'numero_os': 'OS-1'}])
+
+    def test_arquivo_ilegivel_vira_erro_de_formulario_e_do_comando(self):
+        self.client.force_login(self.usuario)
+        arquivo = io.BytesIO(b'nao e uma planilha')
+        arquivo.name = 'ordens.xlsx'
+        resposta = self.client.post(reverse('admin:Documentos_ordemservico_importar'), {'arquivo': arquivo})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('XLSX inválido', str(resposta.context['form'].errors['arquivo']))
+
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as temporario:
+            temporario.write(b'nao e uma planilha')
+            temporario.flush()
+            with self.assertRaisesMessage(CommandError, 'XLSX inválido'):
+                call_command('importar_documentos', 'ordemservico', temporario.name, stdout=io.StringIO())
+
+    def test_upload_pelo_admin(self):
+        self.client.force_login(self.usuario)
+        conteudo = ('numero_os,assunto,data_abertura,setor,responsavel\n'
+                    'OS-1,Troca de lâmpadas,01/02/2024,SUFGI,Maria Souza\n'
+                    'OS-2,Pintura,01/02/2024,SUFGI,Fulano\n')
+        arquivo = io.BytesIO(conteudo.encode('utf-8'))
+        arquivo.name = 'ordens.csv'
+        resposta = self.client.post(reverse('admin:Documentos_ordemservico_importar'), {'arquivo': arquivo})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(list(OrdemServico.objects.values_list('numero_os', flat=True)), ['OS-1'])
+        self.assertEqual(resposta.context['importador'].rejeitadas[0][0], 3)
+
+
+class ExportacaoCsvTests(TransactionTestCase):
+    # A exportação lê pela réplica (DB_REPLICA_HOST) ou, com DB_PGBOUNCER, pela conexão 'direto'. Nos
+    # testes, ambas são espelhos do banco de teste abertos em outra conexão: os dados precisam estar
+    # confirmados para que elas os vejam (daí o TransactionTestCase). serialized_rollback devolve os
+    # assuntos criados pelas migrações.
+    BANCO_EXPORTACAO = settings.BANCO_REPLICA or ('direto' if 'direto' in settings.DATABASES else 'default')
+    databases = {'default', BANCO_EXPORTACAO}
+    serialized_rollback = True
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        responsavel = mommy.make(Servidor, nome='Maria Souza', setor_servidor=setor, data_saida=None)
+        self.certidao, averbacao = Assunto.objects.get(nome='Certidão'), Assunto.objects.get(nome='Averbação')
+        for numero, assunto in [('1/2024', self.certidao), ('2/2024', averbacao), ('3/2024', self.certidao)]:
+            mommy.make(Processo, numero_processo=numero, requerente='José', assunto=assunto, setor=setor,
+                       responsavel=responsavel, usuario=self.admin, data_abertura=date(2024, 1, 2), data_conclusao=None)
+        self.client.force_login(self.admin)
+
+    def linhas(self, resposta):
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        conteudo = b''.join(resposta.streaming_content).decode('utf-8-sig')
+        return [linha.split(';') for linha in conteudo.splitlines()]
+
+    def test_exporta_lista_filtrada(self):
+        url = reverse('admin:Documentos_processo_exportar')
+        with CaptureQueriesContext(connections[self.BANCO_EXPORTACAO]) as consultas:
+            linhas = self.linhas(self.client.get(url, {'assunto__exact': self.certidao.pk, 'o': '1'}))
+        self.assertEqual(linhas[0][:3], ['Número do Processo', 'Requerente', 'Tipo de Assunto'])
+        self.assertEqual([linha[0] for linha in linhas[1:]], ['1/2024', '3/2024'])
+        self.assertEqual(linhas[1][2:5], ['Certidão', '02/01/2024', 'SUFGI'])
+        # Setor, responsável e usuário vêm no mesmo SELECT das linhas
+        self.assertFalse([c['sql'] for c in consultas if 'Documentos_servidor' in c['sql'] and 'JOIN' not in c['sql']])
+
+    def test_acao_exporta_selecionados(self):
+        pk = Processo.objects.get(numero_processo='2/2024').pk
+        resposta = self.client.post(reverse('admin:Documentos_processo_changelist'),
+                                    {'action': 'exportar_csv', '_selected_action': [pk]})
+        self.assertEqual([linha[0] for linha in self.linhas(resposta)[1:]], ['2/2024'])
+
+
+class AnexoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        cls.ana = User.objects.create_user('ana')
+        cls.setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.responsavel = mommy.make(Servidor, setor_servidor=cls.setor, data_saida=None)
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        configuracao = override_settings(MEDIA_ROOT=self.media, ANEXOS_X_ACCEL=True)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.processo = mommy.make(Processo, setor=self.setor, responsavel=self.responsavel, usuario=self.admin,
+                                   data_abertura=date(2024, 1, 1), data_conclusao=None)
+        self.processo.anexo.save('Parecer.PDF', ContentFile(b'%PDF-1.4'))
+
+    def criar_oficio(self, **kwargs):
+        return mommy.make(Oficio, setor=self.setor, responsavel=self.responsavel, prazo=10,
+                          data_abertura=date(2024, 1, 1), data_conclusao=None, **kwargs)
+
+    def test_link_do_anexo_passa_pela_checagem_de_permissao(self):
+        digest = hashlib.sha256(b'%PDF-1.4').hexdigest()
+        nome = f'anexos/{digest[:2]}/{digest}.pdf'
+        self.assertEqual(self.processo.anexo.name, nome)
+        url = self.processo.anexo.url
+        self.assertEqual(url, reverse('Documentos:anexo', args=[nome]))
+        self.client.force_login(self.ana)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        resposta = self.client.get(url)
+        self.assertEqual(resposta['X-Accel-Redirect'], f'/anexos-internos/{nome}')
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+        self.assertIn(f'filename="{self.processo.rotulo.replace("/", "-")}.pdf"', resposta['Content-Disposition'])
+        self.assertEqual(resposta.content, b'')
+
+    def test_mesmo_conteudo_gravado_uma_vez(self):
+        oficio = self.criar_oficio(usuario=self.ana)
+        oficio.anexo.save('copia.pdf', ContentFile(b'%PDF-1.4'))
+        self.assertEqual(oficio.anexo.name, self.processo.anexo.name)
+        self.assertEqual(os.listdir(os.path.dirname(oficio.anexo.path)), [os.path.basename(oficio.anexo.path)])
+        # A autora do ofício pode baixar o arquivo compartilhado com o processo
+        self.client.force_login(self.ana)
+        self.assertEqual(self.client.get(oficio.anexo.url).status_code, 200)
+
+    def test_coleta_remove_apenas_arquivos_sem_referencia(self):
+        oficio = self.criar_oficio()
+        oficio.anexo.save('oficio.pdf', ContentFile(b'%PDF-1.5'))
+        arquivo_oficio = oficio.anexo.path
+        oficio.delete()
+        self.assertEqual(coletar_anexos(), [])  # ainda dentro da carência
+        self.assertEqual(coletar_anexos(timedelta(0)), [oficio.anexo.name])
+        self.assertFalse(os.path.exists(arquivo_oficio))
+        self.assertTrue(os.path.exists(self.processo.anexo.path))
+
+    def test_coleta_mantem_arquivo_reenviado(self):
+        oficio = self.criar_oficio()
+        oficio.anexo.save('oficio.pdf', ContentFile(b'%PDF-1.5'))
+        oficio.delete()
+        antiga = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(oficio.anexo.path, (antiga, antiga))
+        # O mesmo conteúdo enviado de novo reaproveita o arquivo sem referência, antes de o documento ser salvo
+        nome = armazenamento().save('anexos/novo.pdf', ContentFile(b'%PDF-1.5'))
+        self.assertEqual(nome, oficio.anexo.name)
+        self.assertEqual(coletar_anexos(), [])
+        self.assertTrue(os.path.exists(oficio.anexo.path))
+
+    def test_converte_anexos_antigos(self):
+        antigo = self.criar_oficio()
+        # Arquivo gravado antes do endereçamento pelo conteúdo
+        with open(os.path.join(self.media, 'anexos', 'antigo.pdf'), 'wb') as arquivo:
+            arquivo.write(b'%PDF-1.4')
+        Oficio.objects.filter(pk=antigo.pk).update(anexo='anexos/antigo.pdf')
+        call_command('coletar_anexos', '--converter', '--carencia-horas=0', stdout=io.StringIO())
+        antigo.refresh_from_db()
+        self.assertEqual(antigo.anexo.name, self.processo.anexo.name)
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'anexos', 'antigo.pdf')))
+
+    def test_detentor_pode_baixar(self):
+        Tramitacao.objects.create(num_documento=self.processo.documento_ptr, de=self.admin, para=self.ana)
+        self.client.force_login(self.ana)
+        with self.settings(ANEXOS_X_ACCEL=False):
+            resposta = self.client.get(self.processo.anexo.url)
+        self.assertEqual(b''.join(resposta.streaming_content), b'%PDF-1.4')
+
+    @unittest.skipUnless(importlib.util.find_spec('storages') and importlib.util.find_spec('moto'),
+                         'django-storages[s3] e moto não instalados')
+    def test_armazenamento_s3(self):
+        import boto3
+        from moto import mock_aws
+
+        from .armazenamento_s3 import AnexosS3
+
+        with mock_aws():
+            boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='anexos')
+            armazenamento = AnexosS3(bucket_name='anexos', access_key='chave', secret_key='segredo',
+                                     region_name='us-east-1', addressing_style='path', signature_version='s3v4',
+                                     querystring_expire=60)
+            nome = armazenamento.save('anexos/oficio.pdf', ContentFile(b'%PDF-1.7'))
+            self.assertEqual(armazenamento.url(nome), reverse('Documentos:anexo', args=[nome]))
+            caminho = armazenamento.caminho_interno(nome)
+            digest = hashlib.sha256(b'%PDF-1.7').hexdigest()
+            self.assertEqual(nome, f'anexos/{digest[:2]}/{digest}.pdf')
+            self.assertEqual(armazenamento.save('anexos/copia.pdf', ContentFile(b'%PDF-1.7')), nome)
+            self.assertTrue(caminho.startswith(f'/anexos-s3/anexos/{nome}?'))
+            self.assertIn('X-Amz-Signature=', caminho)
+            self.assertEqual(armazenamento.open(nome).read(), b'%PDF-1.7')
+
+
+def pdf_com_texto(texto):
+    # PDF mínimo de uma página com o texto informado
+    conteudo = f'BT /F1 12 Tf 72 712 Td ({texto}) Tj ET'.encode('latin-1')
+    objetos = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(conteudo), conteudo),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    pdf, posicoes = b'%PDF-1.4\n', []
+    for numero, objeto in enumerate(objetos, start=1):
+        posicoes.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (numero, objeto)
+    inicio_xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % posicao for posicao in posicoes)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref)
+    return pdf
+
+
+class ProcessamentoAnexoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.responsavel = mommy.make(Servidor, setor_servidor=cls.setor, data_saida=None)
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def criar_processo(self, **kwargs):
+        return mommy.make(Processo, setor=self.setor, responsavel=self.responsavel,
+                          data_abertura=date(2024, 1, 1), data_conclusao=None, **kwargs)
+
+    def test_extrai_texto_do_pdf_para_a_busca(self):
+        processo = self.criar_processo()
+        processo.anexo.save('laudo.pdf', ContentFile(pdf_com_texto('Laudo de vistoria estrutural')))
+        tarefa = TarefaAnexo.objects.get()
+        self.assertEqual((tarefa.documento_id, tarefa.anexo, tarefa.status), (processo.pk, processo.anexo.name, 'pendente'))
+        # Salvar sem trocar o anexo não cria outra tarefa
+        processo.save()
+        self.assertEqual(TarefaAnexo.objects.count(), 1)
+
+        self.assertEqual(trabalhar(ate_esvaziar=True), 1)
+        processo.refresh_from_db()
+        self.assertIn('vistoria estrutural', processo.texto_anexo)
+        self.assertEqual(TarefaAnexo.objects.get().status, 'concluida')
+        self.assertEqual(list(busca.buscar(Processo.objects.all(), 'vistorias')), [processo])
+
+    def test_miniatura_de_imagem_e_reaproveitamento(self):
+        from PIL import Image
+
+        imagem = io.BytesIO()
+        Image.new('RGB', (1200, 1600), 'white').save(imagem, format='PNG')
+        primeiro = self.criar_processo()
+        primeiro.anexo.save('digitalizacao.png', ContentFile(imagem.getvalue()))
+        trabalhar(ate_esvaziar=True)
+        primeiro.refresh_from_db()
+        with Image.open(primeiro.miniatura.path) as miniatura:
+            self.assertEqual(miniatura.size, (240, 320))
+
+        # O mesmo arquivo em outro documento reaproveita a miniatura já gerada
+        segundo = self.criar_processo()
+        segundo.anexo.save('copia.png', ContentFile(imagem.getvalue()))
+        with mock.patch('Documentos.tarefas.extrair', side_effect=AssertionError):
+            trabalhar(ate_esvaziar=True)
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.miniatura.name, primeiro.miniatura.name)
+
+    def test_falha_reagenda_com_espera(self):
+        processo = self.criar_processo()
+        processo.anexo.save('laudo.pdf', ContentFile(b'nao e um pdf'))
+        trabalhar(ate_esvaziar=True)
+        tarefa = TarefaAnexo.objects.get()
+        self.assertEqual((tarefa.status, tarefa.tentativas), ('pendente', 1))
+        self.assertGreater(tarefa.executar_em, timezone.now())
+        self.assertTrue(tarefa.erro)
+
+        TarefaAnexo.objects.update(executar_em=timezone.now(), tentativas=4)
+        trabalhar(ate_esvaziar=True)
+        self.assertEqual(TarefaAnexo.objects.get().status, 'falhou')
+
+
+@override_settings(BANCO_REPLICA='replica')
+class RoteamentoReplicaTests(SimpleTestCase):
+
+    def requisicao(self, acao, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        resultado = {}
+
+        def view(request):
+            resultado['banco'] = acao()
+            return HttpResponse()
+        return RoteamentoMiddleware(view)(request), resultado['banco']
+
+    def test_leituras_na_replica_apenas_no_bloco(self):
+        self.assertIsNone(banco_leitura())
+        with ler_da_replica():
+            self.assertEqual(banco_leitura(), 'replica')
+            self.assertEqual(RoteadorReplica().db_for_write(Documento), 'default')
+        self.assertIsNone(banco_leitura())
+
+    def test_apos_gravar_usuario_fica_no_primario(self):
+        def gravar():
+            RoteadorReplica().db_for_write(Documento)
+            with ler_da_replica():
+                return banco_leitura()
+        resposta, banco = self.requisicao(gravar)
+        self.assertEqual(banco, 'replica')
+        self.assertEqual(resposta.cookies[COOKIE_PRIMARIO]['max-age'], settings.REPLICA_FIXAR_PRIMARIO_SEGUNDOS)
+
+        def ler():
+            with ler_da_replica():
+                return banco_leitura()
+        resposta, banco = self.requisicao(ler, cookies={COOKIE_PRIMARIO: '1'})
+        self.assertIsNone(banco)
+        self.assertNotIn(COOKIE_PRIMARIO, resposta.cookies)
+
+    def test_sessao_nao_conta_como_gravacao(self):
+        from django.contrib.sessions.models import Session
+
+        resposta, _ = self.requisicao(lambda: RoteadorReplica().db_for_write(Session))
+        self.assertNotIn(COOKIE_PRIMARIO, resposta.cookies)
+
+
+@unittest.skipUnless(settings.BANCO_REPLICA, 'réplica não configurada (DB_REPLICA_HOST)')
+class ReplicaIntegracaoTests(TransactionTestCase):
+    # Com DB_REPLICA_HOST apontando para o próprio servidor de teste, a réplica é um espelho
+    # do banco de teste acessado por outra conexão
+    databases = {'default', settings.BANCO_REPLICA or 'default'}
+
+    def consultas_replica(self, url):
+        with CaptureQueriesContext(connections['replica']) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, len(consultas)
+
+    def test_dashboard_le_da_replica_ate_o_usuario_gravar(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        mommy.make(Processo, setor=setor, responsavel=mommy.make(Servidor, setor_servidor=setor, data_saida=None),
+                   data_abertura=date(2024, 1, 1), data_conclusao=None)
+        resposta, consultas = self.consultas_replica(reverse('Documentos:index'))
+        self.assertGreater(consultas, 0)
+        self.assertEqual(resposta.context['total_processos'], 1)
+
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:Documentos_setor_add'), {'sigla_setor': 'SEMAD'})
+        self.assertIn(COOKIE_PRIMARIO, self.client.cookies)
+        _, consultas = self.consultas_replica(reverse('Documentos:index'))
+        self.assertEqual(consultas, 0)
+
+
+class ReferenciasCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha', first_name='Ana', last_name='Lima')
+        cls.setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.responsavel = mommy.make(Servidor, nome='Carlos', setor_servidor=cls.setor, data_saida=None)
+        cls.processo = mommy.make(Processo, numero_processo='1/2024', setor=cls.setor, responsavel=cls.responsavel,
+                                  data_abertura=date(2024, 1, 1), data_conclusao=None)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def consultas_setor(self, url, parametros=None):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, len([c for c in consultas if 'Documentos_setor' in c['sql']])
+
+    def test_autocomplete_em_cache_ate_o_setor_mudar(self):
+        parametros = {'term': 'suf', 'app_label': 'Documentos', 'model_name': 'processo', 'field_name': 'setor'}
+        url = reverse('admin:autocomplete')
+        resposta, consultas = self.consultas_setor(url, parametros)
+        self.assertEqual([r['text'] for r in resposta.json()['results']], ['SUFGI'])
+        self.assertGreater(consultas, 0)
+        _, consultas = self.consultas_setor(url, parametros)
+        self.assertEqual(consultas, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.setor.sigla_setor = 'SUFG'
+            self.setor.save()
+        resposta, _ = self.consultas_setor(url, parametros)
+        self.assertEqual([r['text'] for r in resposta.json()['results']], ['SUFG'])
+
+    def test_autocomplete_verifica_permissao_antes_do_cache(self):
+        parametros = {'term': 'suf', 'app_label': 'Documentos', 'model_name': 'processo', 'field_name': 'setor'}
+        self.client.get(reverse('admin:autocomplete'), parametros)
+        self.client.force_login(User.objects.create_user('visitante', password='senha', is_staff=True))
+        self.assertEqual(self.client.get(reverse('admin:autocomplete'), parametros).status_code, 403)
+
+    def test_formulario_le_rotulos_do_cache(self):
+        url = reverse('admin:Documentos_processo_change', args=[self.processo.pk])
+        self.client.get(url)
+        resposta, consultas = self.consultas_setor(url)
+        self.assertEqual(consultas, 0)
+        self.assertContains(resposta, f'<option value="{self.setor.pk}" selected>SUFGI</option>', html=True)
+        self.assertContains(resposta, f'<option value="{self.responsavel.pk}" selected>Carlos</option>', html=True)
+
+        self.responsavel.nome = 'Carlos Souza'
+        self.responsavel.save()
+        resposta = self.client.get(url)
+        self.assertContains(resposta, f'<option value="{self.responsavel.pk}" selected>Carlos Souza</option>', html=True)
+
+    def test_fragmento_do_usuario_trocado_ao_alterar_o_usuario(self):
+        self.assertContains(self.client.get(reverse('Documentos:index')), 'Ana Lima')
+        versao = referencias.versao('usuario', self.admin.pk)
+        # O login grava apenas last_login e não invalida o fragmento
+        self.client.login(username='admin', password='senha')
+        self.assertEqual(referencias.versao('usuario', self.admin.pk), versao)
+
+        self.admin.first_name = 'Maria'
+        self.admin.save()
+        self.assertContains(self.client.get(reverse('Documentos:index')), 'Maria Lima')
+
+
+class PaginacaoPorChaveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        responsavel = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        # Datas repetidas: a chave (data_abertura, id) desempata pelo id
+        for numero in range(25):
+            mommy.make(Processo, numero_processo=f'{numero:03d}/2024', setor=setor, responsavel=responsavel,
+                       data_abertura=date(2024, 1, 1 + numero % 7), data_conclusao=None)
+        cls.esperado = list(Processo.objects.order_by('-data_abertura', '-pk').values_list('pk', flat=True))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        patcher = mock.patch.object(admin.site._registry[Processo], 'list_per_page', 10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def listar(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(any('OFFSET' in c['sql'] for c in consultas))
+        cl = resposta.context['cl']
+        return cl, [obj.pk for obj in cl.result_list]
+
+    def test_percorre_as_paginas_nos_dois_sentidos(self):
+        url = reverse('admin:Documentos_processo_changelist')
+        cl, pagina = self.listar(url)
+        self.assertIsNone(cl.url_anterior)
+        paginas = [pagina]
+        while cl.url_proxima:
+            cl, pagina = self.listar(url + cl.url_proxima)
+            paginas.append(pagina)
+        self.assertEqual([pk for pagina in paginas for pk in pagina], self.esperado)
+        self.assertEqual([len(pagina) for pagina in paginas], [10, 10, 5])
+        self.assertContains(self.client.get(url), 'Próxima ›')
+
+        cl, pagina = self.listar(url + cl.url_anterior)
+        self.assertEqual(pagina, paginas[1])
+        cl, pagina = self.listar(url + cl.url_anterior)
+        self.assertEqual(pagina, paginas[0])
+        self.assertIsNone(cl.url_anterior)
+        self.assertEqual(cl.result_count, 25)
+        self.assertTrue(cl.contagem_exata)
+
+    def test_ordenacao_por_coluna_da_ordenacao_padrao(self):
+        # Coluna 4: data de abertura, crescente; o admin acrescenta a ordenação padrão (-data_abertura, -id)
+        url = reverse('admin:Documentos_processo_changelist') + '?o=4'
+        cl, pagina = self.listar(url)
+        self.assertEqual([campo.name for campo, _ in cl.chave], ['data_abertura', 'documento_ptr'])
+        pks = list(pagina)
+        while cl.url_proxima:
+            cl, pagina = self.listar(reverse('admin:Documentos_processo_changelist') + cl.url_proxima)
+            pks.extend(pagina)
+        self.assertEqual(pks, list(Processo.objects.order_by('data_abertura', '-pk').values_list('pk', flat=True)))
+
+    def test_filtro_ou_busca_volta_a_primeira_pagina(self):
+        url = reverse('admin:Documentos_processo_changelist')
+        cl, _ = self.listar(url)
+        cl, _ = self.listar(url + cl.url_proxima)
+        self.assertNotIn('apos', cl.get_query_string({'q': '001'}))
+
+    def test_cursor_invalido(self):
+        resposta = self.client.get(reverse('admin:Documentos_processo_changelist'), {'apos': 'xyz'})
+        self.assertRedirects(resposta, reverse('admin:Documentos_processo_changelist') + '?e=1',
+                             fetch_redirect_response=False)
+
+    def test_ordenacao_por_coluna_que_aceita_nulo_usa_offset(self):
+        # Coluna 7: data de conclusão
+        resposta = self.client.get(reverse('admin:Documentos_processo_changelist'), {'o': '7'})
+        self.assertFalse(resposta.context['cl'].paginacao_por_chave)
+
+    def test_contagem_estimada_em_listas_grandes(self):
+        with mock.patch('Documentos.paginacao.LIMITE_CONTAGEM_EXATA', 0):
+            resposta = self.client.get(reverse('admin:Documentos_processo_changelist'))
+        self.assertFalse(resposta.context['cl'].contagem_exata)
+        self.assertContains(resposta, 'cerca de')
+
+
+class IndicesConsultasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.ativo = mommy.make(Servidor, nome='Ana Ativa', setor_servidor=setor, data_saida=None)
+        cls.inativo = mommy.make(Servidor, nome='Ana Inativa', setor_servidor=setor, data_saida=None, ativo=False)
+        mommy.make(Processo, numero_processo='1/2024', setor=setor, responsavel=cls.ativo,
+                   data_abertura=date(2024, 1, 1), data_conclusao=None)
+
+    def test_explicar_consultas(self):
+        saida = io.StringIO()
+        call_command('explicar_consultas', 'processos', 'processos_abertos', 'servidores_ativos', '--resumo',
+                     stdout=saida)
+        self.assertEqual(saida.getvalue().count('índices:'), 3)
+        with self.assertRaises(CommandError):
+            call_command('explicar_consultas', 'inexistente', stdout=io.StringIO())
+
+
+class DadosSinteticosTests(TestCase):
+
+    def test_gerador_mantem_contagens_e_detentores(self):
+        gerador = GeradorDados(semente=1, tamanho_lote=15)
+        gerador.referencias(setores=3, servidores=5, usuarios=4)
+        totais = gerador.gerar(40, tramitacoes_por_documento=2)
+
+        self.assertEqual(sum(totais.values()), 40)
+        self.assertEqual(Processo.objects.count(), totais[Processo])
+        self.assertEqual(Oficio.objects.filter(prazo__isnull=True).count(), 0)
+        self.assertEqual(sum(ContagemDocumento.objects.totais('tipo').values()), Documento.objects.count())
+        for documento in Documento.objects.filter(ultima_tramitacao__isnull=False):
+            ultima = Tramitacao.objects.filter(num_documento=documento).recentes().first()
+            self.assertEqual((documento.ultima_tramitacao_id, documento.detentor_id), (ultima.pk, ultima.para_id))
+            # Só a última tramitação da cadeia pode estar pendente
+            self.assertFalse(Tramitacao.objects.filter(num_documento=documento, status='Nao')
+                             .exclude(pk=ultima.pk).exists())
+
+    def test_medir_desempenho_grava_e_compara(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        gerador = GeradorDados(tamanho_lote=10)
+        gerador.referencias(setores=2, servidores=3, usuarios=2)
+        gerador.gerar(20)
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'medicao.json')
+            call_command('medir_desempenho', '--repeticoes', '1', '--profundidade', '5', '--saida', arquivo,
+                         stdout=io.StringIO())
+            with open(arquivo, encoding='utf-8') as entrada:
+                resultado = json.load(entrada)
+            saida = io.StringIO()
+            call_command('medir_desempenho', 'dashboard', '--repeticoes', '1', '--comparar', arquivo, stdout=saida)
+
+        cenarios = resultado['medicoes'][0]['cenarios']
+        self.assertEqual(set(cenarios), set(Medidor.CENARIOS))
+        self.assertFalse([nome for nome, valores in cenarios.items() if 'erro' in valores])
+        self.assertIn('antes', saida.getvalue())
+        # O despacho medido é desfeito
+        self.assertEqual(resultado['medicoes'][0]['volumes']['tramitacoes'], Tramitacao.objects.count())
+
+
+@override_settings(METRICAS_TOKEN='segredo')
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        metricas.armazenamento().limpar()
+
+    def test_contadores_e_histogramas_por_view(self):
+        self.client.get(reverse('Documentos:index'))
+        self.client.get(reverse('Documentos:index'))
+        texto = self.client.get(reverse('Documentos:metricas'), HTTP_AUTHORIZATION='Bearer segredo').content.decode()
+
+        self.assertIn('controle_requisicoes_total{view="Documentos:index",metodo="GET",status="200"} 2', texto)
+        self.assertIn('controle_requisicao_segundos_bucket{view="Documentos:index",le="+Inf"} 2', texto)
+        self.assertIn('controle_requisicao_consultas_count{view="Documentos:index"} 2', texto)
+        self.assertIn('# TYPE controle_requisicao_segundos histogram', texto)
+        # O próprio endpoint não entra nas métricas
+        self.assertNotIn('Documentos:metricas', texto)
+
+    @override_settings(METRICAS_LENTA_SEGUNDOS=0)
+    def test_requisicao_lenta_vai_para_o_log(self):
+        with self.assertLogs('Documentos.metricas', 'WARNING') as log:
+            self.client.get(reverse('Documentos:index'))
+        self.assertIn('Documentos:index', log.output[0])
+        self.assertIn('SELECT', log.output[0])
+        self.assertIn('controle_requisicoes_lentas_total{view="Documentos:index"} 1', metricas.exportar())
+
+    def test_token_do_coletor(self):
+        self.assertEqual(self.client.get(reverse('Documentos:metricas')).status_code, 403)
+        resposta = self.client.get(reverse('Documentos:metricas'), HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(resposta.status_code, 200)
+        # Sem token configurado, ninguém lê as métricas
+        with self.settings(METRICAS_TOKEN=''):
+            self.assertEqual(self.client.get(reverse('Documentos:metricas'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class OperacoesLoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        cls.colega = User.objects.create_user('colega', is_staff=True)
+        cls.setor = mommy.make(Setor, sigla_setor='SUFGI')
+        cls.servidor = mommy.make(Servidor, setor_servidor=cls.setor, data_saida=None)
+        cls.processos = [
+            mommy.make(Processo, numero_processo=f'{numero}/2024', setor=cls.setor, responsavel=cls.servidor,
+                       data_abertura=date(2024, 1, numero), data_conclusao=None, status='Aberto')
+            for numero in range(1, 6)
+        ]
+        cls.oficio = mommy.make(Oficio, numero_oficio='OF 1/2024', setor=cls.setor, responsavel=cls.servidor,
+                                data_abertura=date(2024, 1, 1), data_conclusao=None, prazo=10, status='Aberto')
+
+    def test_despachar_em_lote(self):
+        def consultas(documentos):
+            with CaptureQueriesContext(connection) as contexto:
+                operacoes.despachar(documentos, self.admin, self.colega)
+            return len(contexto)
+
+        self.assertEqual(consultas(Processo.objects.filter(pk=self.processos[0].pk)), consultas(Processo.objects.all()))
+        self.assertEqual(Tramitacao.objects.filter(de=self.admin, para=self.colega, status='Nao').count(), 6)
+        for processo in Documento.objects.filter(tipo='processo'):
+            self.assertEqual(processo.detentor_id, self.colega.pk)
+            self.assertEqual(processo.ultima_tramitacao, Tramitacao.objects.filter(num_documento=processo).recentes().first())
+
+        self.colega.is_active = False
+        with self.assertRaises(ValidationError):
+            operacoes.despachar(Processo.objects.all(), self.admin, self.colega)
+
+    def test_alterar_status_mantem_contagens_e_vencimento(self):
+        alterados = operacoes.alterar_status(Documento.objects.all(), 'Concluido', date(2024, 2, 1))
+
+        self.assertEqual(alterados, 6)
+        self.assertEqual(set(Documento.objects.values_list('status', 'data_conclusao')), {('Concluido', date(2024, 2, 1))})
+        self.assertIsNone(Oficio.objects.get().vencimento_em_aberto)
+        self.assertEqual(ContagemDocumento.objects.totais('tipo', 'status'),
+                         {('processo', 'Concluido'): 5, ('oficio', 'Concluido'): 1,
+                          ('processo', 'Aberto'): 0, ('oficio', 'Aberto'): 0})
+
+        operacoes.alterar_status(Oficio.objects.all(), 'Aberto')
+        oficio = Oficio.objects.get()
+        self.assertEqual((oficio.data_conclusao, oficio.vencimento_em_aberto), (None, date(2024, 1, 11)))
+
+    def test_arquivar_concluidos_mantem_a_data_de_conclusao(self):
+        operacoes.alterar_status(Processo.objects.filter(pk=self.processos[0].pk), 'Concluido', date(2024, 2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alterados = operacoes.alterar_status(Processo.objects.all(), 'Arquivado', date(2024, 3, 1))
+
+        self.assertEqual(alterados, 5)
+        self.assertEqual(Documento.objects.get(pk=self.processos[0].pk).data_conclusao, date(2024, 2, 1))
+        self.assertEqual(Documento.objects.get(pk=self.processos[1].pk).data_conclusao, date(2024, 3, 1))
+        evento = EventoDocumento.objects.filter(documento_id=self.processos[0].pk).latest('criado')
+        self.assertEqual(evento.alteracoes, {'status': ['Concluido', 'Arquivado']})
+
+    def test_alterar_status_rejeita_conclusao_anterior_a_abertura(self):
+        with self.assertRaises(ValidationError):
+            operacoes.alterar_status(Processo.objects.all(), 'Arquivado', date(2024, 1, 3))
+        self.assertFalse(Documento.objects.exclude(status='Aberto').exists())
+
+    def test_acoes_do_admin(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:Documentos_processo_changelist')
+        selecionados = [processo.pk for processo in self.processos[:2]]
+        dados = {'action': 'despachar', helpers.ACTION_CHECKBOX_NAME: selecionados}
+
+        resposta = self.client.post(url, dados)
+        self.assertContains(resposta, '2 documento(s) selecionado(s)')
+        resposta = self.client.post(url, {**dados, 'aplicar': '1', 'para': self.colega.pk, 'status': 'Nao'})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(set(Tramitacao.objects.values_list('num_documento', flat=True)), set(selecionados))
+
+        self.client.post(url, {'action': 'concluir', helpers.ACTION_CHECKBOX_NAME: selecionados})
+        self.assertEqual(Processo.objects.filter(status='Concluido').count(), 2)
+
+
+class HistoricoDocumentoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha', first_name='Ana',
+                                                  last_name='Souza')
+        cls.colega = User.objects.create_user('colega', first_name='Bruno', last_name='Lima')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        servidor = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        cls.processo = mommy.make(Processo, numero_processo='1/2024', setor=setor, responsavel=servidor,
+                                  data_abertura=date(2024, 1, 1), data_conclusao=None, status='Aberto')
+
+    def eventos(self):
+        return list(EventoDocumento.objects.filter(documento_id=self.processo.pk).order_by('id'))
+
+    def test_registra_apenas_os_campos_alterados(self):
+        processo = Processo.objects.get(pk=self.processo.pk)
+        processo.status, processo.data_conclusao = 'Concluido', date(2024, 2, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            processo.save()
+            processo.save()  # Sem alterações, sem evento
+        [evento] = self.eventos()
+        self.assertEqual(evento.acao, EventoDocumento.ALTERACAO)
+        self.assertEqual(evento.alteracoes, {'status': ['Aberto', 'Concluido'], 'data_conclusao': [None, '2024-02-01']})
+
+    def test_evento_desfeito_com_a_transacao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Tramitacao.objects.create(num_documento=self.processo.documento_ptr, de=self.admin, para=self.colega)
+                transaction.set_rollback(True)
+        self.assertEqual(self.eventos(), [])
+
+    def test_linha_do_tempo_no_admin(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            operacoes.despachar(Processo.objects.all(), self.admin, self.colega)
+            operacoes.alterar_status(Processo.objects.all(), 'Arquivado', date(2024, 3, 1))
+        self.client.force_login(self.admin)
+        resposta = self.client.get(reverse('admin:Documentos_processo_history', args=[self.processo.pk]))
+        self.assertEqual([evento.modelo for evento in resposta.context['eventos']], ['processo', 'tramitacao'])
+        self.assertContains(resposta, 'Aberto &rarr; Arquivado')
+        self.assertContains(resposta, 'Para: Bruno Lima')
+
+    def test_particao_recebe_eventos_da_particao_padrao(self):
+        mes = date(timezone.now().year + 5, 1, 1)
+        EventoDocumento.objects.create(documento_id=self.processo.pk, modelo='processo', objeto_id=self.processo.pk,
+                                       acao=EventoDocumento.ALTERACAO,
+                                       criado=timezone.now().replace(year=mes.year, month=1, day=15))
+        with connection.cursor() as cursor:
+            self.assertTrue(particoes.criar_particao(cursor, mes))
+            cursor.execute(f'SELECT tableoid::regclass::text FROM "{particoes.TABELA}" WHERE documento_id = %s',
+                           [self.processo.pk])
+            self.assertEqual(cursor.fetchone()[0], f'"{particoes.nome_particao(mes)}"')
+            self.assertFalse(particoes.criar_particao(cursor, mes))
+
+
+class HistoricoRequisicaoTests(TransactionTestCase):
+    # Os eventos da requisição são gravados juntos depois do commit (fora do TestCase, que nunca confirma)
+
+    def tearDown(self):
+        EventoDocumento.objects.all().delete()
+
+    def test_eventos_da_requisicao_em_um_insert(self):
+        usuario = User.objects.create_user('destino', password='senha', is_staff=True)
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        servidor = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        processo = mommy.make(Processo, numero_processo='1/2024', setor=setor, responsavel=servidor,
+                              data_abertura=date(2024, 1, 1), data_conclusao=None)
+        pendentes = [Tramitacao.objects.create(num_documento=processo.documento_ptr, de=usuario, para=usuario)
+                     for _ in range(3)]
+        EventoDocumento.objects.all().delete()
+        self.client.force_login(usuario)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('Documentos:caixa_entrada'), {'tramitacoes': [t.pk for t in pendentes]})
+        insercoes = [c for c in consultas if c['sql'].startswith(f'INSERT INTO "{particoes.TABELA}"')]
+        self.assertEqual(len(insercoes), 1)
+        self.assertEqual(set(EventoDocumento.objects.values_list('objeto_id', 'usuario_id')),
+                         {(t.pk, usuario.pk) for t in pendentes})
+
+
+class ArquivoDocumentosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        cls.colega = User.objects.create_user('colega')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        servidor = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        antiga = timezone.localdate() - timedelta(days=800)
+
+        def processo(numero, status, data_conclusao):
+            return mommy.make(Processo, numero_processo=numero, setor=setor, responsavel=servidor,
+                              data_abertura=antiga - timedelta(days=10), data_conclusao=data_conclusao, status=status)
+
+        cls.antigo = processo('1/2020', 'Concluido', antiga)
+        cls.recente = processo('2/2020', 'Concluido', timezone.localdate())
+        cls.aberto = processo('3/2020', 'Aberto', None)
+        cls.pendente = processo('4/2020', 'Arquivado', antiga)
+        Tramitacao.objects.create(num_documento=cls.antigo.documento_ptr, de=cls.admin, para=cls.colega, status='Sim')
+        Tramitacao.objects.create(num_documento=cls.pendente.documento_ptr, de=cls.admin, para=cls.colega)
+
+    def test_arquiva_encerrados_antigos_com_tramitacoes(self):
+        saida = io.StringIO()
+        call_command('arquivar_documentos', '--dias', '730', stdout=saida)
+
+        self.assertIn('1 documento(s) movido(s)', saida.getvalue())
+        self.assertEqual(set(Processo.objects.values_list('numero_processo', flat=True)), {'2/2020', '3/2020', '4/2020'})
+        self.assertEqual(Processo.todos.get(arquivo=True), self.antigo)
+        self.assertFalse(Tramitacao.objects.filter(num_documento=self.antigo).exists())
+        self.assertTrue(Tramitacao.todos.filter(num_documento=self.antigo, arquivo=True).exists())
+        # A contagem do dashboard inclui o arquivo
+        self.assertEqual(ContagemDocumento.objects.totais('tipo'), {'processo': 4})
+        # O número continua único considerando o arquivo
+        with self.assertRaises(ValidationError):
+            Processo(numero_processo='1/2020').validate_unique()
+
+    def test_admin_mostra_o_conjunto_em_uso_e_pesquisa_o_arquivo(self):
+        Documento.todos.filter(pk=self.antigo.pk).arquivar()
+        self.client.force_login(self.admin)
+        url = reverse('admin:Documentos_processo_changelist')
+
+        em_uso = self.client.get(url).context['cl'].result_list
+        self.assertNotIn(self.antigo, em_uso)
+        self.assertEqual(list(self.client.get(url, {'arquivo': '1'}).context['cl'].result_list), [self.antigo])
+        self.assertEqual(len(self.client.get(url, {'arquivo': 'todos'}).context['cl'].result_list), 4)
+        resposta = self.client.get(reverse('admin:Documentos_processo_change', args=[self.antigo.pk]))
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_reaberto_volta_ao_conjunto_em_uso(self):
+        Documento.todos.filter(pk__in=[self.antigo.pk, self.pendente.pk]).arquivar()
+
+        operacoes.alterar_status(Documento.todos.filter(pk=self.antigo.pk), 'Aberto')
+        self.assertTrue(Processo.objects.filter(pk=self.antigo.pk).exists())
+        self.assertEqual(Tramitacao.objects.filter(num_documento=self.antigo).count(), 1)
+
+        processo = Processo.todos.get(pk=self.pendente.pk)
+        processo.status, processo.data_conclusao = 'Aberto', None
+        processo.save()
+        self.assertFalse(Documento.todos.filter(arquivo=True).exists())
+        self.assertFalse(Tramitacao.todos.filter(arquivo=True).exists())
+
+
+class AssuntoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        setor = mommy.make(Setor, sigla_setor='SUFGI')
+        servidor = mommy.make(Servidor, setor_servidor=setor, data_saida=None)
+        cls.certidao, cls.averbacao = Assunto.objects.get(nome='Certidão'), Assunto.objects.get(nome='Averbação')
+        for numero, assunto, status in [('1/2024', cls.certidao, 'Aberto'), ('2/2024', cls.certidao, 'Aberto'),
+                                        ('3/2024', cls.certidao, 'Arquivado'), ('4/2024', cls.averbacao, 'Aberto')]:
+            mommy.make(Processo, numero_processo=numero, assunto=assunto, status=status, setor=setor,
+                       responsavel=servidor, data_abertura=date(2024, 1, 2), data_conclusao=None)
+
+    def test_catalogo_criado_pela_migracao(self):
+        self.assertEqual(Assunto._meta.pk.get_internal_type(), 'SmallAutoField')
+        self.assertGreaterEqual(Assunto.objects.count(), 50)
+        self.assertTrue(Assunto.objects.filter(nome='Averbação ex. ofício').exists())
+
+    def test_assuntos_na_memoria_do_processo(self):
+        cache.clear()
+        self.assertEqual(referencias.assuntos()[self.certidao.pk], 'Certidão')
+        # Depois da primeira carga, só a versão é lida do cache, sem consulta ao banco
+        with self.assertNumQueries(0):
+            referencias.assuntos()
+        novo = Assunto.objects.create(nome='Retificação de área')
+        self.assertEqual(referencias.assuntos()[novo.pk], 'Retificação de área')
+
+    def test_renomear_assunto_atualiza_a_busca(self):
+        self.certidao.nome = 'Certidão de inteiro teor'
+        self.certidao.save()
+        self.assertEqual(busca.buscar(Processo.objects.all(), 'inteiro teor').count(), 3)
+
+    def test_relatorio_por_assunto(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:Documentos_processo_relatorio_assuntos')
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        linhas = resposta.context['linhas']
+        self.assertEqual([(nome, total) for nome, _, total, _ in linhas], [('Certidão', 3), ('Averbação', 1)])
+        posicao = [valor for valor, _ in Documento.TIPO_CHOICES_STATUS].index('Arquivado')
+        self.assertEqual(linhas[0][1][posicao], 1)
+        self.assertEqual(resposta.context['total'], 4)
+        self.assertIn(f'assunto__exact={self.certidao.pk}', linhas[0][3])
+        # Os filtros da lista valem para o relatório
+        resposta = self.client.get(url, {'status__exact': 'Aberto'})
+        self.assertEqual([(nome, total) for nome, _, total, _ in resposta.context['linhas']],
+                         [('Certidão', 2), ('Averbação', 1)])
+        self.assertContains(self.client.get(reverse('admin:Documentos_processo_changelist')), 'Relatório por assunto')
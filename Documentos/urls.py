@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import IndexTemplateView
+from .views import IndexTemplateView, CaixaEntradaView, AnexoView, MetricasView
 
 app_name = 'Documentos'
 
 urlpatterns = [
-    path('',IndexTemplateView.as_view(), name='index')
+    path('',IndexTemplateView.as_view(), name='index'),
+    path('caixa-de-entrada/', CaixaEntradaView.as_view(), name='caixa_entrada'),
+    path('anexos/<path:nome>', AnexoView.as_view(), name='anexo'),
+    path('metrics', MetricasView.as_view(), name='metricas'),
 ]
\ No newline at end of file
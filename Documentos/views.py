@@ -1,8 +1,120 @@
-from django.shortcuts import render
+import mimetypes
+import posixpath
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse_lazy
+from django.utils.crypto import constant_time_compare
+from django.utils.http import content_disposition_header
+from django.views import View
 from django.views.generic import TemplateView
 
+from . import metricas
+from .models import ContagemDocumento, Documento, Tramitacao
+from .roteamento import LeituraReplicaMixin
+
 
 # Create your views here.
 
-class IndexTemplateView(TemplateView):
-    template_name='index.html'
\ No newline at end of file
+class IndexTemplateView(LeituraReplicaMixin, TemplateView):
+    template_name='index.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Totais lidos da tabela de contagens, mantida a cada save/delete de documento
+        por_tipo = ContagemDocumento.objects.totais('tipo')
+        context['total_oficios'] = por_tipo.get('oficio', 0)
+        context['total_processos'] = por_tipo.get('processo', 0)
+        context['total_emails'] = por_tipo.get('cadastroemail', 0)
+        context['total_ordens_servico'] = por_tipo.get('ordemservico', 0)
+        total = sum(por_tipo.values())
+        context['percentual_emails'] = round(100 * context['total_emails'] / total) if total else 0
+
+        por_setor = ContagemDocumento.objects.totais('setor__sigla_setor', 'status')
+        context['status'] = Documento.TIPO_CHOICES_STATUS
+        context['contagens_por_setor'] = [
+            (setor, [por_setor.get((setor, status), 0) for status, _ in Documento.TIPO_CHOICES_STATUS])
+            for setor in sorted({setor for setor, _ in por_setor})
+        ]
+        return context
+
+class CaixaEntradaView(LoginRequiredMixin, TemplateView):
+    # Tramitações pendentes (não recebidas) do usuário logado, das mais recentes para as mais antigas
+    template_name = 'caixa_entrada.html'
+    login_url = reverse_lazy('admin:login')
+    por_pagina = 25
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tramitacoes = (Tramitacao.objects.pendentes_para(self.request.user).recentes()
+                       .select_related('num_documento', 'de'))
+        # Paginação por chave: ?antes=<criado>_<id> da última linha da página anterior
+        cursor = self.request.GET.get('antes', '')
+        criado, _, pk = cursor.rpartition('_')
+        if criado and pk.isdigit():
+            try:
+                tramitacoes = tramitacoes.anteriores_a(datetime.fromisoformat(criado), int(pk))
+            except ValueError:
+                pass
+        pagina = list(tramitacoes[:self.por_pagina + 1])
+        context['tramitacoes'] = pagina[:self.por_pagina]
+        if len(pagina) > self.por_pagina:
+            ultima = pagina[self.por_pagina - 1]
+            context['proxima_pagina'] = f'{ultima.criado.isoformat()}_{ultima.pk}'
+        return context
+
+    def post(self, request, *args, **kwargs):
+        # Marca as tramitações selecionadas como recebidas com um único UPDATE
+        ids = [pk for pk in request.POST.getlist('tramitacoes') if pk.isdigit()]
+        recebidas = Tramitacao.objects.marcar_recebidas(request.user, ids)
+        messages.success(request, f'{recebidas} tramitação(ões) marcada(s) como recebida(s).')
+        return redirect('Documentos:caixa_entrada')
+
+
+class AnexoView(LoginRequiredMixin, View):
+    # Download de anexos: confere se o usuário pode ver algum dos documentos que usam o arquivo
+    # (o mesmo anexo pode ser compartilhado, ver armazenamento.py) e deixa o envio para o nginx
+    # (X-Accel-Redirect), sem ocupar um worker do gunicorn com PDFs grandes.
+    login_url = reverse_lazy('admin:login')
+
+    def get(self, request, nome):
+        documentos = list(Documento.todos.filter(Q(anexo=nome) | Q(miniatura=nome))
+                          .only('tipo', 'rotulo', 'usuario', 'detentor', 'anexo'))
+        if not documentos:
+            raise Http404
+        documento = next((documento for documento in documentos if self.pode_ver(request.user, documento)), None)
+        if documento is None:
+            raise PermissionDenied
+        armazenamento = documento.anexo.storage
+        # O arquivo é gravado com o hash do conteúdo; o download recebe o nome do documento
+        nome_arquivo = documento.rotulo.replace('/', '-') + posixpath.splitext(nome)[1]
+        if settings.ANEXOS_X_ACCEL:
+            resposta = HttpResponse(content_type=mimetypes.guess_type(nome)[0] or 'application/octet-stream')
+            resposta['X-Accel-Redirect'] = armazenamento.caminho_interno(nome)
+            resposta['Content-Disposition'] = content_disposition_header(False, nome_arquivo)
+            return resposta
+        if hasattr(armazenamento, 'url_assinada'):
+            return redirect(armazenamento.url_assinada(nome))
+        return FileResponse(armazenamento.open(nome), filename=nome_arquivo)
+
+    @staticmethod
+    def pode_ver(usuario, documento):
+        return (usuario.has_perm(f'Documentos.view_{documento.tipo}')
+                or usuario.pk in (documento.usuario_id, documento.detentor_id))
+
+
+class MetricasView(View):
+    # Contadores e histogramas das requisições (ver metricas.py) no formato do Prometheus.
+    # O coletor envia "Authorization: Bearer <METRICAS_TOKEN>"; sem token configurado, o endpoint fica fechado.
+
+    def get(self, request):
+        token = settings.METRICAS_TOKEN
+        if not token or not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            raise PermissionDenied
+        return HttpResponse(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,66 @@
+# Configuração do gunicorn para os contêineres controle1/2/3, lida automaticamente a partir
+# do diretório de trabalho (/var/www). Todos os valores podem ser ajustados por variáveis de ambiente.
+#
+# Modos (GUNICORN_MODO):
+#   gthread (padrão) - processos com várias threads (WSGI). Uma requisição lenta (exportação CSV,
+#                      upload grande, consulta pesada) ocupa uma thread, não o processo inteiro, e não
+#                      é morta pelo timeout, que no gthread vale para o processo travado.
+#   sync             - um processo por requisição; os downloads longos ficam sujeitos ao timeout.
+#   uvicorn          - ASGI (ControleDocumentos/asgi.py) com uvicorn; o ORM continua síncrono e roda
+#                      em threads, então só compensa com views assíncronas.
+# A comparação de vazão entre os modos está no README.
+
+import multiprocessing
+import os
+
+
+def ambiente(nome, padrao, tipo=str):
+    valor = os.environ.get(nome)
+    return padrao if valor in (None, '') else tipo(valor)
+
+
+def booleano(valor):
+    return str(valor).lower() in ('1', 'true', 'sim', 'yes')
+
+
+NUCLEOS = multiprocessing.cpu_count()
+MODO = ambiente('GUNICORN_MODO', 'gthread')
+
+CLASSES_WORKER = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+bind = ambiente('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = CLASSES_WORKER[MODO]
+wsgi_app = 'ControleDocumentos.asgi:application' if MODO == 'uvicorn' else 'ControleDocumentos.wsgi:application'
+
+# sync: 2 × núcleos + 1 processos; gthread e uvicorn: um processo por núcleo (+1), com as threads/event loop
+# cobrindo a espera de E/S (banco, armazenamento)
+workers = ambiente('GUNICORN_WORKERS', 2 * NUCLEOS + 1 if MODO == 'sync' else NUCLEOS + 1, int)
+threads = ambiente('GUNICORN_THREADS', 4 if MODO == 'gthread' else 1, int)
+
+# Recicla os processos periodicamente (vazamentos de memória), com jitter para não reiniciarem juntos
+max_requests = ambiente('GUNICORN_MAX_REQUESTS', 1000, int)
+max_requests_jitter = ambiente('GUNICORN_MAX_REQUESTS_JITTER', 100, int)
+
+timeout = ambiente('GUNICORN_TIMEOUT', 60, int)
+# Tempo para terminar as requisições em andamento ao reiniciar/reciclar um processo
+graceful_timeout = ambiente('GUNICORN_GRACEFUL_TIMEOUT', 30, int)
+# O nginx mantém conexões abertas com os contêineres (keepalive do upstream)
+keepalive = ambiente('GUNICORN_KEEPALIVE', 5, int)
+
+# Carrega o Django uma vez no processo mestre e compartilha a memória com os workers (copy-on-write).
+# Nenhuma conexão com o banco é aberta na importação, então os workers não herdam conexões.
+preload_app = ambiente('GUNICORN_PRELOAD', True, booleano)
+
+# Heartbeat dos workers em memória: no overlayfs do Docker o /tmp pode travar os workers
+worker_tmp_dir = ambiente('GUNICORN_WORKER_TMP_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+# O nginx é o único cliente: confia no X-Forwarded-For/Proto que ele envia
+forwarded_allow_ips = ambiente('GUNICORN_FORWARDED_ALLOW_IPS', '*')
+
+accesslog = ambiente('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = ambiente('GUNICORN_LOGLEVEL', 'info')